@@ -0,0 +1,169 @@
+# analytics_streamlit.py
+import numpy as np
+import pandas as pd
+import streamlit as st
+from scipy import sparse
+
+from utils_streamlit import compute_lemma_stream, parse_synonyms
+
+# --- CONFIGURATION ---
+# Taille (en lemmes) des morceaux lorsque le texte est analysé par morceaux plutôt que par paragraphe/réponse.
+CHUNK_LEMMAS = 200
+# Les co-occurrences sont calculées entre les termes les plus fréquents seulement (matrice termes x termes bornée).
+COOCCURRENCE_MAX_TERMS = 2000
+# Nombre de mots-clés TF-IDF retenus par segment.
+KEYWORDS_PER_UNIT = 5
+UNIT_MODES = {"Paragraphes / réponses": "segments", f"Morceaux de {CHUNK_LEMMAS} mots": "chunks"}
+
+# --- CONSTRUCTION DES MATRICES ---
+
+def regroup_units(units, labels, mode):
+    """Garde les segments du texte (paragraphes ou réponses) ou les remplace par des morceaux de CHUNK_LEMMAS lemmes."""
+    if mode == "segments":
+        return units, labels
+    flat = [lemma for unit in units for lemma in unit]
+    chunks = [flat[i:i + CHUNK_LEMMAS] for i in range(0, len(flat), CHUNK_LEMMAS)]
+    return chunks, [f"Morceau {i + 1}" for i in range(len(chunks))]
+
+def encode_units(units):
+    """
+    Numérote les lemmes, du plus fréquent au moins fréquent.
+
+    Returns:
+        tuple: (vocabulaire (np.array), identifiants des lemmes mis bout à bout, segment de chaque lemme, longueur de chaque segment).
+    """
+    index = {}
+    raw_ids = np.fromiter((index.setdefault(lemma, len(index)) for unit in units for lemma in unit), dtype=np.int64)
+    lengths = np.fromiter((len(unit) for unit in units), dtype=np.int64, count=len(units))
+    counts = np.bincount(raw_ids, minlength=len(index))
+    order = np.argsort(-counts, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    vocab = np.array(list(index), dtype=object)[order]
+    return vocab, rank[raw_ids], np.repeat(np.arange(len(units)), lengths), lengths
+
+def document_term_matrix(ids, lengths, n_terms):
+    """Matrice creuse segments x termes (nombre d'occurrences)."""
+    indptr = np.concatenate([[0], np.cumsum(lengths)])
+    dtm = sparse.csr_matrix((np.ones(len(ids), dtype=np.int32), ids, indptr), shape=(len(lengths), n_terms))
+    dtm.sum_duplicates()
+    return dtm
+
+def cooccurrence_matrix(dtm, max_terms=COOCCURRENCE_MAX_TERMS):
+    """
+    Matrice creuse termes x termes : nombre de segments où deux termes apparaissent ensemble.
+    Limitée aux `max_terms` termes les plus fréquents (les premières colonnes de `dtm`).
+    """
+    presence = (dtm[:, :max_terms] > 0).astype(np.int32)
+    cooccurrences = (presence.T @ presence).tocsr()
+    cooccurrences.setdiag(0)
+    cooccurrences.eliminate_zeros()
+    return cooccurrences
+
+# --- INDICATEURS ---
+
+def top_pairs(cooccurrences, vocab, top_k):
+    upper = sparse.triu(cooccurrences, k=1).tocoo()
+    order = np.argsort(-upper.data, kind="stable")[:top_k]
+    return pd.DataFrame({
+        "Terme 1": vocab[upper.row[order]],
+        "Terme 2": vocab[upper.col[order]],
+        "Segments": upper.data[order],
+    })
+
+def top_ngrams(ids, unit_ids, vocab, n, top_k):
+    """
+    N-grammes de lemmes les plus fréquents, sans franchir la limite entre deux segments.
+    Chaque n-gramme est codé par un entier (identifiants en base len(vocab)) pour être compté avec np.unique.
+    """
+    count = len(ids) - n + 1
+    if count <= 0:
+        return pd.DataFrame(columns=["N-gramme", "Occurrences"])
+    base = len(vocab)
+    keys = np.zeros(count, dtype=np.int64)
+    same_unit = np.ones(count, dtype=bool)
+    for k in range(n):
+        keys = keys * base + ids[k:k + count]
+        same_unit &= unit_ids[k:k + count] == unit_ids[:count]
+    grams, counts = np.unique(keys[same_unit], return_counts=True)
+    order = np.argsort(-counts, kind="stable")[:top_k]
+    grams, parts = grams[order], []
+    for _ in range(n):
+        parts.append(vocab[grams % base])
+        grams = grams // base
+    labels = [" ".join(words) for words in zip(*reversed(parts))]
+    return pd.DataFrame({"N-gramme": labels, "Occurrences": counts[order]})
+
+def tfidf_keywords(dtm, vocab, labels, top_k=KEYWORDS_PER_UNIT):
+    """Mots-clés de chaque segment : les `top_k` termes de plus fort poids TF-IDF (fréquence relative x log inverse de la fréquence documentaire)."""
+    n_units = dtm.shape[0]
+    document_frequency = np.bincount(dtm.indices, minlength=dtm.shape[1])
+    idf = np.log((1 + n_units) / (1 + document_frequency)) + 1
+    rows = np.repeat(np.arange(n_units), np.diff(dtm.indptr))
+    lengths = np.asarray(dtm.sum(axis=1)).ravel()
+    weights = dtm.data / lengths[rows] * idf[dtm.indices]
+
+    order = np.lexsort((-weights, rows))
+    rank = np.arange(len(order)) - dtm.indptr[rows[order]]
+    kept = order[rank < top_k]
+    keywords = pd.DataFrame({"row": rows[kept], "term": vocab[dtm.indices[kept]]}).groupby("row", sort=True)["term"].agg(", ".join)
+    return pd.DataFrame({"Segment": np.asarray(labels, dtype=object)[keywords.index], "Mots-clés": keywords.values})
+
+def theme_counts(dtm, vocab, synonym_map, dropped=None):
+    """
+    Fréquence des thèmes définis par les regroupements de synonymes : occurrences de leurs termes
+    et nombre de segments qui en mentionnent au moins un.
+    Comme pour le nuage de mots, les synonymes écartés par les filtres (`dropped`, mots vides, sigles...)
+    comptent dans les occurrences ; leur segment n'étant pas connu, ils n'entrent pas dans le nombre de segments.
+    """
+    themes = {}
+    for synonym, target in synonym_map.items():
+        themes.setdefault(target, {target}).add(synonym)
+    if not themes:
+        return None
+    vocab_index = {term: i for i, term in enumerate(vocab)}
+    names = list(themes)
+    entries = [(vocab_index[term], column) for column, name in enumerate(names) for term in themes[name] if term in vocab_index]
+    term_ids = np.array([term for term, _ in entries], dtype=np.int64)
+    theme_ids = np.array([column for _, column in entries], dtype=np.int64)
+    membership = sparse.csr_matrix((np.ones(len(entries), dtype=np.int32), (term_ids, theme_ids)), shape=(len(vocab), len(names)))
+    per_unit = (dtm @ membership).tocsc()
+    units_mentioning = np.diff((per_unit > 0).tocsc().indptr)
+    occurrences = np.asarray(per_unit.sum(axis=0)).ravel()
+    column_of = {name: column for column, name in enumerate(names)}
+    for synonym, count in (dropped or {}).items():
+        if synonym in synonym_map:
+            occurrences[column_of[synonym_map[synonym]]] += count
+    return pd.DataFrame({
+        "Thème": names,
+        "Occurrences": occurrences,
+        "Segments": units_mentioning,
+        "Part des segments (%)": np.round(100 * units_mentioning / max(dtm.shape[0], 1), 1),
+    }).sort_values("Occurrences", ascending=False, ignore_index=True)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def compute_text_analytics(text, synonym_str, unit_mode="segments", ngram_size=2, top_k=20):
+    """
+    Indicateurs lexicaux du texte, calculés à partir du flux de lemmes en cache (spaCy n'est pas relancé) :
+    termes et n-grammes fréquents, co-occurrences, mots-clés TF-IDF par segment et comptes par thème.
+
+    Returns:
+        dict | None: tableaux pandas des indicateurs, ou None si le texte ne contient aucun mot pertinent.
+    """
+    units, labels, dropped = compute_lemma_stream(text)
+    units, labels = regroup_units(units, labels, unit_mode)
+    if not units:
+        return None
+    vocab, ids, unit_ids, lengths = encode_units(units)
+    dtm = document_term_matrix(ids, lengths, len(vocab))
+    term_totals = np.asarray(dtm.sum(axis=0)).ravel()
+    return {
+        "units": len(units),
+        "tokens": len(ids),
+        "vocabulary": len(vocab),
+        "terms": pd.DataFrame({"Terme": vocab[:top_k], "Occurrences": term_totals[:top_k], "Segments": np.bincount(dtm.indices, minlength=len(vocab))[:top_k]}),
+        "ngrams": top_ngrams(ids, unit_ids, vocab, ngram_size, top_k),
+        "cooccurrences": top_pairs(cooccurrence_matrix(dtm), vocab, top_k),
+        "keywords": tfidf_keywords(dtm, vocab, labels),
+        "themes": theme_counts(dtm, vocab, parse_synonyms(synonym_str), dropped),
+    }
@@ -1,18 +1,68 @@
 from fastapi import FastAPI, UploadFile, File, Form
+from typing import List
 from fastapi.responses import JSONResponse, StreamingResponse
-import pandas as pd
-import docx
-import io
 import os
+import json
 import tempfile
-import fitz
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
-from services.qa_service import qa_service_instance
+from services.qa_service import qa_service_instance, API_STRATEGIES
+from services.ollama_client import ollama_client_instance
+from services.ollama_sessions import ollama_session_store_instance, OLLAMA_SESSION_MAX_CHARS
+from services.answer_cache import answer_cache_instance
 from services.transcription_service import transcription_service_instance
 from services.summarization_service import summarization_service_instance
+from services.translation_service import translation_service_instance
+from services.tts_service import tts_service_instance, wav_header, to_pcm16
+from services.cache_service import cache_service_instance
+from services.text_chunker import chunk_text_by_tokens
+from services.retrieval_service import retrieval_service_instance
+from services.document_store import document_store_instance
+from services.workspace_service import workspace_service_instance
+from services.data_loader import (
+    extract_text, is_audio_file, is_text_file, is_pdf_file, expand_zip, DocumentTooLargeError, PDF_MAX_BYTES,
+    is_tabular_file, profile_table, table_to_text,
+    check_pdf_budget, pdf_page_count, pdf_page_ranges, extract_pdf_pages, join_pages, page_for_offset
+)
+from services.executors import inference_executor, parsing_executor, run_blocking, iterate_in_executor, get_process_pool
+from services.job_service import job_service_instance
+from services.model_registry import model_registry_instance, WARMUP_MODELS
 
 app = FastAPI(title="API d'Analyse Qualitative")
 
+# --- PARAMÈTRES DE LA PHASE MAP (résumés partiels) ---
+# Nombre de morceaux envoyés ensemble au pipeline de résumé.
+MAP_BATCH_SIZE = int(os.getenv("MAP_BATCH_SIZE", "4"))
+# Nombre de lots résumés en parallèle.
+MAP_CONCURRENCY = int(os.getenv("MAP_CONCURRENCY", "2"))
+map_executor = ThreadPoolExecutor(max_workers=MAP_CONCURRENCY, thread_name_prefix="map")
+MAP_MIN_LENGTH = 40
+MAP_MAX_LENGTH = 200
+
+# --- PARAMÈTRES DE LA PHASE REDUCE (synthèse hiérarchique) ---
+# Fenêtre de contexte du modèle de synthèse et part réservée à sa réponse.
+REDUCE_CONTEXT_TOKENS = int(os.getenv("REDUCE_CONTEXT_TOKENS", "4096"))
+REDUCE_OUTPUT_TOKENS = int(os.getenv("REDUCE_OUTPUT_TOKENS", "1024"))
+# Nombre d'appels de réduction lancés en parallèle à chaque niveau.
+REDUCE_CONCURRENCY = int(os.getenv("REDUCE_CONCURRENCY", "2"))
+MAX_REDUCE_LEVELS = 5
+reduce_semaphore = asyncio.Semaphore(REDUCE_CONCURRENCY)
+SUMMARY_SEPARATOR = "\n\n---\n\n"
+
+# --- PARAMÈTRES DE LA RECHERCHE POUR LE Q&A ---
+# En dessous de cette taille, le document complet est envoyé au modèle.
+RETRIEVAL_MIN_CHARS = int(os.getenv("RETRIEVAL_MIN_CHARS", "6000"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "6"))
+
+# --- PARAMÈTRES DE LA TRADUCTION ---
+# Langue (code NLLB) dans laquelle les documents sont analysés.
+ANALYSIS_LANGUAGE = os.getenv("ANALYSIS_LANGUAGE", "fra_Latn")
+
+# --- MESSAGES D'ERREUR PARTAGÉS ---
+DOCUMENT_NOT_FOUND_MESSAGE = "Document introuvable ou expiré. Veuillez recharger le fichier."
+OLLAMA_BUSY_MESSAGE = "Le serveur Ollama est saturé (file d'attente pleine). Réessayez dans quelques instants."
+
 # --- LES PROMPTS SONT BIEN STOCKÉS ICI ---
 ANALYSIS_PROMPTS = {
     "resume_general": """Ta mission est de créer une synthèse globale et structurée à partir des résumés partiels d'un long document. Commence par une introduction présentant le sujet principal, puis développe les 3 à 5 thèmes les plus importants en te basant sur le contenu fourni, et termine par une conclusion générale.
@@ -37,115 +87,1056 @@ Voici les résumés partiels des entretiens :
 Rédige maintenant ton **analyse d'opinions**."""
 }
 
-def chunk_text(text: str, chunk_size: int = 3000, chunk_overlap: int = 300):
-    if not isinstance(text, str): return []
-    if len(text) <= chunk_size: return [text]
-    chunks = []; start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunks.append(text[start:end])
-        start += chunk_size - chunk_overlap
-    return chunks
+# --- ANALYSE DE CORPUS (plusieurs documents stockés) ---
+# Documents résumés simultanément ; les résumés partiels et les fusions restent bornés par leurs propres pools.
+CORPUS_CONCURRENCY = int(os.getenv("CORPUS_CONCURRENCY", "4"))
+# Taille visée du résumé de chaque document avant la réduction à l'échelle du corpus.
+CORPUS_DIGEST_TOKENS = int(os.getenv("CORPUS_DIGEST_TOKENS", "400"))
+
+# Résumé d'un document entier (mode API), étape « map » de l'analyse de corpus.
+DIGEST_PROMPT = """Résume fidèlement le document ci-dessous en 10 à 15 phrases : sujet, faits importants, opinions exprimées, recommandations et risques éventuels. N'invente rien.
+
+Document :
+{document}
+
+Rédige maintenant le **résumé du document**."""
+
+# Consignes propres à chaque type d'analyse, appliquées à l'ensemble du corpus.
+CORPUS_INSTRUCTIONS = {
+    "resume_general": "Dégage les 3 à 5 thèmes communs au corpus, puis les points sur lesquels les documents divergent.",
+    "suivi_evaluation": "Agis en tant qu'expert en Suivi-Évaluation : identifie les recommandations, les risques et les leçons apprises, en trois sections avec des titres.",
+    "analyse_opinions": "Tu es un sociologue spécialisé dans l'analyse de discours : regroupe les opinions exprimées sur le projet en deux listes à puces, \"Points Positifs\" et \"Points Négatifs\".",
+}
+
+CORPUS_PROMPT = """Les résumés ci-dessous proviennent de {count} documents distincts (entretiens, rapports...), chacun identifié par [Doc n].
+{instructions}
+Pour chaque point, cite entre crochets les documents qui l'appuient (par exemple [Doc 2, Doc 7]) et indique combien de documents l'évoquent. Termine par une section "Par document" donnant en une ligne la position principale de chaque document.
+
+Voici les résumés des documents :
+{summaries}
+
+Rédige maintenant la **synthèse du corpus**."""
+
+# Fusion intermédiaire de résumés de plusieurs documents : les identifiants [Doc n] doivent être conservés.
+CORPUS_REDUCE_PROMPT = """Voici les résumés de plusieurs documents, chacun identifié par [Doc n]. Fusionne-les en un seul résumé fidèle et concis qui regroupe les thèmes, faits, opinions, recommandations et risques communs. Après chaque point, conserve entre crochets les identifiants des documents dont il provient (par exemple [Doc 2, Doc 7]) ; n'en supprime et n'en invente aucun.
+
+Voici les résumés à fusionner :
+{summaries}
+
+Rédige maintenant le **résumé fusionné**."""
+
+# Prompt utilisé aux niveaux intermédiaires de la réduction hiérarchique.
+REDUCE_PROMPT = """Voici plusieurs résumés partiels consécutifs d'un long document. Fusionne-les en un seul résumé fidèle et concis qui conserve les faits, thèmes, recommandations, risques et opinions importants, sans rien inventer.
+
+Voici les résumés partiels à fusionner :
+{summaries}
+
+Rédige maintenant le **résumé fusionné**."""
+
+def chunk_text(text: str, overlap_tokens: int = 0):
+    """Découpe le texte en morceaux remplis jusqu'au budget d'entrée du modèle de résumé, aux frontières de phrases."""
+    return chunk_text_by_tokens(
+        text,
+        max_tokens=summarization_service_instance.input_token_budget(),
+        tokenizer=summarization_service_instance.tokenizer,
+        overlap_tokens=overlap_tokens
+    )
+
+async def register_document(text, filename, is_audio, source_key=None, **metadata):
+    """
+    Enregistre le texte extrait côté serveur (et dans l'espace de travail) et construit son index de recherche.
+    `source_key` (empreinte du fichier source) permet de retrouver ce document si le même fichier est rechargé.
+    Les métadonnées vides (page_offsets=None...) ne sont pas conservées.
+    """
+    metadata = {key: value for key, value in metadata.items() if value}
+    # Compression et écriture dans l'espace de travail (SQLite) : hors de la boucle d'événements.
+    document_id = await run_blocking(parsing_executor, document_store_instance.put, text, filename=filename, is_audio=is_audio, **metadata)
+    if source_key:
+        await run_blocking(parsing_executor, workspace_service_instance.link_source, source_key, document_id)
+    # L'index de recherche est construit une seule fois, puis réutilisé par chaque question.
+    if len(text) > RETRIEVAL_MIN_CHARS:
+        await run_blocking(parsing_executor, retrieval_service_instance.build_index, text, key=document_id)
+    return document_id
+
+# --- FICHIERS DÉJÀ TRAITÉS ---
+
+def source_params(filename, language="auto", text_column=None, meta_columns=""):
+    """Paramètres de traitement inclus dans l'empreinte d'un fichier source : un changement impose un nouveau traitement."""
+    extension = os.path.splitext(filename)[1].lower()
+    if is_audio_file(filename):
+        return (extension, transcription_service_instance.model_id, transcription_service_instance.backend, language)
+    if is_tabular_file(filename):
+        return (extension, text_column or "", meta_columns or "")
+    return (extension,)
+
+def document_response(document_id, document, message="Fichier traité."):
+    """Réponse d'upload construite à partir d'un document stocké."""
+    metadata = document["metadata"]
+    return {
+        "message": message, "document_id": document_id, "full_text": document["text"],
+        "is_audio": metadata.get("is_audio", False), "page_offsets": metadata.get("page_offsets"), "table": metadata.get("table"),
+    }
+
+def find_processed_source(source_key):
+    """
+    Si ce fichier source a déjà été traité, retourne la réponse d'upload de son document, sinon None.
+    Fonction bloquante (lecture de l'espace de travail), exécutée dans le pool de parsing.
+    """
+    document_id = workspace_service_instance.find_source(source_key)
+    document = document_store_instance.get(document_id) if document_id else None
+    if document is None:
+        return None
+    return document_response(document_id, document, "Fichier déjà traité : document repris de l'espace de travail.")
+
+async def upload_source_key(tmp_path, filename, *params):
+    """Empreinte d'un fichier reçu, calculée dans le pool de parsing."""
+    return await run_blocking(parsing_executor, workspace_service_instance.source_key, tmp_path, *source_params(filename, *params))
+
+# --- EXTRACTION DES PDF ---
+
+async def save_upload(file, max_bytes=None):
+    """Écrit le fichier reçu dans un fichier temporaire, par morceaux ; lève DocumentTooLargeError au-delà de `max_bytes`."""
+    size = 0
+    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp:
+        try:
+            while chunk := await file.read(1024 * 1024):
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise DocumentTooLargeError(f"Fichier trop volumineux (maximum {max_bytes // (1024 * 1024)} Mo).")
+                tmp.write(chunk)
+        except Exception:
+            tmp.close(); os.remove(tmp.name)
+            raise
+        return tmp.name
+
+async def open_pdf(path):
+    """Nombre de pages du PDF, après vérification des limites."""
+    page_count = await run_blocking(parsing_executor, pdf_page_count, path)
+    check_pdf_budget(page_count=page_count)
+    return page_count
+
+async def stream_pdf_pages(path, page_count):
+    """
+    Extrait les pages d'un PDF par plages, en parallèle dans le pool de processus,
+    et produit (index de page, texte) dans l'ordre dès que les plages précédentes sont prêtes.
+    """
+    loop = asyncio.get_running_loop()
+    ranges = pdf_page_ranges(page_count)
+    futures = [loop.run_in_executor(get_process_pool(), extract_pdf_pages, path, start, end) for start, end in ranges]
+    try:
+        for (start, _), future in zip(ranges, futures):
+            for offset, page in enumerate(await future):
+                yield start + offset, page
+    finally:
+        for future in futures: future.cancel()
+
+@app.post("/tabular-columns/")
+async def tabular_columns(file: UploadFile = File(...)):
+    """Décrit les colonnes d'un fichier CSV/Excel et suggère la colonne des réponses libres."""
+    if not is_tabular_file(file.filename):
+        return JSONResponse(status_code=400, content={"message": "Seuls les fichiers CSV et Excel sont acceptés."})
+    tmp_path = None
+    try:
+        tmp_path = await save_upload(file)
+        return await run_blocking(parsing_executor, profile_table, tmp_path, file.filename)
+    except Exception as e:
+        return JSONResponse(status_code=400, content={"message": f"Fichier illisible : {e}"})
+    finally:
+        if tmp_path and os.path.exists(tmp_path): os.remove(tmp_path)
 
 @app.post("/upload-file/")
-async def upload_and_process_file(file: UploadFile = File(...), language: str = Form("auto")):
+async def upload_and_process_file(file: UploadFile = File(...), language: str = Form("auto"),
+                                  text_column: str = Form(None), meta_columns: str = Form("")):
+    """
+    Pour un CSV/Excel : `text_column` désigne la colonne des réponses libres (devinée si absente) et
+    `meta_columns` (séparées par des virgules) les colonnes reprises en contexte de chaque réponse.
+    """
+    tmp_path = None
     try:
-        content_bytes = await file.read()
-        filename = file.filename; is_audio_context = False; tmp_path = None
-
-        if filename.endswith('.csv'): current_context = pd.read_csv(io.BytesIO(content_bytes)).to_string()
-        elif filename.endswith(('.xlsx', '.xls')): current_context = pd.read_excel(io.BytesIO(content_bytes)).to_string()
-        elif filename.endswith('.docx'):
-            doc = docx.Document(io.BytesIO(content_bytes))
-            current_context = "\n\n".join([p.text.strip() for p in doc.paragraphs if p.text.strip()])
-        elif filename.endswith('.txt'): current_context = content_bytes.decode('utf-8', errors='ignore')
-        elif filename.lower().endswith('.pdf'):
-            doc = fitz.open(stream=content_bytes, filetype="pdf")
-            current_context = "".join([page.get_text() for page in doc])
-        elif filename.lower().endswith(('.mp3', '.wav', '.m4a', '.flac', '.ogg')):
-            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1]) as tmp:
-                tmp.write(content_bytes); tmp_path = tmp.name
-            current_context = transcription_service_instance.transcribe(tmp_path, language=language)
+        filename = file.filename; is_audio_context = False; page_offsets = None; table_info = None
+
+        if is_pdf_file(filename) or is_audio_file(filename) or is_tabular_file(filename):
+            tmp_path = await save_upload(file, max_bytes=PDF_MAX_BYTES if is_pdf_file(filename) else None)
+            source_key = await upload_source_key(tmp_path, filename, language, text_column, meta_columns)
+        else:
+            content_bytes = await file.read()
+            source_key = await run_blocking(parsing_executor, workspace_service_instance.source_key, content_bytes, *source_params(filename))
+        processed = await run_blocking(parsing_executor, find_processed_source, source_key)
+        if processed:
+            return processed
+
+        if is_pdf_file(filename):
+            page_count = await open_pdf(tmp_path)
+            pages = [page async for _, page in stream_pdf_pages(tmp_path, page_count)]
+            current_context, page_offsets = join_pages(pages)
+        elif is_audio_file(filename):
+            current_context = await run_blocking(inference_executor, transcription_service_instance.transcribe, tmp_path, language=language)
             is_audio_context = True
+        elif is_tabular_file(filename):
+            columns = [column.strip() for column in meta_columns.split(",") if column.strip()]
+            current_context, text_column, row_count = await run_blocking(parsing_executor, table_to_text, tmp_path, filename, text_column, columns)
+            table_info = {"text_column": text_column, "meta_columns": columns, "rows": row_count}
         else:
-            return JSONResponse(status_code=400, content={"message": "Format de fichier non supporté."})
+            current_context = await run_blocking(parsing_executor, extract_text, filename, content_bytes)
+            if current_context is None:
+                return JSONResponse(status_code=400, content={"message": "Format de fichier non supporté."})
 
         if not current_context.strip():
             return JSONResponse(status_code=400, content={"message": "Fichier vide ou contenu non extrait."})
 
-        return {"message": "Fichier traité.", "full_text": current_context, "is_audio": is_audio_context}
+        document_id = await register_document(current_context, filename, is_audio_context, source_key, page_offsets=page_offsets, table=table_info)
+        return {"message": "Fichier traité.", "document_id": document_id, "full_text": current_context, "is_audio": is_audio_context, "page_offsets": page_offsets, "table": table_info}
+    except DocumentTooLargeError as e:
+        return JSONResponse(status_code=413, content={"message": str(e)})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"message": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"message": f"Erreur: {e}"})
     finally:
         if tmp_path and os.path.exists(tmp_path): os.remove(tmp_path)
 
-async def long_document_streamer(analysis_type, context, mode, model_choice):
+def summary_cache_key(chunk):
+    """Clé de cache d'un résumé partiel : texte du morceau + modèle + moteur d'inférence + longueurs."""
+    return cache_service_instance.make_key(chunk, summarization_service_instance.model_id, summarization_service_instance.backend, MAP_MIN_LENGTH, MAP_MAX_LENGTH)
+
+def cached_summaries(text_chunks):
+    """Résumés partiels déjà en cache, dans l'ordre des morceaux (None pour ceux à calculer). Fonction bloquante."""
+    return cache_service_instance.get_many("summary", [summary_cache_key(chunk) for chunk in text_chunks])
+
+def store_summaries(chunks, summaries):
+    """Met en cache les résumés partiels de morceaux, en une transaction. Fonction bloquante."""
+    cache_service_instance.set_many("summary", [(summary_cache_key(chunk), summary_chunk) for chunk, summary_chunk in zip(chunks, summaries)])
+
+def is_error_output(text):
+    """Détecte les messages d'erreur renvoyés en flux par le QAService, qui ne doivent pas être mis en cache."""
+    return not text.strip() or "--- ERREUR ---" in text or text.startswith("Erreur")
+
+async def summarize_chunk_batch(text_chunks, indices):
+    """Résume un lot de morceaux dans le pool de la phase map et retourne (indices, résumés, erreur)."""
+    batch = [text_chunks[i] for i in indices]
+    try:
+        summaries = await run_blocking(
+            map_executor, summarization_service_instance.summarize_batch,
+            batch, min_length=MAP_MIN_LENGTH, max_length=MAP_MAX_LENGTH, batch_size=MAP_BATCH_SIZE
+        )
+    except Exception as e:
+        return indices, None, e
+    await run_blocking(parsing_executor, store_summaries, batch, summaries)
+    return indices, summaries, None
+
+def estimate_tokens(text):
+    """Estimation prudente du nombre de tokens (environ 3 caractères par token en français)."""
+    return len(text) // 3 + 1
+
+def truncate_to_tokens(text, max_tokens):
+    return text[:max_tokens * 3]
+
+def reduce_budget(prompt_template):
+    """Nombre de tokens disponibles pour les résumés dans un prompt de réduction."""
+    return REDUCE_CONTEXT_TOKENS - REDUCE_OUTPUT_TOKENS - estimate_tokens(prompt_template.format(summaries=""))
+
+def group_summaries(summaries, budget):
+    """Regroupe des résumés consécutifs en lots dont la taille estimée tient dans le budget."""
+    groups = []; current = []; used = 0
+    for summary in summaries:
+        cost = estimate_tokens(summary) + estimate_tokens(SUMMARY_SEPARATOR)
+        if current and used + cost > budget:
+            groups.append(current); current = []; used = 0
+        current.append(summary); used += cost
+    if current: groups.append(current)
+    return groups
+
+async def collect_answer(prompt, mode, model_choice):
+    """Consomme entièrement le flux du LLM et retourne le texte généré."""
+    return "".join([token async for token in qa_service_instance.ask(prompt, "", mode, model_choice)])
+
+async def reduce_group(position, group, mode, model_choice, prompt_template=REDUCE_PROMPT):
+    """Fusionne un lot de résumés en un seul via le LLM ; au plus REDUCE_CONCURRENCY fusions simultanées."""
+    budget = reduce_budget(prompt_template)
+    prompt = prompt_template.format(summaries=truncate_to_tokens(SUMMARY_SEPARATOR.join(group), budget))
+    cache_key = cache_service_instance.make_key(prompt, mode, model_choice)
+    cached = await run_blocking(parsing_executor, cache_service_instance.get, "reduce", cache_key)
+    if cached is not None:
+        return position, cached
+    async with reduce_semaphore:
+        merged = await collect_answer(prompt, mode, model_choice)
+    if is_error_output(merged):
+        # On garde le contenu brut, raccourci pour que la réduction progresse malgré l'erreur.
+        print(f"ERREUR lors d'une réduction intermédiaire : {merged[:200]}")
+        return position, truncate_to_tokens(SUMMARY_SEPARATOR.join(group), REDUCE_OUTPUT_TOKENS)
+    await run_blocking(parsing_executor, cache_service_instance.set, "reduce", cache_key, merged)
+    return position, merged
+
+async def reduce_until_fits(summaries, budget, mode, model_choice, prompt_template=REDUCE_PROMPT):
+    """
+    Réduction hiérarchique : tant que plusieurs résumés dépassent ensemble `budget` tokens, ils sont fusionnés
+    par lots remplissant la fenêtre du modèle (en parallèle, dans la limite de REDUCE_CONCURRENCY).
+
+    Returns:
+        tuple: (résumés restants, nombre de niveaux de réduction effectués).
+    """
+    level = 0
+    while len(summaries) > 1 and estimate_tokens(SUMMARY_SEPARATOR.join(summaries)) > budget and level < MAX_REDUCE_LEVELS:
+        level += 1
+        groups = group_summaries(summaries, reduce_budget(prompt_template))
+        merged = await asyncio.gather(*(reduce_group(position, group, mode, model_choice, prompt_template) for position, group in enumerate(groups)))
+        summaries = [summary for _, summary in merged]
+    return summaries, level
+
+async def stream_final_synthesis(final_prompt, mode, model_choice, strategy="single", providers=None):
+    """Diffuse la synthèse finale, en la rejouant depuis le cache si ce prompt a déjà été traité par ce modèle."""
+    cache_key = cache_service_instance.make_key(final_prompt, mode, model_choice, strategy, ",".join(providers or []))
+    cached = await run_blocking(parsing_executor, cache_service_instance.get, "synthesis", cache_key)
+    if cached is not None:
+        yield cached
+        return
+    tokens = []
+    async for token in qa_service_instance.ask(final_prompt, "", mode, model_choice, strategy=strategy, providers=providers):
+        tokens.append(token)
+        yield token
+    synthesis = "".join(tokens)
+    if not is_error_output(synthesis):
+        await run_blocking(parsing_executor, cache_service_instance.set, "synthesis", cache_key, synthesis)
+
+async def stream_audio_upload(tmp_path, filename, language, source_key=None):
+    """Diffuse (NDJSON) les segments transcrits au fur et à mesure, puis l'identifiant du document."""
+    segments = []
+    try:
+        async for segment in iterate_in_executor(transcription_service_instance.transcribe_stream(tmp_path, language), inference_executor):
+            segments.append(segment["text"])
+            yield json.dumps({"type": "segment", **segment}, ensure_ascii=False) + "\n"
+        text = " ".join(segments)
+        if not text.strip():
+            yield json.dumps({"type": "error", "message": "Fichier vide ou contenu non extrait."}, ensure_ascii=False) + "\n"
+            return
+        document_id = await register_document(text, filename, True, source_key)
+        yield json.dumps({"type": "done", "message": "Fichier traité.", "document_id": document_id, "full_text": text, "is_audio": True}, ensure_ascii=False) + "\n"
+    except Exception as e:
+        yield json.dumps({"type": "error", "message": f"Erreur: {e}"}, ensure_ascii=False) + "\n"
+    finally:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+
+async def stream_pdf_upload(tmp_path, filename, source_key=None):
+    """Diffuse (NDJSON) le texte de chaque page dès qu'il est extrait, puis l'identifiant du document."""
+    try:
+        page_count = await open_pdf(tmp_path)
+        yield json.dumps({"type": "start", "pages": page_count}) + "\n"
+        pages = []
+        async for index, page in stream_pdf_pages(tmp_path, page_count):
+            pages.append(page)
+            yield json.dumps({"type": "page", "page": index + 1, "total": page_count, "text": page}, ensure_ascii=False) + "\n"
+        text, page_offsets = join_pages(pages)
+        if not text.strip():
+            yield json.dumps({"type": "error", "message": "Fichier vide ou contenu non extrait (PDF scanné sans texte ?)."}, ensure_ascii=False) + "\n"
+            return
+        document_id = await register_document(text, filename, False, source_key, page_offsets=page_offsets)
+        yield json.dumps({"type": "done", "message": "Fichier traité.", "document_id": document_id, "full_text": text, "is_audio": False, "page_offsets": page_offsets}, ensure_ascii=False) + "\n"
+    except Exception as e:
+        yield json.dumps({"type": "error", "message": str(e) if isinstance(e, DocumentTooLargeError) else f"Erreur: {e}"}, ensure_ascii=False) + "\n"
+    finally:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+
+@app.post("/upload-file-stream/")
+async def upload_file_stream(file: UploadFile = File(...), language: str = Form("auto")):
+    """Chargement en flux : segments horodatés (audio) ou pages (PDF) envoyés dès qu'ils sont prêts."""
+    filename = file.filename
+    if not is_pdf_file(filename) and not is_audio_file(filename):
+        return JSONResponse(status_code=400, content={"message": "Format de fichier non supporté pour le chargement en flux (audio ou PDF)."})
+    try:
+        tmp_path = await save_upload(file, max_bytes=PDF_MAX_BYTES if is_pdf_file(filename) else None)
+    except DocumentTooLargeError as e:
+        return JSONResponse(status_code=413, content={"message": str(e)})
+    # Le fichier temporaire est supprimé ici, sauf s'il est confié au flux (qui le supprime à la fin).
+    streaming = False
+    try:
+        source_key = await upload_source_key(tmp_path, filename, language)
+        processed = await run_blocking(parsing_executor, find_processed_source, source_key)
+        if processed:
+            return StreamingResponse(iter([ndjson({"type": "done", **processed})]), media_type="application/x-ndjson")
+        streaming = True
+        if is_pdf_file(filename):
+            return StreamingResponse(stream_pdf_upload(tmp_path, filename, source_key), media_type="application/x-ndjson")
+        return StreamingResponse(stream_audio_upload(tmp_path, filename, language, source_key), media_type="application/x-ndjson")
+    finally:
+        if not streaming and os.path.exists(tmp_path): os.remove(tmp_path)
+
+# --- INGESTION GROUPÉE ---
+
+def ndjson(event):
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+async def stream_batch_ingestion(text_files, audio_files, manifest, language):
+    """
+    Traite un lot de fichiers et diffuse (NDJSON) un événement par fichier terminé, puis le manifeste.
+    Les documents texte sont analysés en parallèle dans un pool de processus ; les fichiers
+    audio passent ensemble dans le pipeline Whisper, par lots.
+    """
+    total = len(manifest)
+    done = sum(1 for entry in manifest if entry["status"] != "pending")
+    yield ndjson({"type": "start", "total": total})
+
+    async def parse(entry, content_bytes, source_key):
+        try:
+            text = await asyncio.get_running_loop().run_in_executor(get_process_pool(), extract_text, entry["filename"], content_bytes)
+            return entry, text, None, source_key
+        except Exception as e:
+            return entry, None, e, source_key
+
+    async def finish(entry, text, error, is_audio, source_key):
+        if error is not None:
+            entry.update(status="error", error=str(error))
+        elif not text or not text.strip():
+            entry.update(status="error", error="Fichier vide ou contenu non extrait.")
+        else:
+            entry.update(status="ok", document_id=await register_document(text, entry["filename"], is_audio, source_key), chars=len(text))
+
+    pending = [asyncio.ensure_future(parse(entry, content_bytes, source_key)) for entry, content_bytes, source_key in text_files]
+    try:
+        for next_done in asyncio.as_completed(pending):
+            entry, text, error, source_key = await next_done
+            await finish(entry, text, error, False, source_key)
+            done += 1
+            yield ndjson({"type": "file", "done": done, "total": total, **entry})
+    finally:
+        for task in pending: task.cancel()
+
+    if audio_files:
+        entries = [entry for entry, _, _ in audio_files]
+        paths = [path for _, path, _ in audio_files]
+        try:
+            async for index, text in iterate_in_executor(transcription_service_instance.transcribe_batch(paths, language), inference_executor):
+                await finish(entries[index], text, None, True, audio_files[index][2])
+                done += 1
+                yield ndjson({"type": "file", "done": done, "total": total, **entries[index]})
+        except Exception as e:
+            for entry in entries:
+                if entry["status"] == "pending":
+                    entry.update(status="error", error=str(e)); done += 1
+                    yield ndjson({"type": "file", "done": done, "total": total, **entry})
+        finally:
+            for path in paths:
+                if os.path.exists(path): os.remove(path)
+
+    yield ndjson({"type": "manifest", "files": manifest})
+
+@app.post("/ingest-batch/")
+async def ingest_batch(files: List[UploadFile] = File(...), language: str = Form("auto")):
+    """Ingestion de nombreux fichiers (ou d'archives zip) en une seule requête, avec progression en flux."""
+    text_files, audio_files, manifest = [], [], []
+
+    async def add(filename, content_bytes):
+        entry = {"filename": filename, "status": "pending", "document_id": None, "is_audio": is_audio_file(filename), "error": None}
+        manifest.append(entry)
+        if not is_audio_file(filename) and not is_text_file(filename):
+            entry.update(status="unsupported", error="Format de fichier non supporté.")
+            return
+        source_key = await run_blocking(parsing_executor, workspace_service_instance.source_key, content_bytes, *source_params(filename, language))
+        processed = await run_blocking(parsing_executor, find_processed_source, source_key)
+        if processed:
+            # Fichier déjà traité : son document est repris de l'espace de travail.
+            entry.update(status="ok", document_id=processed["document_id"], chars=len(processed["full_text"]))
+        elif is_audio_file(filename):
+            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1]) as tmp:
+                tmp.write(content_bytes)
+            audio_files.append((entry, tmp.name, source_key))
+        else:
+            text_files.append((entry, content_bytes, source_key))
+
+    for upload in files:
+        content_bytes = await upload.read()
+        if upload.filename.lower().endswith(".zip"):
+            try:
+                for filename, member_bytes in expand_zip(content_bytes):
+                    await add(filename, member_bytes)
+            except Exception as e:
+                manifest.append({"filename": upload.filename, "status": "error", "document_id": None, "is_audio": False, "error": f"Archive illisible : {e}"})
+        else:
+            await add(upload.filename, content_bytes)
+
+    return StreamingResponse(stream_batch_ingestion(text_files, audio_files, manifest, language), media_type="application/x-ndjson")
+
+async def long_document_streamer(analysis_type, context, mode, model_choice, on_progress=None, translate_from=None, strategy="single", providers=None, on_result=None):
+    """
+    Diffuse la progression puis le résultat de l'analyse d'un long document, par morceaux successifs à mettre bout à bout.
+    `on_progress(fraction, message)` est appelé à chaque étape (utilisé par les tâches de fond).
+    `on_result(synthesis)` reçoit la synthèse finale si elle est complète et sans erreur (pour l'enregistrer) ;
+    il est exécuté dans le pool de parsing.
+    Si `translate_from` (code NLLB) diffère de ANALYSIS_LANGUAGE, le document est d'abord traduit.
+    En mode API, `strategy` et `providers` sont transmis au QAService (voir API_STRATEGIES).
+    """
+    report = on_progress or (lambda fraction, message: None)
     if not context:
         yield "ERREUR : Le contexte est vide."
         return
 
+    if translate_from and translate_from != ANALYSIS_LANGUAGE:
+        yield f"Traduction préalable du document ({translate_from} → {ANALYSIS_LANGUAGE})...\n"
+        report(0.0, "Traduction du document")
+        try:
+            context = await run_blocking(inference_executor, translation_service_instance.translate_batch, context, translate_from, ANALYSIS_LANGUAGE)
+        except Exception as e:
+            yield f"ERREUR lors de la traduction : {e}"
+            return
+        yield "Traduction terminée.\n\n"
+
     if mode == "api":
         yield "Mode API sélectionné. Envoi du document complet...\n\n"
         prompt_template = ANALYSIS_PROMPTS.get(analysis_type, ANALYSIS_PROMPTS["resume_general"])
         final_prompt = prompt_template.format(summaries=context)
-        # ✅ Correction : On utilise `for` au lieu de `async for`
-        for token in qa_service_instance.ask(final_prompt, "", mode, model_choice):
+        tokens = []
+        async for token in stream_final_synthesis(final_prompt, mode, model_choice, strategy, providers):
+            tokens.append(token)
             yield token
     else:
         yield "Mode Local sélectionné. Lancement du processus Map-Reduce...\n"
         yield "Étape 1/3 : Découpage du document...\n"
-        text_chunks = chunk_text(context)
+        text_chunks = await run_blocking(parsing_executor, chunk_text, context)
         yield f"Document découpé en {len(text_chunks)} morceaux.\n\n"
 
-        progress_display = f"Document découpé en {len(text_chunks)} morceaux.\n\nÉtape 2/3 : Création des résumés partiels...\n"
-        yield progress_display
+        yield "Étape 2/3 : Création des résumés partiels...\n"
+
+        intermediate_summaries = await run_blocking(parsing_executor, cached_summaries, text_chunks)
+        to_compute = [i for i, summary_chunk in enumerate(intermediate_summaries) if summary_chunk is None]
+        done_count = len(text_chunks) - len(to_compute)
+        if done_count:
+            yield f"  - {done_count}/{len(text_chunks)} résumés partiels récupérés depuis le cache.\n"
+        batches = [to_compute[i:i + MAP_BATCH_SIZE] for i in range(0, len(to_compute), MAP_BATCH_SIZE)]
+        pending = [asyncio.ensure_future(summarize_chunk_batch(text_chunks, indices)) for indices in batches]
+        try:
+            for next_done in asyncio.as_completed(pending):
+                indices, summaries, error = await next_done
+                done_count += len(indices)
+                labels = ", ".join(str(i + 1) for i in indices)
+                if error is None:
+                    for i, summary_chunk in zip(indices, summaries):
+                        intermediate_summaries[i] = summary_chunk
+                    result_message = f"  - Morceaux {labels} terminés ({done_count}/{len(text_chunks)}).\n"
+                else:
+                    for i in indices:
+                        intermediate_summaries[i] = f"Erreur d'analyse: {error}"
+                    result_message = f"  - Erreur sur les morceaux {labels} ({done_count}/{len(text_chunks)}).\n"
+                yield result_message
+                report(0.7 * done_count / len(text_chunks), result_message.strip())
+        finally:
+            # Si le client se déconnecte, on n'attend plus les lots restants.
+            for task in pending: task.cancel()
 
-        intermediate_summaries = []
-        for i, chunk in enumerate(text_chunks):
-            status_message = f"  - Traitement du morceau {i+1}/{len(text_chunks)}...\n"
-            progress_display += status_message; yield progress_display
+        # Réduction hiérarchique : tant que les résumés dépassent la fenêtre du modèle,
+        # on les fusionne par lots (en parallèle) pour former un niveau supérieur.
+        final_prompt_template = ANALYSIS_PROMPTS.get(analysis_type, ANALYSIS_PROMPTS["resume_general"])
+        budget = reduce_budget(final_prompt_template)
+        level = 0
+        while estimate_tokens(SUMMARY_SEPARATOR.join(intermediate_summaries)) > budget and level < MAX_REDUCE_LEVELS:
+            level += 1
+            groups = group_summaries(intermediate_summaries, budget)
+            yield f"\nRéduction hiérarchique niveau {level} : {len(intermediate_summaries)} résumés regroupés en {len(groups)} lots...\n"
+            report(0.7 + 0.05 * level, f"Réduction hiérarchique niveau {level}")
+            reduced = [None] * len(groups)
+            pending = [asyncio.ensure_future(reduce_group(position, group, mode, model_choice)) for position, group in enumerate(groups)]
             try:
-                summary_chunk = summarization_service_instance.summarize(chunk, min_length=40, max_length=200)
-                intermediate_summaries.append(summary_chunk)
-                result_message = f"    -> Terminé.\n"
-            except Exception as e:
-                result_message = f"    -> Erreur sur le morceau {i+1}.\n"; intermediate_summaries.append(f"Erreur d'analyse: {e}")
-            progress_display += result_message; yield progress_display
+                for count, next_done in enumerate(asyncio.as_completed(pending), start=1):
+                    position, merged = await next_done
+                    reduced[position] = merged
+                    yield f"  - Lot {position + 1} fusionné ({count}/{len(groups)}).\n"
+            finally:
+                for task in pending: task.cancel()
+            intermediate_summaries = reduced
 
         final_synthesis_header = "\n\n----------------------------------\nÉtape 3/3 : Synthèse finale...\n----------------------------------\n\n"
-        progress_display += final_synthesis_header; yield progress_display
+        yield final_synthesis_header
+        report(0.9, "Synthèse finale")
 
-        combined_summaries = "\n\n---\n\n".join(intermediate_summaries)
-        final_prompt_template = ANALYSIS_PROMPTS.get(analysis_type, ANALYSIS_PROMPTS["resume_general"])
+        combined_summaries = truncate_to_tokens(SUMMARY_SEPARATOR.join(intermediate_summaries), budget)
         final_prompt = final_prompt_template.format(summaries=combined_summaries)
 
-        # ✅ Correction : On utilise `for` au lieu de `async for`
-        for token in qa_service_instance.ask(final_prompt, "", mode, model_choice):
-            progress_display += token
-            yield progress_display
+        tokens = []
+        async for token in stream_final_synthesis(final_prompt, mode, model_choice):
+            tokens.append(token)
+            yield token
+
+    synthesis = "".join(tokens)
+    if on_result is not None and not is_error_output(synthesis):
+        await run_blocking(parsing_executor, on_result, synthesis)
+
+async def document_digest(document_id, mode, model_choice):
+    """
+    Résumé d'un document stocké, ramené à CORPUS_DIGEST_TOKENS (étape « map » de l'analyse de corpus).
+
+    En mode local, les résumés partiels (mT5) et les fusions déjà en cache sont réutilisés ; en mode API,
+    le document entier est résumé en un appel. Le résultat est enregistré dans l'espace de travail.
+
+    Returns:
+        tuple: (résumé, True s'il provient de l'espace de travail).
+    """
+    params = {"mode": mode, "model_choice": model_choice, "digest_tokens": CORPUS_DIGEST_TOKENS}
+    if mode == "local":
+        params["summarizer"] = f"{summarization_service_instance.model_id}/{summarization_service_instance.backend}"
+    key = cache_service_instance.make_key(*params.values())
+    stored = await run_blocking(parsing_executor, workspace_service_instance.get_result, document_id, "digest", key)
+    if stored is not None:
+        return stored, True
+
+    text = await run_blocking(parsing_executor, document_store_instance.get_text, document_id)
+    if not text:
+        raise ValueError(DOCUMENT_NOT_FOUND_MESSAGE)
+    if mode == "api":
+        digest = await collect_answer(DIGEST_PROMPT.format(document=text), mode, model_choice)
+    else:
+        text_chunks = await run_blocking(parsing_executor, chunk_text, text)
+        summaries = await run_blocking(parsing_executor, cached_summaries, text_chunks)
+        to_compute = [i for i, summary_chunk in enumerate(summaries) if summary_chunk is None]
+        batches = [to_compute[i:i + MAP_BATCH_SIZE] for i in range(0, len(to_compute), MAP_BATCH_SIZE)]
+        for indices, batch_summaries, error in await asyncio.gather(*(summarize_chunk_batch(text_chunks, indices) for indices in batches)):
+            if error is not None:
+                raise error
+            for i, summary_chunk in zip(indices, batch_summaries):
+                summaries[i] = summary_chunk
+        summaries, _ = await reduce_until_fits(summaries, CORPUS_DIGEST_TOKENS, mode, model_choice)
+        digest = SUMMARY_SEPARATOR.join(summaries)
+    if is_error_output(digest):
+        raise RuntimeError(digest.strip()[:300] or "Résumé vide.")
+    await run_blocking(parsing_executor, workspace_service_instance.put_result, document_id, "digest", key, digest, **params)
+    return digest, False
+
+async def corpus_streamer(document_ids, analysis_type, mode, model_choice, on_progress=None, strategy="single", providers=None):
+    """
+    Analyse d'un corpus de documents stockés : chaque document est résumé (CORPUS_CONCURRENCY à la fois,
+    résumés déjà calculés repris de l'espace de travail), les résumés étiquetés [Doc n] sont fusionnés
+    hiérarchiquement en conservant ces étiquettes, puis une synthèse structurée attribue chaque point
+    aux documents qui l'appuient.
+    """
+    report = on_progress or (lambda fraction, message: None)
+    documents = await run_blocking(parsing_executor, workspace_service_instance.list_documents)
+    filenames = {document["document_id"]: document["filename"] for document in documents}
+    labels = [f"[Doc {n}] {filenames.get(document_id) or document_id[:12]}" for n, document_id in enumerate(document_ids, start=1)]
+    yield f"Analyse de corpus : {len(document_ids)} documents.\n" + "\n".join(labels) + "\n\n"
+    yield "Étape 1/3 : Résumé de chaque document...\n"
+
+    semaphore = asyncio.Semaphore(CORPUS_CONCURRENCY)
+
+    async def digest(position, document_id):
+        async with semaphore:
+            try:
+                return position, *(await document_digest(document_id, mode, model_choice)), None
+            except Exception as e:
+                return position, None, False, e
+
+    digests = [None] * len(document_ids)
+    pending = [asyncio.ensure_future(digest(position, document_id)) for position, document_id in enumerate(document_ids)]
+    try:
+        for done_count, next_done in enumerate(asyncio.as_completed(pending), start=1):
+            position, summary, from_workspace, error = await next_done
+            if error is None:
+                digests[position] = f"{labels[position]}\n{summary}"
+                status = "repris de l'espace de travail" if from_workspace else "résumé"
+            else:
+                status = f"ignoré ({error})"
+            yield f"  - {labels[position]} : {status} ({done_count}/{len(document_ids)}).\n"
+            report(0.7 * done_count / len(document_ids), f"{done_count}/{len(document_ids)} documents résumés")
+    finally:
+        for task in pending: task.cancel()
+
+    digests = [summary for summary in digests if summary is not None]
+    if not digests:
+        yield "ERREUR : aucun document du corpus n'a pu être résumé."
+        return
+
+    instructions = CORPUS_INSTRUCTIONS.get(analysis_type, CORPUS_INSTRUCTIONS["resume_general"])
+    final_prompt_template = CORPUS_PROMPT.format(count=len(digests), instructions=instructions, summaries="{summaries}")
+    budget = reduce_budget(final_prompt_template)
+    yield f"\nÉtape 2/3 : Regroupement des {len(digests)} résumés...\n"
+    if estimate_tokens(SUMMARY_SEPARATOR.join(digests)) > budget:
+        report(0.75, "Fusion hiérarchique des résumés")
+        digests, levels = await reduce_until_fits(digests, budget, mode, model_choice, CORPUS_REDUCE_PROMPT)
+        yield f"  - {levels} niveau(x) de fusion, {len(digests)} résumé(s) restant(s).\n"
+    else:
+        yield "  - Les résumés tiennent dans la synthèse finale : aucune fusion nécessaire.\n"
+
+    yield "\n----------------------------------\nÉtape 3/3 : Synthèse du corpus...\n----------------------------------\n\n"
+    report(0.9, "Synthèse du corpus")
+    final_prompt = final_prompt_template.format(summaries=truncate_to_tokens(SUMMARY_SEPARATOR.join(digests), budget))
+    async for token in stream_final_synthesis(final_prompt, mode, model_choice, strategy, providers):
+        yield token
+
+@app.get("/cache-stats/")
+async def cache_stats():
+    stats = cache_service_instance.stats()
+    stats["answers"] = answer_cache_instance.stats()
+    stats["workspace"] = await run_blocking(parsing_executor, workspace_service_instance.stats)
+    return stats
+
+# --- ESPACE DE TRAVAIL ---
+
+@app.get("/documents/")
+async def list_documents():
+    """Documents conservés dans l'espace de travail (sans leur texte)."""
+    return {"documents": await run_blocking(parsing_executor, workspace_service_instance.list_documents)}
+
+@app.get("/documents/{document_id}")
+async def get_document(document_id: str):
+    """Document stocké (même réponse qu'un upload) et résultats d'analyse déjà enregistrés."""
+    document = await run_blocking(parsing_executor, document_store_instance.get, document_id)
+    if document is None:
+        return JSONResponse(status_code=404, content={"message": DOCUMENT_NOT_FOUND_MESSAGE})
+    results = await run_blocking(parsing_executor, workspace_service_instance.list_results, document_id)
+    return {**document_response(document_id, document, "Document rechargé depuis l'espace de travail."), "results": results}
+
+@app.delete("/documents/{document_id}")
+async def delete_document(document_id: str):
+    """Supprime un document de l'espace de travail, avec ses résultats."""
+    if await run_blocking(parsing_executor, document_store_instance.get, document_id) is None:
+        return JSONResponse(status_code=404, content={"message": DOCUMENT_NOT_FOUND_MESSAGE})
+    await run_blocking(parsing_executor, document_store_instance.delete, document_id)
+    ollama_session_store_instance.reset(document_id)
+    return {"document_id": document_id, "deleted": True}
+
+def parse_providers(providers):
+    """Liste de fournisseurs d'API reçue sous forme 'gemini,openai' ; None pour tous ceux configurés."""
+    return [p.strip().lower() for p in providers.split(",") if p.strip()] if providers else None
+
+# Taille des morceaux lorsqu'une réponse en cache est rejouée en flux.
+ANSWER_REPLAY_CHUNK_CHARS = 200
+
+async def replay_answer(answer):
+    """Rejoue une réponse en cache par morceaux, comme une réponse diffusée par le modèle."""
+    for start in range(0, len(answer), ANSWER_REPLAY_CHUNK_CHARS):
+        yield answer[start:start + ANSWER_REPLAY_CHUNK_CHARS]
+
+async def stream_and_cache_answer(stream, document_key, model_key, question):
+    """Diffuse la réponse du modèle et la met en cache si elle est arrivée complète et sans erreur."""
+    tokens = []
+    async for token in stream:
+        tokens.append(token)
+        yield token
+    answer = "".join(tokens)
+    if not is_error_output(answer):
+        answer_cache_instance.store(document_key, model_key, question, answer)
+
+def analysis_saver(document_id, analysis_type, **params):
+    """Rappel `on_result` qui enregistre la synthèse d'un document stocké dans l'espace de travail, rangée par paramètres."""
+    if not document_id:
+        return None
+    key = cache_service_instance.make_key(*params.values())
+    return lambda synthesis: workspace_service_instance.put_result(document_id, analysis_type, key, synthesis, **params)
+
+def resolve_context(document_id, context):
+    """
+    Retourne le texte à analyser : celui du document stocké côté serveur, sinon le contexte envoyé.
+    Fonction bloquante (relecture possible dans l'espace de travail), exécutée dans le pool de parsing.
+    """
+    if document_id:
+        return document_store_instance.get_text(document_id)
+    return context
+
+def check_analysis_request(strategy, mode, model_choice):
+    """Retourne une JSONResponse d'erreur si la stratégie est inconnue ou si Ollama est saturé, sinon None."""
+    if strategy not in API_STRATEGIES:
+        return JSONResponse(status_code=400, content={"message": f"Stratégie inconnue. Choix possibles : {', '.join(API_STRATEGIES)}."})
+    if mode == "local" and ollama_client_instance.is_saturated(qa_service_instance.ollama_model(model_choice)):
+        return JSONResponse(status_code=503, content={"message": OLLAMA_BUSY_MESSAGE})
+    return None
 
 @app.post("/long-document-analysis/")
-async def long_document_analysis(analysis_type: str = Form(...), context: str = Form(...), mode: str = Form("local"), model_choice: str = Form("auto")):
-    return StreamingResponse(long_document_streamer(analysis_type, context, mode, model_choice), media_type="text/event-stream")
+async def long_document_analysis(analysis_type: str = Form(...), document_id: str = Form(None), context: str = Form(None), mode: str = Form("local"), model_choice: str = Form("auto"), translate_from: str = Form(None), strategy: str = Form("single"), providers: str = Form(None)):
+    context = await run_blocking(parsing_executor, resolve_context, document_id, context)
+    if document_id and context is None:
+        return JSONResponse(status_code=404, content={"message": DOCUMENT_NOT_FOUND_MESSAGE})
+    error = check_analysis_request(strategy, mode, model_choice)
+    if error is not None:
+        return error
+    on_result = analysis_saver(document_id, analysis_type, mode=mode, model_choice=model_choice, translate_from=translate_from, strategy=strategy, providers=providers)
+    streamer = long_document_streamer(analysis_type, context, mode, model_choice, translate_from=translate_from, strategy=strategy, providers=parse_providers(providers), on_result=on_result)
+    return StreamingResponse(streamer, media_type="text/event-stream")
+
+def parse_document_ids(document_ids):
+    """Identifiants de documents reçus sous forme 'id1,id2', sans doublons, dans l'ordre."""
+    return list(dict.fromkeys(i.strip() for i in document_ids.split(",") if i.strip()))
+
+def missing_documents(document_ids):
+    """Identifiants des documents introuvables, en mémoire comme dans l'espace de travail. Fonction bloquante."""
+    return [document_id for document_id in document_ids if document_store_instance.get(document_id) is None]
+
+async def check_corpus_request(document_ids, strategy, mode, model_choice):
+    """Retourne une JSONResponse d'erreur si la demande d'analyse de corpus n'est pas recevable, sinon None."""
+    if not document_ids:
+        return JSONResponse(status_code=400, content={"message": "Aucun document sélectionné."})
+    missing = await run_blocking(parsing_executor, missing_documents, document_ids)
+    if missing:
+        return JSONResponse(status_code=404, content={"message": DOCUMENT_NOT_FOUND_MESSAGE, "missing": missing})
+    return check_analysis_request(strategy, mode, model_choice)
+
+@app.post("/corpus-analysis/")
+async def corpus_analysis(document_ids: str = Form(...), analysis_type: str = Form("resume_general"), mode: str = Form("local"), model_choice: str = Form("auto"), strategy: str = Form("single"), providers: str = Form(None)):
+    """Analyse transversale de plusieurs documents stockés (identifiants séparés par des virgules)."""
+    document_ids = parse_document_ids(document_ids)
+    error = await check_corpus_request(document_ids, strategy, mode, model_choice)
+    if error is not None:
+        return error
+    streamer = corpus_streamer(document_ids, analysis_type, mode, model_choice, strategy=strategy, providers=parse_providers(providers))
+    return StreamingResponse(streamer, media_type="text/event-stream")
+
+@app.post("/translate/")
+async def translate_document(src_lang: str = Form(...), target_lang: str = Form(ANALYSIS_LANGUAGE), document_id: str = Form(None), context: str = Form(None)):
+    """Traduit un document par lots de phrases et enregistre la traduction comme un nouveau document."""
+    text = await run_blocking(parsing_executor, resolve_context, document_id, context)
+    if document_id and text is None:
+        return JSONResponse(status_code=404, content={"message": DOCUMENT_NOT_FOUND_MESSAGE})
+    if not text or not text.strip():
+        return JSONResponse(status_code=400, content={"message": "Le texte à traduire est vide."})
+    try:
+        translated_text = await run_blocking(inference_executor, translation_service_instance.translate_batch, text, src_lang, target_lang)
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"message": f"Erreur de traduction : {e}"})
+
+    source = await run_blocking(parsing_executor, document_store_instance.get, document_id) if document_id else None
+    metadata = source["metadata"] if source else {}
+    filename = f"{metadata.get('filename', 'texte')} ({target_lang})"
+    translated_id = await register_document(translated_text, filename, metadata.get("is_audio", False))
+    return {"document_id": translated_id, "translated_text": translated_text, "src_lang": src_lang, "target_lang": target_lang}
+
+def page_label(page_offsets, start, length):
+    """Étiquette '[Page 3]' ou '[Pages 3-4]' d'un passage situé à `start` dans le texte d'un PDF."""
+    first, last = page_for_offset(page_offsets, start), page_for_offset(page_offsets, start + max(length - 1, 0))
+    return f"[Page {first}]" if first == last else f"[Pages {first}-{last}]"
+
+def select_relevant_context(context, question, top_k=RETRIEVAL_TOP_K, document_id=None):
+    """Pour un long document, ne garde que les passages les plus pertinents pour la question."""
+    if len(context) <= RETRIEVAL_MIN_CHARS:
+        return context
+    passages = retrieval_service_instance.retrieve(context, question, top_k=top_k, key=document_id)
+    if not passages:
+        return context[:RETRIEVAL_MIN_CHARS]
+    # Pour un PDF, chaque passage est précédé de sa page, que le modèle peut citer.
+    document = document_store_instance.get(document_id) if document_id else None
+    page_offsets = document["metadata"].get("page_offsets") if document else None
+    if page_offsets:
+        passages = [f"{page_label(page_offsets, context.find(passage), len(passage))}\n{passage}" for passage in passages]
+    return SUMMARY_SEPARATOR.join(passages)
 
 @app.post("/ask-question/")
-async def ask_question(question: str = Form(...), context: str = Form(...), mode: str = Form("local"), model_choice: str = Form("auto")):
+async def ask_question(question: str = Form(...), document_id: str = Form(None), context: str = Form(None), mode: str = Form("local"), model_choice: str = Form("auto"), top_k: int = Form(RETRIEVAL_TOP_K), strategy: str = Form("single"), providers: str = Form(None), session: bool = Form(False), use_cache: bool = Form(True)):
+    context = await run_blocking(parsing_executor, resolve_context, document_id, context)
+    if document_id and context is None:
+        return JSONResponse(status_code=404, content={"message": DOCUMENT_NOT_FOUND_MESSAGE})
     if not context:
         return JSONResponse(status_code=400, content={"message": "Le contexte est vide."})
-    return StreamingResponse(qa_service_instance.ask(context, question, mode, model_choice), media_type="text/event-stream")
+    if strategy not in API_STRATEGIES:
+        return JSONResponse(status_code=400, content={"message": f"Stratégie inconnue. Choix possibles : {', '.join(API_STRATEGIES)}."})
+    # Une question équivalente déjà posée sur ce document avec ce modèle est servie depuis le cache des réponses.
+    document_key = document_id or document_store_instance.document_id(context)
+    model_key = cache_service_instance.make_key(mode, model_choice, strategy, providers, top_k)
+    if use_cache and not session:
+        cached = answer_cache_instance.lookup(document_key, model_key, question)
+        if cached is not None:
+            print(f"Réponse servie depuis le cache (question équivalente : « {cached['question']} »).")
+            return StreamingResponse(replay_answer(cached["answer"]), media_type="text/event-stream")
+    if mode == "local" and ollama_client_instance.is_saturated(qa_service_instance.ollama_model(model_choice)):
+        return JSONResponse(status_code=503, content={"message": OLLAMA_BUSY_MESSAGE})
+    # Session : le document entier sert de préfixe stable, évalué une seule fois par Ollama.
+    if session and mode == "local" and document_id and len(context) <= OLLAMA_SESSION_MAX_CHARS:
+        answer = qa_service_instance.ask_in_session(document_id, context, question, model_choice)
+        return StreamingResponse(answer, media_type="text/event-stream")
+    relevant_context = await run_blocking(parsing_executor, select_relevant_context, context, question, top_k, document_id)
+    answer = qa_service_instance.ask(relevant_context, question, mode, model_choice, strategy=strategy, providers=parse_providers(providers))
+    return StreamingResponse(stream_and_cache_answer(answer, document_key, model_key, question), media_type="text/event-stream")
 
 @app.post("/summarize-context/")
-async def summarize_context(context: str = Form(...), is_audio: bool = Form(...), min_length: int = Form(30), max_length: int = Form(150)):
+async def summarize_context(is_audio: bool = Form(False), document_id: str = Form(None), context: str = Form(None), min_length: int = Form(30), max_length: int = Form(150)):
+    if document_id:
+        document = await run_blocking(parsing_executor, document_store_instance.get, document_id)
+        if document is None:
+            return JSONResponse(status_code=404, content={"message": DOCUMENT_NOT_FOUND_MESSAGE})
+        context, is_audio = document["text"], document["metadata"].get("is_audio", False)
     if not is_audio:
         return JSONResponse(status_code=400, content={"message": "Le résumé automatique est uniquement disponible pour les fichiers audio transcrits."})
     if not context:
         return JSONResponse(status_code=400, content={"message": "Le contexte est vide."})
     try:
-        summary = summarization_service_instance.summarize(context, min_length, max_length)
+        summary = await run_blocking(inference_executor, summarization_service_instance.summarize, context, min_length, max_length)
+        if document_id and not is_error_output(summary):
+            params = {"model": summarization_service_instance.model_id, "min_length": min_length, "max_length": max_length}
+            await run_blocking(parsing_executor, workspace_service_instance.put_result, document_id, "summary", cache_service_instance.make_key(*params.values()), summary, **params)
         return {"summary": summary}
     except Exception as e:
         return JSONResponse(status_code=500, content={"message": f"Erreur: {e}"})
 
+async def stream_speech(text):
+    """Diffuse un WAV : l'en-tête dès le premier segment synthétisé, puis l'audio de chaque segment dès qu'il est prêt."""
+    header_sent = False
+    try:
+        async for sampling_rate, audio in iterate_in_executor(tts_service_instance.synthesize_stream(text), inference_executor):
+            if not header_sent:
+                yield wav_header(sampling_rate)
+                header_sent = True
+            yield to_pcm16(audio)
+    except Exception as e:
+        # L'en-tête est peut-être déjà parti : l'erreur ne peut qu'être journalisée et le flux interrompu.
+        print(f"ERREUR lors de la synthèse vocale en flux : {e}")
+
+@app.post("/synthesize/")
+async def synthesize_speech(document_id: str = Form(None), text: str = Form(None)):
+    """Lit un texte (ou un document stocké) à voix haute, en flux WAV (PCM 16 bits, mono)."""
+    text = await run_blocking(parsing_executor, resolve_context, document_id, text)
+    if document_id and text is None:
+        return JSONResponse(status_code=404, content={"message": DOCUMENT_NOT_FOUND_MESSAGE})
+    if not text or not text.strip():
+        return JSONResponse(status_code=400, content={"message": "Le texte à synthétiser est vide."})
+    # Le modèle est chargé avant de répondre, pour pouvoir encore signaler un échec par un code HTTP.
+    if await run_blocking(inference_executor, model_registry_instance.get, "tts") is None:
+        return JSONResponse(status_code=503, content={"message": "Le modèle TTS n'a pas pu être chargé."})
+    return StreamingResponse(stream_speech(text), media_type="audio/wav")
+
+# --- TÂCHES DE FOND (transcription et analyse de long document) ---
+
+JOB_NOT_FOUND_MESSAGE = "Tâche introuvable."
+
+@app.post("/jobs/transcription/")
+async def submit_transcription_job(file: UploadFile = File(...), language: str = Form("auto"), priority: int = Form(5)):
+    filename = file.filename
+    if not is_audio_file(filename):
+        return JSONResponse(status_code=400, content={"message": "Format de fichier audio non supporté."})
+    tmp_path = await save_upload(file)
+    try:
+        source_key = await upload_source_key(tmp_path, filename, language)
+        processed = await run_blocking(parsing_executor, find_processed_source, source_key)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    if processed:
+        # Déjà transcrit : pas de tâche, le résultat est renvoyé directement.
+        os.remove(tmp_path)
+        return {"job_id": None, "status": "done", "result": processed}
+
+    async def run(job):
+        job.update(0.05, "Transcription en cours...")
+        segments = []
+        async for segment in iterate_in_executor(transcription_service_instance.transcribe_stream(tmp_path, language), inference_executor):
+            segments.append(segment["text"])
+            job.update(message=f"{segment['end']:.0f} s transcrites...", partial=" ".join(segments))
+        text = " ".join(segments)
+        if not text.strip():
+            raise ValueError("Fichier vide ou contenu non extrait.")
+        job.update(0.95, "Indexation du document...")
+        document_id = await register_document(text, filename, True, source_key)
+        return {"message": "Fichier traité.", "document_id": document_id, "full_text": text, "is_audio": True}
+
+    def cleanup():
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+
+    job = job_service_instance.submit("transcription", run, resource="whisper", priority=priority, cleanup=cleanup)
+    return {"job_id": job.id, "status": job.status}
+
+@app.post("/jobs/long-document-analysis/")
+async def submit_long_document_job(analysis_type: str = Form(...), document_id: str = Form(...), mode: str = Form("local"), model_choice: str = Form("auto"), priority: int = Form(5), translate_from: str = Form(None), strategy: str = Form("single"), providers: str = Form(None)):
+    context = await run_blocking(parsing_executor, document_store_instance.get_text, document_id)
+    if context is None:
+        return JSONResponse(status_code=404, content={"message": DOCUMENT_NOT_FOUND_MESSAGE})
+    error = check_analysis_request(strategy, mode, model_choice)
+    if error is not None:
+        return error
+
+    on_result = analysis_saver(document_id, analysis_type, mode=mode, model_choice=model_choice, translate_from=translate_from, strategy=strategy, providers=providers)
+
+    async def run(job):
+        output = []
+        async for piece in long_document_streamer(analysis_type, context, mode, model_choice, on_progress=job.update, translate_from=translate_from, strategy=strategy, providers=parse_providers(providers), on_result=on_result):
+            output.append(piece)
+        return {"output": "".join(output)}
+
+    job = job_service_instance.submit("long_document_analysis", run, resource="mt5" if mode == "local" else None, priority=priority)
+    return {"job_id": job.id, "status": job.status}
+
+@app.post("/jobs/corpus-analysis/")
+async def submit_corpus_job(document_ids: str = Form(...), analysis_type: str = Form("resume_general"), mode: str = Form("local"), model_choice: str = Form("auto"), priority: int = Form(5), strategy: str = Form("single"), providers: str = Form(None)):
+    document_ids = parse_document_ids(document_ids)
+    error = await check_corpus_request(document_ids, strategy, mode, model_choice)
+    if error is not None:
+        return error
+
+    async def run(job):
+        output = []
+        async for piece in corpus_streamer(document_ids, analysis_type, mode, model_choice, on_progress=job.update, strategy=strategy, providers=parse_providers(providers)):
+            output.append(piece)
+        return {"output": "".join(output)}
+
+    job = job_service_instance.submit("corpus_analysis", run, resource="mt5" if mode == "local" else None, priority=priority)
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/jobs/")
+async def list_jobs():
+    return {"jobs": job_service_instance.list_jobs(), "stats": job_service_instance.stats()}
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    job = job_service_instance.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"message": JOB_NOT_FOUND_MESSAGE})
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = job_service_instance.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"message": JOB_NOT_FOUND_MESSAGE})
+    if job.status != "done":
+        return JSONResponse(status_code=409, content={"message": f"La tâche n'est pas terminée (statut : {job.status}).", "status": job.status})
+    return job.result
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    if not job_service_instance.cancel(job_id):
+        return JSONResponse(status_code=404, content={"message": "Tâche introuvable ou déjà terminée."})
+    return {"job_id": job_id, "message": "Annulation demandée."}
+
+# --- ÉTAT DU SERVICE ---
+
+@app.on_event("startup")
+async def warm_up_models():
+    # Les modèles sont chargés à la première utilisation ; WARMUP_MODELS permet d'en précharger en arrière-plan.
+    if WARMUP_MODELS:
+        model_registry_instance.warm_up(WARMUP_MODELS)
+
+@app.get("/health")
+async def health():
+    """Le processus répond : les requêtes peuvent être envoyées (les modèles se chargent à la demande)."""
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """Prêt lorsque tous les modèles à précharger (WARMUP_MODELS) sont chargés."""
+    models = model_registry_instance.status()
+    is_ready = all(model_registry_instance.is_loaded(name) for name in WARMUP_MODELS if name in models)
+    return JSONResponse(status_code=200 if is_ready else 503, content={"ready": is_ready, "models": models})
+
+@app.get("/ollama-metrics/")
+async def ollama_metrics():
+    """Profondeur de file d'attente, générations en cours ou abandonnées, et réutilisation du contexte des sessions."""
+    stats = ollama_client_instance.stats()
+    stats["sessions"] = ollama_session_store_instance.stats()
+    return stats
+
+@app.delete("/ollama-sessions/{document_id}")
+async def reset_ollama_sessions(document_id: str):
+    """Oublie la conversation en cours sur un document : la prochaine question relira le document."""
+    return {"reset": ollama_session_store_instance.reset(document_id)}
+
+@app.get("/models/")
+async def models_residency():
+    """Modèles résidents, mémoire estimée, budget du gestionnaire de résidence et moteurs d'inférence."""
+    stats = model_registry_instance.stats()
+    stats["backends"] = {
+        "summarization": summarization_service_instance.backend,
+        "transcription": transcription_service_instance.backend,
+        "translation": translation_service_instance.backend,
+    }
+    stats["api_providers"] = qa_service_instance.available_providers()
+    return stats
+
+@app.on_event("shutdown")
+async def close_clients():
+    await qa_service_instance.aclose()
+    cache_service_instance.flush()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -2,8 +2,11 @@
 import streamlit as st
 import requests
 import os
+import time
+import json
 from dotenv import load_dotenv
 from utils_streamlit import generate_advanced_wordcloud, get_download_data
+from analytics_streamlit import compute_text_analytics, UNIT_MODES
 
 # --- CONFIGURATION DE LA PAGE ---
 st.set_page_config(
@@ -18,14 +21,24 @@ load_dotenv()
 # Modèles disponibles (similaire à la version Gradio)
 MODELS_STANDARD = ["auto", "codellama:latest", "llava:latest"]
 MODELS_REASONING = ["phi4-mini-reasoning:latest", "deepseek-r1:8b"]
-MODELS_API = [os.getenv("GEMINI_MODEL_NAME", "gemini-flash")] if os.getenv("GOOGLE_API_KEY") else ["api_non_configuree"]
+# Un modèle par fournisseur d'API configuré ; le backend déduit le fournisseur du nom du modèle.
+MODELS_API = [name for name, key in [
+    (os.getenv("GEMINI_MODEL_NAME", "gemini-1.5-flash"), "GOOGLE_API_KEY"),
+    (os.getenv("OPENAI_MODEL", "gpt-4o-mini"), "OPENAI_API_KEY"),
+    (os.getenv("ANTHROPIC_MODEL", "claude-3-5-haiku-latest"), "ANTHROPIC_API_KEY"),
+] if os.getenv(key)] or ["api_non_configuree"]
+# Stratégies lorsque plusieurs fournisseurs sont configurés (voir API_STRATEGIES du QAService).
+API_STRATEGIES = {"Modèle sélectionné": "single", "Course (le plus rapide répond)": "race", "Ensemble (réponses côte à côte)": "ensemble"}
 
 BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:8000")
+ANALYSIS_LABELS = {"resume_general": "Synthèse Générale", "suivi_evaluation": "Analyse Suivi-Évaluation", "analyse_opinions": "Analyse d'Opinions"}
 
 # --- INITIALISATION DE L'ÉTAT DE SESSION ---
 def init_session_state():
     if 'context' not in st.session_state:
         st.session_state.context = ""
+    if 'document_id' not in st.session_state:
+        st.session_state.document_id = ""
     if 'is_audio' not in st.session_state:
         st.session_state.is_audio = False
     if 'upload_status' not in st.session_state:
@@ -39,31 +52,147 @@ init_session_state()
 
 # --- FONCTIONS DE COMMUNICATION AVEC LE BACKEND ---
 
-def upload_file_to_backend(uploaded_file, language):
-    if uploaded_file is not None:
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.m4a', '.flac', '.ogg')
+JOB_POLL_INTERVAL_S = 2
+
+def apply_upload_result(result):
+    st.session_state.context = result.get("full_text", "")
+    st.session_state.document_id = result.get("document_id", "")
+    st.session_state.is_audio = result.get("is_audio", False)
+    st.session_state.upload_status = result.get("message", "Erreur lors du traitement.")
+    if result.get("table"):
+        st.session_state.upload_status += f" {result['table']['rows']} réponses lues dans la colonne « {result['table']['text_column']} »."
+    st.session_state.summary = "" # Réinitialiser le résumé lors d'un nouveau chargement
+    st.session_state.stored_results = result.get("results", [])
+    st.session_state.active_tab = "Analyse"
+    # L'identifiant dans l'URL permet de retrouver le document après un rafraîchissement de la page.
+    st.query_params["document"] = st.session_state.document_id
+
+def load_stored_document(document_id):
+    """Recharge un document de l'espace de travail du backend, avec ses résultats déjà calculés. Retourne True si trouvé."""
+    try:
+        response = requests.get(f"{BACKEND_URL}/documents/{document_id}", timeout=60)
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        st.error(f"Erreur de communication avec le backend : {e}")
+        return False
+    result = response.json()
+    apply_upload_result(result)
+    summaries = [stored["value"] for stored in result["results"] if stored["kind"] == "summary"]
+    if summaries:
+        st.session_state.summary = summaries[0]
+    return True
+
+def fetch_workspace_documents():
+    try:
+        response = requests.get(f"{BACKEND_URL}/documents/", timeout=30)
+        response.raise_for_status()
+        return response.json()["documents"]
+    except requests.exceptions.RequestException as e:
+        st.error(f"Impossible de lire l'espace de travail : {e}")
+        return []
+
+# Après un rafraîchissement, la session est vide : le document indiqué dans l'URL est rechargé.
+if not st.session_state.context and st.query_params.get("document"):
+    if not load_stored_document(st.query_params["document"]):
+        del st.query_params["document"]
+
+def wait_for_job(job_id):
+    """Interroge le backend jusqu'à la fin de la tâche en affichant sa progression. Retourne son résultat ou None."""
+    progress_bar = st.progress(0.0, text="En attente...")
+    partial_display = st.empty()
+    while True:
+        status = requests.get(f"{BACKEND_URL}/jobs/{job_id}", timeout=30).json()
+        progress_bar.progress(status.get("progress", 0.0), text=status.get("message", ""))
+        if status.get("partial"):
+            # Affiche la fin du texte déjà transcrit pendant que la tâche continue.
+            partial_display.caption(status["partial"][-1500:])
+        if status["status"] == "done":
+            response = requests.get(f"{BACKEND_URL}/jobs/{job_id}/result", timeout=60)
+            response.raise_for_status()
+            return response.json()
+        if status["status"] in ("error", "cancelled"):
+            st.error(status.get("message", "La tâche a échoué."))
+            return None
+        time.sleep(JOB_POLL_INTERVAL_S)
+
+def upload_audio_as_job(uploaded_file, language):
+    """Les fichiers audio sont transcrits par une tâche de fond, pour ne pas garder la requête ouverte."""
+    files = {'file': (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
+    try:
+        response = requests.post(f"{BACKEND_URL}/jobs/transcription/", files=files, data={'language': language}, timeout=300)
+        response.raise_for_status()
+        submitted = response.json()
+        # Fichier déjà transcrit : le backend renvoie directement le résultat, sans tâche.
+        result = submitted.get("result") or wait_for_job(submitted["job_id"])
+        if result:
+            apply_upload_result(result)
+            st.success("Fichier traité avec succès !")
+    except requests.exceptions.RequestException as e:
+        st.error(f"Erreur de communication avec le backend : {e}")
+
+def upload_pdf_stream(uploaded_file):
+    """Les PDF sont extraits page par page : la progression s'affiche à mesure que les pages arrivent."""
+    files = {'file': (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
+    progress_bar = st.progress(0.0, text="Extraction du PDF...")
+    try:
+        with requests.post(f"{BACKEND_URL}/upload-file-stream/", files=files, stream=True, timeout=900) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event["type"] == "page":
+                    progress_bar.progress(event["page"] / event["total"], text=f"Page {event['page']}/{event['total']} extraite")
+                elif event["type"] == "done":
+                    apply_upload_result(event)
+                    st.success("Fichier traité avec succès !")
+                elif event["type"] == "error":
+                    st.error(event["message"])
+    except requests.exceptions.RequestException as e:
+        st.error(f"Erreur de communication avec le backend : {e}")
+
+def fetch_table_profile(uploaded_file):
+    """Colonnes d'un CSV/Excel (mises en cache pour le fichier sélectionné) ; None en cas d'erreur."""
+    key = (uploaded_file.name, uploaded_file.size)
+    if st.session_state.get("table_profile_key") != key:
         files = {'file': (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
-        data = {'language': language}
+        try:
+            response = requests.post(f"{BACKEND_URL}/tabular-columns/", files=files, timeout=120)
+            response.raise_for_status()
+            st.session_state.table_profile = response.json()
+        except requests.exceptions.RequestException as e:
+            st.error(f"Impossible de lire les colonnes du fichier : {e}")
+            st.session_state.table_profile = None
+        st.session_state.table_profile_key = key
+    return st.session_state.table_profile
+
+def upload_file_to_backend(uploaded_file, language, table_options=None):
+    if uploaded_file is not None and uploaded_file.name.lower().endswith(AUDIO_EXTENSIONS):
+        upload_audio_as_job(uploaded_file, language)
+    elif uploaded_file is not None and uploaded_file.name.lower().endswith('.pdf'):
+        upload_pdf_stream(uploaded_file)
+    elif uploaded_file is not None:
+        files = {'file': (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
+        data = {'language': language, **(table_options or {})}
         try:
             with st.spinner("Traitement du fichier en cours..."):
                 response = requests.post(f"{BACKEND_URL}/upload-file/", files=files, data=data)
                 response.raise_for_status()
-                result = response.json()
-                st.session_state.context = result.get("full_text", "")
-                st.session_state.is_audio = result.get("is_audio", False)
-                st.session_state.upload_status = result.get("message", "Erreur lors du traitement.")
-                st.session_state.summary = "" # Réinitialiser le résumé lors d'un nouveau chargement
-                st.session_state.active_tab = "Analyse"
+                apply_upload_result(response.json())
                 st.success("Fichier traité avec succès !")
         except requests.exceptions.RequestException as e:
             st.error(f"Erreur de communication avec le backend : {e}")
 
-def summarize_context(context, is_audio, min_len, max_len):
-    """Appelle le backend pour générer un résumé."""
-    if not context or not is_audio:
+def summarize_context(document_id, is_audio, min_len, max_len):
+    """Appelle le backend pour générer un résumé du document stocké côté serveur."""
+    if not document_id or not is_audio:
         st.warning("Le résumé n'est disponible que pour les fichiers audio chargés.")
         return
     
-    payload = {"context": context, "is_audio": is_audio, "min_length": min_len, "max_length": max_len}
+    payload = {"document_id": document_id, "min_length": min_len, "max_length": max_len}
     try:
         with st.spinner("Génération du résumé en cours..."):
             response = requests.post(f"{BACKEND_URL}/summarize-context/", data=payload)
@@ -86,6 +215,25 @@ def stream_llm_response(endpoint: str, payload: dict):
     except requests.exceptions.RequestException as e:
         st.error(f"Erreur de communication avec le LLM : {e}")
 
+def ingest_batch_to_backend(uploaded_files, language):
+    """Envoie plusieurs fichiers (ou archives zip) en une requête et affiche la progression fichier par fichier."""
+    files = [('files', (f.name, f.getvalue(), f.type)) for f in uploaded_files]
+    progress_bar = st.progress(0.0, text="Envoi des fichiers...")
+    try:
+        with requests.post(f"{BACKEND_URL}/ingest-batch/", files=files, data={'language': language}, stream=True, timeout=3600) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event["type"] == "file":
+                    progress_bar.progress(event["done"] / max(event["total"], 1), text=f"{event['filename']} : {event['status']}")
+                elif event["type"] == "manifest":
+                    st.session_state.batch_manifest = event["files"]
+        progress_bar.progress(1.0, text="Ingestion terminée.")
+    except requests.exceptions.RequestException as e:
+        st.error(f"Erreur de communication avec le backend : {e}")
+
 # --- INTERFACE UTILISATEUR ---
 
 with st.sidebar:
@@ -99,17 +247,71 @@ with st.sidebar:
     lang_options = {"Auto-détection": "auto", "Français": "fr", "Anglais": "en"}
     selected_lang = st.selectbox("Langue de l'audio (si applicable)", options=list(lang_options.keys()))
 
+    table_options = None
+    if uploaded_file and uploaded_file.name.lower().endswith(('.csv', '.xlsx', '.xls')):
+        table_profile = fetch_table_profile(uploaded_file)
+        if table_profile and table_profile["columns"]:
+            column_names = [column["name"] for column in table_profile["columns"]]
+            suggested = table_profile.get("suggested_text_column")
+            text_column = st.selectbox(
+                "Colonne des réponses libres", options=column_names,
+                index=column_names.index(suggested) if suggested in column_names else 0
+            )
+            meta_columns = st.multiselect(
+                "Colonnes de contexte (facultatif)", options=[name for name in column_names if name != text_column],
+                help="Reprises devant chaque réponse, par exemple la région ou la tranche d'âge."
+            )
+            table_options = {'text_column': text_column, 'meta_columns': ",".join(meta_columns)}
+
     if st.button("Analyser le document", type="primary"):
         if uploaded_file:
-            upload_file_to_backend(uploaded_file, lang_options[selected_lang])
+            upload_file_to_backend(uploaded_file, lang_options[selected_lang], table_options)
         else:
             st.warning("Veuillez d'abord sélectionner un fichier.")
 
     if st.session_state.upload_status:
         st.info(st.session_state.upload_status)
 
-tab_titles = ["Accueil", "Guide", "Analyse", "Visualisation"]
-accueil_tab, guide_tab, analyse_tab, viz_tab = st.tabs(tab_titles)
+    with st.expander("Espace de travail"):
+        workspace_documents = fetch_workspace_documents()
+        if not workspace_documents:
+            st.caption("Aucun document enregistré pour l'instant.")
+        else:
+            stored_document = st.selectbox(
+                "Documents déjà traités", options=workspace_documents,
+                format_func=lambda d: f"{d['filename'] or d['document_id'][:12]} — {d['chars']} car. — {time.strftime('%d/%m/%Y %H:%M', time.localtime(d['created']))}",
+                key="workspace_document"
+            )
+            col1, col2 = st.columns(2)
+            if col1.button("Ouvrir", key="workspace_open"):
+                if load_stored_document(stored_document["document_id"]):
+                    st.success("Document rechargé.")
+            if col2.button("Supprimer", key="workspace_delete"):
+                requests.delete(f"{BACKEND_URL}/documents/{stored_document['document_id']}", timeout=30)
+                if stored_document["document_id"] == st.session_state.document_id:
+                    st.query_params.clear()
+                st.rerun()
+
+    with st.expander("Chargement groupé (corpus)"):
+        batch_files = st.file_uploader(
+            "Chargez plusieurs fichiers ou une archive zip",
+            type=['pdf', 'docx', 'txt', 'csv', 'xlsx', 'xls', 'mp3', 'wav', 'm4a', 'flac', 'ogg', 'zip'],
+            accept_multiple_files=True,
+            key="batch_uploader"
+        )
+        if st.button("Ingérer les fichiers", key="batch_submit"):
+            if batch_files:
+                ingest_batch_to_backend(batch_files, lang_options[selected_lang])
+            else:
+                st.warning("Veuillez d'abord sélectionner des fichiers.")
+        if st.session_state.get("batch_manifest"):
+            st.dataframe(
+                [{"Fichier": f["filename"], "Statut": f["status"], "Erreur": f.get("error") or ""} for f in st.session_state.batch_manifest],
+                hide_index=True
+            )
+
+tab_titles = ["Accueil", "Guide", "Analyse", "Visualisation", "Corpus"]
+accueil_tab, guide_tab, analyse_tab, viz_tab, corpus_tab = st.tabs(tab_titles)
 
 with accueil_tab:
     st.title("Outil d'Analyse Qualitative Intelligente")
@@ -178,7 +380,7 @@ with analyse_tab:
                 max_len = st.slider("Longueur maximale du résumé", 50, 512, 120)
                 if st.button("Générer le résumé"):
                     with st.spinner("Analyse en cours, veuillez patienter..."):
-                        summarize_context(st.session_state.context, st.session_state.is_audio, min_len, max_len)
+                        summarize_context(st.session_state.document_id, st.session_state.is_audio, min_len, max_len)
                 
                 if st.session_state.summary:
                     st.text_area("Résultat du Résumé", st.session_state.summary, height=250)
@@ -191,23 +393,26 @@ with analyse_tab:
             
             if qa_mode == 'local':
                 model_selector = st.selectbox("Modèle Standard", MODELS_STANDARD, key="qa_model")
+                qa_session = st.checkbox("Conversation suivie (le modèle garde le document en mémoire entre les questions)", key="qa_session")
             else:
                 model_selector = st.selectbox("Modèle API", MODELS_API, key="qa_model_api")
+                if len(MODELS_API) > 1:
+                    qa_strategy = st.radio("Stratégie", list(API_STRATEGIES.keys()), key="qa_strategy", horizontal=True)
 
             question_box = st.text_area("Posez votre question ici", height=100, placeholder="Ex: Quels sont les points clés ?")
 
             if st.button("Obtenir une Réponse", key="qa_submit"):
                 if question_box:
-                    model_choice = model_selector
-                    if qa_mode == "api":
-                        model_choice = MODELS_API[0] if MODELS_API else "api_non_configuree"
-                    
                     payload = {
                         "question": question_box, 
-                        "context": st.session_state.context, 
+                        "document_id": st.session_state.document_id, 
                         "mode": qa_mode, 
-                        "model_choice": model_choice
+                        "model_choice": model_selector
                     }
+                    if qa_mode == "api" and len(MODELS_API) > 1:
+                        payload["strategy"] = API_STRATEGIES[qa_strategy]
+                    if qa_mode == "local" and qa_session:
+                        payload["session"] = True
                     st.markdown("### Réponse du Modèle")
                     with st.spinner("Analyse en cours, veuillez patienter..."):
                         with st.container(height=400, border=True):
@@ -225,33 +430,47 @@ with analyse_tab:
                 long_doc_model_selector = st.selectbox("Modèle", MODELS_STANDARD, index=1, key="long_doc_model")
             else:
                 long_doc_model_selector = st.selectbox("Modèle API", MODELS_API, key="long_doc_model_api")
+                if len(MODELS_API) > 1:
+                    long_doc_strategy = st.radio("Stratégie", list(API_STRATEGIES.keys()), key="long_doc_strategy", horizontal=True)
 
             analysis_type_dropdown = st.selectbox(
                 "Type d'Analyse Prédéfinie",
-                options=[("Synthèse Générale", "resume_general"), ("Analyse Suivi-Évaluation", "suivi_evaluation"), ("Analyse d'Opinions", "analyse_opinions")],
+                options=[(label, analysis_type) for analysis_type, label in ANALYSIS_LABELS.items()],
                 format_func=lambda x: x[0],
                 key="long_doc_analysis_type"
             )
+            # Les documents dans une autre langue sont traduits en français (NLLB) avant l'analyse.
+            document_languages = {"Français": "fra_Latn", "Bambara": "bam_Latn", "Peulh": "fuv_Latn", "Anglais": "eng_Latn"}
+            long_doc_language = st.selectbox("Langue du document", options=list(document_languages.keys()), key="long_doc_language")
 
             if st.button("Lancer l'Analyse du Long Document", key="long_doc_submit"):
                 # Extraire la valeur de la sélection
                 selected_analysis_type = analysis_type_dropdown[1]
 
                 model_choice = long_doc_model_selector
-                if long_doc_mode == "api":
-                    model_choice = MODELS_API[0] if MODELS_API else "api_non_configuree"
 
                 payload = {
                     "analysis_type": selected_analysis_type, 
-                    "context": st.session_state.context, 
+                    "document_id": st.session_state.document_id, 
                     "mode": long_doc_mode, 
-                    "model_choice": model_choice
+                    "model_choice": model_choice,
+                    "translate_from": document_languages[long_doc_language]
                 }
+                if long_doc_mode == "api" and len(MODELS_API) > 1:
+                    payload["strategy"] = API_STRATEGIES[long_doc_strategy]
                 st.markdown("### Progression de l'Analyse et Résultat Final")
                 with st.spinner("Analyse en cours, veuillez patienter..."):
                     with st.container(height=400, border=True):
                         stream_llm_response(f"{BACKEND_URL}/long-document-analysis/", payload)
 
+            stored_analyses = [stored for stored in st.session_state.get("stored_results", []) if stored["kind"] in ANALYSIS_LABELS]
+            if stored_analyses:
+                st.markdown("### Analyses enregistrées")
+                for stored in stored_analyses:
+                    params = stored["params"]
+                    with st.expander(f"{ANALYSIS_LABELS[stored['kind']]} — {params.get('mode')} / {params.get('model_choice')} — {time.strftime('%d/%m/%Y %H:%M', time.localtime(stored['created']))}"):
+                        st.markdown(stored["value"])
+
 with viz_tab:
     st.header("Visualisation des Données")
     st.markdown("Générez un nuage de mots sémantique à partir du texte chargé.")
@@ -288,3 +507,90 @@ with viz_tab:
 
         if 'wordcloud_image' in st.session_state and st.session_state.wordcloud_image:
             st.image(st.session_state.wordcloud_image, caption=st.session_state.get('wordcloud_status', 'Nuage de mots'), use_column_width=True)
+
+        st.divider()
+        st.subheader("Analyse lexicale")
+        st.markdown("Termes et expressions fréquents, co-occurrences, mots-clés par segment et fréquence des thèmes définis par les regroupements de synonymes ci-dessus.")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            unit_mode = st.radio("Segments analysés", options=list(UNIT_MODES.keys()))
+        with col2:
+            ngram_size = st.slider("Taille des n-grammes", min_value=2, max_value=3, value=2)
+        with col3:
+            top_k = st.slider("Nombre de résultats", min_value=10, max_value=100, value=20, step=10)
+        if st.button("Calculer les indicateurs"):
+            with st.spinner("Calcul des indicateurs en cours..."):
+                try:
+                    st.session_state.text_analytics = compute_text_analytics(
+                        st.session_state.context, synonym_input, UNIT_MODES[unit_mode], ngram_size, top_k
+                    )
+                except Exception as e:
+                    st.session_state.text_analytics = None
+                    st.error(f"Erreur lors du calcul des indicateurs : {e}")
+
+        analytics = st.session_state.get("text_analytics")
+        if analytics:
+            st.caption(f"{analytics['units']} segments, {analytics['tokens']} mots retenus, {analytics['vocabulary']} termes distincts.")
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("**Termes les plus fréquents**")
+                st.dataframe(analytics["terms"], hide_index=True, use_container_width=True)
+            with col2:
+                st.markdown("**Expressions les plus fréquentes**")
+                st.bar_chart(analytics["ngrams"], x="N-gramme", y="Occurrences", horizontal=True)
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("**Termes souvent associés**")
+                st.dataframe(analytics["cooccurrences"], hide_index=True, use_container_width=True)
+            with col2:
+                st.markdown("**Thèmes**")
+                if analytics["themes"] is not None:
+                    st.dataframe(analytics["themes"], hide_index=True, use_container_width=True)
+                else:
+                    st.info("Définissez des regroupements de synonymes pour compter les thèmes.")
+            st.markdown("**Mots-clés par segment (TF-IDF)**")
+            st.dataframe(analytics["keywords"], hide_index=True, use_container_width=True)
+
+with corpus_tab:
+    st.header("Analyse de Corpus")
+    st.markdown("Analysez ensemble plusieurs documents de l'espace de travail (par exemple tous les entretiens d'une enquête). Chaque point de la synthèse indique les documents qui l'appuient ([Doc n]).")
+
+    if not workspace_documents:
+        st.info("Chargez d'abord des documents (chargement groupé ou un par un) : ils apparaîtront ici.")
+    else:
+        documents_by_id = {d["document_id"]: d for d in workspace_documents}
+        # Par défaut : les documents du dernier chargement groupé.
+        default_ids = [f["document_id"] for f in st.session_state.get("batch_manifest") or [] if f.get("document_id") in documents_by_id]
+        corpus_ids = st.multiselect(
+            "Documents du corpus", options=list(documents_by_id), default=default_ids,
+            format_func=lambda document_id: documents_by_id[document_id]["filename"] or document_id[:12],
+            key="corpus_documents"
+        )
+
+        corpus_mode = st.radio("Mode", ["local", "api"], key="corpus_mode", horizontal=True)
+        if corpus_mode == "local":
+            corpus_model = st.selectbox("Modèle", MODELS_STANDARD, index=1, key="corpus_model")
+        else:
+            corpus_model = st.selectbox("Modèle API", MODELS_API, key="corpus_model_api")
+            if len(MODELS_API) > 1:
+                corpus_strategy = st.radio("Stratégie", list(API_STRATEGIES.keys()), key="corpus_strategy", horizontal=True)
+        corpus_analysis_type = st.selectbox(
+            "Type d'Analyse", options=list(ANALYSIS_LABELS), format_func=ANALYSIS_LABELS.get, key="corpus_analysis_type"
+        )
+
+        if st.button("Lancer l'Analyse du Corpus", key="corpus_submit"):
+            if len(corpus_ids) < 2:
+                st.warning("Sélectionnez au moins deux documents.")
+            else:
+                payload = {
+                    "document_ids": ",".join(corpus_ids),
+                    "analysis_type": corpus_analysis_type,
+                    "mode": corpus_mode,
+                    "model_choice": corpus_model
+                }
+                if corpus_mode == "api" and len(MODELS_API) > 1:
+                    payload["strategy"] = API_STRATEGIES[corpus_strategy]
+                st.markdown("### Progression de l'Analyse et Synthèse du Corpus")
+                with st.spinner("Analyse du corpus en cours, veuillez patienter..."):
+                    with st.container(height=500, border=True):
+                        stream_llm_response(f"{BACKEND_URL}/corpus-analysis/", payload)
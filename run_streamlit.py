@@ -4,14 +4,32 @@ import threading
 import time
 import os
 import subprocess
+import multiprocessing
+import urllib.request
 
-# On importe l'application FastAPI depuis backend.py
-from backend import app as fastapi_app
+BACKEND_HEALTH_URL = "http://127.0.0.1:8000/health"
+BACKEND_STARTUP_TIMEOUT_S = 60
 
 def run_fastapi():
     """Lance le backend FastAPI avec uvicorn."""
+    # Import ici plutôt qu'en tête de module : les workers 'spawn' du pool de processus réimportent
+    # ce script et n'ont pas à charger tout le backend.
+    from backend_streamlit import app as fastapi_app
     uvicorn.run(fastapi_app, host="0.0.0.0", port=8000)
 
+def wait_for_backend(timeout_s=BACKEND_STARTUP_TIMEOUT_S):
+    """Attend que le backend réponde sur /health, au lieu d'un délai fixe."""
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(BACKEND_HEALTH_URL, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            pass
+        time.sleep(0.1)
+    return False
+
 def run_streamlit():
     """Lance l'interface Streamlit en utilisant une commande shell."""
     # Le chemin vers le script principal de Streamlit
@@ -27,14 +45,17 @@ def run_streamlit():
     process.wait()
 
 if __name__ == "__main__":
+    # Indispensable dans l'exécutable PyInstaller : sans cela, chaque worker du pool de processus relancerait l'application.
+    multiprocessing.freeze_support()
     print("Lancement du backend FastAPI dans un thread...")
     # On lance le backend dans un thread pour qu'il ne bloque pas le reste
     fastapi_thread = threading.Thread(target=run_fastapi, daemon=True)
     fastapi_thread.start()
     
-    # On attend quelques secondes pour être sûr que le backend est prêt
-    print("Attente de 3 secondes pour le démarrage du backend...")
-    time.sleep(3)
+    # On attend que le backend réponde (les modèles sont chargés à la demande)
+    print("Attente du démarrage du backend...")
+    if not wait_for_backend():
+        print(f"Le backend ne répond pas après {BACKEND_STARTUP_TIMEOUT_S} secondes, lancement de l'interface malgré tout.")
     
     print("Lancement de l'interface Streamlit...")
     # On lance Streamlit dans le thread principal
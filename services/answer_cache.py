@@ -0,0 +1,114 @@
+# services/answer_cache.py
+
+import os
+import re
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(6 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+
+WORD_PATTERN = re.compile(r"\w+")
+# Mots vides ignorés pour comparer deux questions. Contrairement aux mots vides de la recherche BM25,
+# les négations (ne, pas, plus, jamais...) sont conservées : elles changent le sens de la question.
+STOP_WORDS = {
+    "le", "la", "les", "un", "une", "des", "du", "de", "d", "l", "et", "ou", "en", "au", "aux",
+    "a", "ce", "ces", "cet", "cette", "est", "sont", "que", "qu", "qui", "quoi", "quel", "quels", "quelle",
+    "quelles", "pour", "par", "sur", "dans", "avec", "se", "sa", "son", "ses", "il", "elle", "ils",
+    "elles", "on", "nous", "vous", "je", "tu", "y", "the", "of", "and", "to", "is",
+}
+NEGATIONS = {"ne", "n", "pas", "plus", "jamais", "aucun", "aucune", "rien", "sans", "non", "not", "no", "never"}
+
+def question_terms(question: str) -> list:
+    """Minuscules, suppression des accents et des mots vides ; les négations sont gardées."""
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [w for w in WORD_PATTERN.findall(text) if w in NEGATIONS or (w not in STOP_WORDS and len(w) > 1)]
+
+def singular(term: str) -> str:
+    """Ramène les pluriels français réguliers au singulier (défis → défi, principaux → principal)."""
+    if len(term) > 4 and term.endswith("aux"):
+        return term[:-3] + "al"
+    if len(term) > 3 and term[-1] in "sx":
+        return term[:-1]
+    return term
+
+def question_key(question: str) -> frozenset:
+    """
+    Clé d'une question : ensemble de ses mots normalisés (minuscules, sans accents ni mots vides,
+    négations comprises), pluriels ramenés au singulier. L'ordre des mots et leurs répétitions sont ignorés.
+    """
+    return frozenset(term if term in NEGATIONS else singular(term) for term in question_terms(question))
+
+class AnswerCache:
+    """
+    Cache des réponses du Q&A, par document et par modèle.
+
+    Une question est considérée comme déjà posée si une question en cache (sur le même document,
+    avec le même modèle) a exactement les mêmes mots significatifs, dans n'importe quel ordre
+    (« Quels sont les principaux défis ? » et « Les défis principaux ? »). Les entrées sont indexées
+    par cet ensemble de mots : la recherche est directe. Une question niée ou dont un seul mot change
+    n'est jamais servie depuis le cache. Les entrées expirent après `ttl_seconds` et les moins
+    récemment utilisées sont évincées au-delà de `max_entries`.
+    """
+    def __init__(self, ttl_seconds: int = ANSWER_CACHE_TTL_SECONDS, max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _evict_expired(self):
+        limit = time.time() - self.ttl_seconds
+        for entry_key in [k for k, entry in self._entries.items() if entry["created"] < limit]:
+            del self._entries[entry_key]
+
+    def lookup(self, document_key: str, model_key: str, question: str):
+        """
+        Cherche la réponse à une question déjà posée sous une forme équivalente.
+
+        Returns:
+            dict | None: {'answer', 'question' (question d'origine)} ou None.
+        """
+        entry_key = (document_key, model_key, question_key(question))
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None and time.time() - entry["created"] > self.ttl_seconds:
+                # Entrée expirée : supprimée à sa lecture (les autres le sont dans `stats`).
+                del self._entries[entry_key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(entry_key)
+            return {"answer": entry["answer"], "question": entry["question"]}
+
+    def store(self, document_key: str, model_key: str, question: str, answer: str):
+        terms = question_key(question)
+        if not terms:
+            return
+        entry_key = (document_key, model_key, terms)
+        with self._lock:
+            self._entries.pop(entry_key, None)
+            self._entries[entry_key] = {"question": question, "answer": answer, "created": time.time()}
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._evict_expired()
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+answer_cache_instance = AnswerCache()
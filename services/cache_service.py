@@ -0,0 +1,148 @@
+# services/cache_service.py
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import defaultdict
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "50000"))
+CACHE_MAX_MB = int(os.getenv("CACHE_MAX_MB", "512"))
+# Les dates d'accès des lectures sont écrites par lots : au plus tard après ce nombre de lectures ou ce délai.
+CACHE_TOUCH_BATCH = int(os.getenv("CACHE_TOUCH_BATCH", "256"))
+CACHE_TOUCH_FLUSH_SECONDS = float(os.getenv("CACHE_TOUCH_FLUSH_SECONDS", "30"))
+
+class CacheService:
+    """
+    Cache persistant sur disque (SQLite) adressé par le contenu.
+    Les entrées sont rangées par espace de noms ('summary', 'synthesis', ...) et
+    évincées selon la politique LRU lorsque la taille ou le nombre maximal est dépassé.
+
+    Le nombre d'entrées et leur taille totale sont tenus à jour en mémoire : la table n'est parcourue
+    que lorsqu'une limite est franchie. Une lecture ne fait pas d'écriture sur disque : sa date d'accès
+    est mémorisée puis enregistrée par lots (voir CACHE_TOUCH_BATCH), avant toute éviction.
+    """
+    def __init__(self, db_path: str, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_MB * 1024 * 1024):
+        print(f"Initialisation du cache d'analyse '{db_path}'...")
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, namespace TEXT NOT NULL, value TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache(last_access)")
+        self._conn.commit()
+        self._count, self._bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        self._touched = {}
+        self._last_flush = time.time()
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Construit une clé stable à partir des éléments fournis (texte, identifiant de modèle, paramètres...)."""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(str(part).encode("utf-8"))
+            digest.update(b"\x1f")
+        return digest.hexdigest()
+
+    def get(self, namespace: str, key: str):
+        """Retourne la valeur en cache, ou None si elle est absente."""
+        return self.get_many(namespace, [key])[0]
+
+    def get_many(self, namespace: str, keys: list) -> list:
+        """Retourne les valeurs en cache des clés demandées (None pour les absentes), dans l'ordre des clés."""
+        now = time.time()
+        values = []
+        with self._lock:
+            for key in keys:
+                row = self._conn.execute("SELECT value FROM cache WHERE key = ?", (f"{namespace}:{key}",)).fetchone()
+                if row is None:
+                    self.misses[namespace] += 1
+                    values.append(None)
+                    continue
+                self._touched[f"{namespace}:{key}"] = now
+                self.hits[namespace] += 1
+                values.append(row[0])
+            if len(self._touched) >= CACHE_TOUCH_BATCH or now - self._last_flush > CACHE_TOUCH_FLUSH_SECONDS:
+                self._flush_touched()
+                self._conn.commit()
+        return values
+
+    def set(self, namespace: str, key: str, value: str):
+        """Enregistre une valeur puis applique l'éviction LRU si les limites sont dépassées."""
+        self.set_many(namespace, [(key, value)])
+
+    def set_many(self, namespace: str, items: list):
+        """Enregistre des couples (clé, valeur) en une seule transaction, puis applique l'éviction LRU si besoin."""
+        now = time.time()
+        with self._lock:
+            for key, value in items:
+                size = len(value.encode("utf-8"))
+                if size > self.max_bytes:
+                    continue
+                full_key = f"{namespace}:{key}"
+                previous = self._conn.execute("SELECT size FROM cache WHERE key = ?", (full_key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, namespace, value, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                    (full_key, namespace, value, size, now)
+                )
+                if previous is None:
+                    self._count += 1
+                else:
+                    self._bytes -= previous[0]
+                self._bytes += size
+                self._touched.pop(full_key, None)
+            if self._count > self.max_entries or self._bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _flush_touched(self):
+        """Enregistre les dates d'accès des lectures récentes (sans valider la transaction)."""
+        if self._touched:
+            self._conn.executemany("UPDATE cache SET last_access = ? WHERE key = ?", [(t, key) for key, t in self._touched.items()])
+            self._touched.clear()
+        self._last_flush = time.time()
+
+    def flush(self):
+        """Enregistre immédiatement les dates d'accès en attente (à l'arrêt du service)."""
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+
+    def _evict(self):
+        # Les accès récents doivent être connus pour choisir les entrées les moins récemment utilisées.
+        self._flush_touched()
+        to_delete = []
+        for key, size in self._conn.execute("SELECT key, size FROM cache ORDER BY last_access ASC"):
+            if self._count <= self.max_entries and self._bytes <= self.max_bytes:
+                break
+            to_delete.append((key,)); self._count -= 1; self._bytes -= size
+        self._conn.executemany("DELETE FROM cache WHERE key = ?", to_delete)
+        self.evictions += len(to_delete)
+
+    def stats(self) -> dict:
+        """Retourne les compteurs de succès/échecs et l'occupation du cache."""
+        with self._lock:
+            count, total = self._count, self._bytes
+        namespaces = set(self.hits) | set(self.misses)
+        return {
+            "entries": count,
+            "size_bytes": total,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "namespaces": {ns: {"hits": self.hits[ns], "misses": self.misses[ns]} for ns in sorted(namespaces)},
+        }
+
+# Instance unique partagée par le backend.
+cache_service_instance = CacheService(os.path.join(CACHE_DIR, "analysis_cache.sqlite3"))
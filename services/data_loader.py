@@ -0,0 +1,209 @@
+# services/data_loader.py
+
+import io
+import os
+import bisect
+import zipfile
+import pandas as pd
+import openpyxl
+import docx
+import fitz
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.m4a', '.flac', '.ogg')
+TEXT_EXTENSIONS = ('.csv', '.xlsx', '.xls', '.docx', '.txt', '.pdf')
+
+# Limites d'un PDF chargé : nombre de pages et taille du fichier.
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "2000"))
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_MB", "200")) * 1024 * 1024
+# Nombre de pages extraites par tâche du pool de processus.
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+
+TABULAR_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+# Nombre de lignes lues à la fois dans un fichier tabulaire : la mémoire reste bornée quelle que soit sa taille.
+TABULAR_CHUNK_ROWS = int(os.getenv("TABULAR_CHUNK_ROWS", "5000"))
+# Lignes examinées pour décrire les colonnes et deviner celle des réponses libres.
+TABULAR_SAMPLE_ROWS = 1000
+# Séparateur entre deux réponses : une limite de paragraphe, que le découpage en morceaux respecte.
+ROW_SEPARATOR = "\n\n"
+
+class DocumentTooLargeError(ValueError):
+    """Le document dépasse les limites de pages ou de taille autorisées."""
+
+def is_audio_file(filename: str) -> bool:
+    return filename.lower().endswith(AUDIO_EXTENSIONS)
+
+def is_text_file(filename: str) -> bool:
+    return filename.lower().endswith(TEXT_EXTENSIONS)
+
+def expand_zip(content_bytes: bytes):
+    """Parcourt une archive zip et produit (nom, contenu) pour chaque fichier, dossiers et métadonnées macOS exclus."""
+    with zipfile.ZipFile(io.BytesIO(content_bytes)) as archive:
+        for info in archive.infolist():
+            name = info.filename
+            if info.is_dir() or name.startswith("__MACOSX/") or os.path.basename(name).startswith("."):
+                continue
+            yield os.path.basename(name), archive.read(info)
+
+def is_pdf_file(filename: str) -> bool:
+    return filename.lower().endswith('.pdf')
+
+def check_pdf_budget(size_bytes: int = 0, page_count: int = 0):
+    """Lève DocumentTooLargeError si le PDF dépasse PDF_MAX_BYTES ou PDF_MAX_PAGES."""
+    if size_bytes > PDF_MAX_BYTES:
+        raise DocumentTooLargeError(f"PDF trop volumineux ({size_bytes // (1024 * 1024)} Mo, maximum {PDF_MAX_BYTES // (1024 * 1024)} Mo).")
+    if page_count > PDF_MAX_PAGES:
+        raise DocumentTooLargeError(f"PDF trop long ({page_count} pages, maximum {PDF_MAX_PAGES}).")
+
+def pdf_page_count(path: str) -> int:
+    with fitz.open(path) as doc:
+        return doc.page_count
+
+def pdf_page_ranges(page_count: int, pages_per_task: int = PDF_PAGES_PER_TASK) -> list:
+    """Découpe les pages en plages [début, fin) réparties entre les workers."""
+    return [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+
+def extract_pdf_pages(path: str, start: int, end: int) -> list:
+    """
+    Extrait le texte des pages [start, end) d'un PDF sur disque.
+    Chaque worker ouvre le fichier lui-même : seules les pages demandées sont chargées en mémoire.
+    """
+    with fitz.open(path) as doc:
+        return [doc[index].get_text() for index in range(start, end)]
+
+def join_pages(pages: list):
+    """
+    Assemble le texte des pages et calcule la position (en caractères) du début de chaque page.
+
+    Returns:
+        tuple: (texte, liste des positions de début de page).
+    """
+    offsets, position = [], 0
+    for page in pages:
+        offsets.append(position)
+        position += len(page)
+    return "".join(pages), offsets
+
+def page_for_offset(page_offsets: list, offset: int) -> int:
+    """Numéro de page (à partir de 1) contenant la position `offset` du texte."""
+    return max(1, bisect.bisect_right(page_offsets, offset))
+
+def is_tabular_file(filename: str) -> bool:
+    return filename.lower().endswith(TABULAR_EXTENSIONS)
+
+def iter_table_chunks(source, filename: str, chunksize: int = TABULAR_CHUNK_ROWS, usecols=None):
+    """
+    Lit un fichier CSV ou Excel par blocs de `chunksize` lignes (DataFrames typés).
+    `source` est un chemin ou le contenu du fichier (bytes) ; `usecols` restreint la lecture aux colonnes utiles, dans cet ordre.
+    Les .xls (format binaire, non lisible en flux) sont lus en une fois.
+    """
+    filename = filename.lower()
+    # Un nouveau tampon à chaque lecture : pandas ferme le fichier qu'on lui passe une fois la lecture terminée.
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    usecols = list(usecols) if usecols else None
+    if filename.endswith('.csv'):
+        for chunk in pd.read_csv(source, chunksize=chunksize, usecols=usecols):
+            yield chunk[usecols] if usecols else chunk
+    elif filename.endswith('.xlsx'):
+        workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(name) if name is not None else f"colonne_{i + 1}" for i, name in enumerate(next(rows, ()))]
+            missing = [name for name in usecols or () if name not in header]
+            if missing:
+                raise ValueError(f"Colonnes introuvables : {', '.join(missing)}.")
+            width, batch = len(header), []
+            for row in rows:
+                batch.append(tuple(row[:width]) + (None,) * (width - len(row)))
+                if len(batch) >= chunksize:
+                    chunk = pd.DataFrame(batch, columns=header)
+                    yield chunk[usecols] if usecols else chunk
+                    batch = []
+            if batch:
+                chunk = pd.DataFrame(batch, columns=header)
+                yield chunk[usecols] if usecols else chunk
+        finally:
+            workbook.close()
+    elif filename.endswith('.xls'):
+        chunk = pd.read_excel(source)
+        yield chunk[usecols] if usecols else chunk
+
+def profile_table(source, filename: str) -> dict:
+    """
+    Décrit les colonnes d'un fichier tabulaire à partir de ses premières lignes.
+
+    Returns:
+        dict: {'columns': [{'name', 'dtype', 'non_null', 'avg_length'}], 'suggested_text_column'}
+              où la colonne suggérée est la colonne de texte aux valeurs les plus longues.
+    """
+    sample = next(iter_table_chunks(source, filename, chunksize=TABULAR_SAMPLE_ROWS), pd.DataFrame())
+    columns = []
+    for name in sample.columns:
+        series = sample[name]
+        texts = series.dropna().astype(str) if pd.api.types.is_string_dtype(series) or series.dtype == object else pd.Series(dtype=str)
+        columns.append({
+            "name": str(name),
+            "dtype": str(series.dtype),
+            "non_null": int(series.notna().sum()),
+            "avg_length": round(float(texts.str.len().mean()), 1) if len(texts) else 0.0,
+        })
+    text_columns = [column for column in columns if column["avg_length"] > 0]
+    suggested = max(text_columns, key=lambda column: column["avg_length"])["name"] if text_columns else None
+    return {"columns": columns, "suggested_text_column": suggested}
+
+def format_row(row_number: int, text, meta_columns=(), meta_values=()) -> str:
+    """
+    Enregistrement compact d'une réponse : numéro de ligne, colonnes de contexte éventuelles, texte.
+    Exemple : « [12] (Région: Kayes; Âge: 34) Les routes sont impraticables en saison des pluies. »
+    """
+    meta = "; ".join(f"{column}: {value}" for column, value in zip(meta_columns, meta_values) if pd.notna(value))
+    return f"[{row_number}] " + (f"({meta}) " if meta else "") + " ".join(str(text).split())
+
+def table_to_text(source, filename: str, text_column: str = None, meta_columns=()):
+    """
+    Convertit un fichier tabulaire en une suite d'enregistrements compacts, une réponse par ligne
+    non vide de `text_column` (devinée si absente), séparés par ROW_SEPARATOR.
+    `source` est un chemin ou le contenu du fichier (bytes), relu à chaque passe.
+    Seules les colonnes demandées sont lues, bloc par bloc.
+
+    Returns:
+        tuple: (texte, nom de la colonne de texte, nombre de réponses retenues).
+    """
+    meta_columns = [column for column in meta_columns if column and column != text_column]
+    if not text_column:
+        text_column = profile_table(source, filename)["suggested_text_column"]
+        if text_column is None:
+            raise ValueError("Aucune colonne de texte libre n'a été trouvée dans le fichier.")
+
+    records = []
+    row_number = 0
+    for chunk in iter_table_chunks(source, filename, usecols=[text_column, *meta_columns]):
+        for values in chunk.itertuples(index=False, name=None):
+            row_number += 1
+            text = values[0]
+            if pd.isna(text) or not str(text).strip():
+                continue
+            records.append(format_row(row_number, text, meta_columns, values[1:]))
+    return ROW_SEPARATOR.join(records), text_column, len(records)
+
+def extract_text(filename: str, content_bytes: bytes):
+    """
+    Extrait le texte d'un fichier non audio (CSV, Excel, DOCX, TXT, PDF).
+    Les fichiers tabulaires donnent une réponse par ligne, pour la colonne de texte libre devinée (voir `table_to_text`).
+    Fonction bloquante, destinée à être exécutée dans un pool de workers.
+
+    Returns:
+        str | None: Le texte extrait, ou None si le format n'est pas supporté.
+    """
+    filename = filename.lower()
+    if is_tabular_file(filename): return table_to_text(content_bytes, filename)[0]
+    elif filename.endswith('.docx'):
+        doc = docx.Document(io.BytesIO(content_bytes))
+        return "\n\n".join([p.text.strip() for p in doc.paragraphs if p.text.strip()])
+    elif filename.endswith('.txt'): return content_bytes.decode('utf-8', errors='ignore')
+    elif filename.endswith('.pdf'):
+        check_pdf_budget(size_bytes=len(content_bytes))
+        with fitz.open(stream=content_bytes, filetype="pdf") as doc:
+            check_pdf_budget(page_count=doc.page_count)
+            return "".join([page.get_text() for page in doc])
+    return None
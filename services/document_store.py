@@ -0,0 +1,87 @@
+# services/document_store.py
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from services.workspace_service import workspace_service_instance
+
+# Durée de vie d'un document inutilisé et nombre maximal de documents conservés.
+DOCUMENT_TTL_SECONDS = int(os.getenv("DOCUMENT_TTL_SECONDS", str(24 * 3600)))
+DOCUMENT_STORE_MAX_DOCUMENTS = int(os.getenv("DOCUMENT_STORE_MAX_DOCUMENTS", "100"))
+
+class DocumentStore:
+    """
+    Conserve côté serveur le texte extrait des fichiers chargés.
+    Le client reçoit un identifiant (l'empreinte SHA-256 du texte) et l'envoie à la place
+    du texte complet. Les documents inutilisés expirent après `ttl_seconds`.
+
+    Si un espace de travail est fourni, chaque document y est aussi enregistré sur disque :
+    un document expiré ou perdu au redémarrage du serveur y est relu à la demande.
+    """
+    def __init__(self, ttl_seconds: int = DOCUMENT_TTL_SECONDS, max_documents: int = DOCUMENT_STORE_MAX_DOCUMENTS, workspace=None):
+        print("Initialisation du magasin de documents...")
+        self.ttl_seconds = ttl_seconds
+        self.max_documents = max_documents
+        self.workspace = workspace
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def document_id(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def put(self, text: str, **metadata) -> str:
+        """Enregistre un texte (et ses métadonnées) et retourne son identifiant."""
+        document_id = self.document_id(text)
+        if self.workspace is not None:
+            self.workspace.put_document(document_id, text, **metadata)
+        self._remember(document_id, text, metadata)
+        return document_id
+
+    def _remember(self, document_id: str, text: str, metadata: dict):
+        with self._lock:
+            self._evict_expired()
+            self._documents[document_id] = {"text": text, "metadata": metadata, "last_access": time.time()}
+            self._documents.move_to_end(document_id)
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+            return self._documents[document_id]
+
+    def get(self, document_id: str):
+        """Retourne l'entrée {'text', 'metadata'} du document, ou None s'il est inconnu ou expiré."""
+        with self._lock:
+            self._evict_expired()
+            entry = self._documents.get(document_id)
+            if entry is not None:
+                entry["last_access"] = time.time()
+                self._documents.move_to_end(document_id)
+                return entry
+        stored = self.workspace.get_document(document_id) if self.workspace is not None else None
+        if stored is None:
+            return None
+        return self._remember(document_id, stored["text"], stored["metadata"])
+
+    def get_text(self, document_id: str):
+        entry = self.get(document_id)
+        return entry["text"] if entry else None
+
+    def delete(self, document_id: str):
+        """Retire le document de la mémoire et de l'espace de travail."""
+        with self._lock:
+            self._documents.pop(document_id, None)
+        if self.workspace is not None:
+            self.workspace.delete_document(document_id)
+
+    def _evict_expired(self):
+        # Les documents sont ordonnés du moins au plus récemment utilisé.
+        limit = time.time() - self.ttl_seconds
+        while self._documents:
+            document_id, entry = next(iter(self._documents.items()))
+            if entry["last_access"] >= limit:
+                break
+            self._documents.popitem(last=False)
+
+document_store_instance = DocumentStore(workspace=workspace_service_instance)
@@ -0,0 +1,47 @@
+# services/executors.py
+
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+
+# Pools bornés pour le travail bloquant, afin de ne jamais bloquer la boucle d'événements FastAPI.
+# Inférence des modèles (Whisper, mT5...) : peu de workers, les modèles sont déjà multi-threadés.
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+# Analyse des fichiers (PDF, DOCX, CSV...) et construction des index.
+PARSING_WORKERS = int(os.getenv("PARSING_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Analyse en masse des fichiers (ingestion groupée) : un processus par cœur.
+PROCESS_WORKERS = int(os.getenv("PROCESS_WORKERS", str(os.cpu_count() or 1)))
+
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+parsing_executor = ThreadPoolExecutor(max_workers=PARSING_WORKERS, thread_name_prefix="parsing")
+_process_pool = None
+
+def get_process_pool():
+    """
+    Pool de processus créé au premier usage, pour le travail CPU qui ne libère pas le GIL.
+    Les workers sont démarrés par 'spawn' : un fork du serveur, qui fait déjà tourner plusieurs pools
+    de threads (et ceux de torch), peut hériter d'un verrou tenu et se bloquer.
+    """
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=PROCESS_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _process_pool
+
+async def run_blocking(executor, func, *args, **kwargs):
+    """Exécute une fonction bloquante dans le pool donné et attend son résultat sans bloquer la boucle."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+
+async def iterate_in_executor(iterator, executor=None):
+    """Consomme un itérateur synchrone (ex. un flux d'API) élément par élément dans un pool de threads."""
+    loop = asyncio.get_running_loop()
+    iterator = iter(iterator)
+    sentinel = object()
+    while True:
+        item = await loop.run_in_executor(executor, next, iterator, sentinel)
+        if item is sentinel:
+            break
+        yield item
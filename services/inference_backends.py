@@ -0,0 +1,146 @@
+# services/inference_backends.py
+
+import os
+import time
+import argparse
+import difflib
+import torch
+from transformers import pipeline, AutoTokenizer, AutoProcessor
+
+# Implémentations ONNX Runtime (optionnelles) : pip install optimum[onnxruntime]
+try:
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTModelForSpeechSeq2Seq
+except ImportError:
+    ORTModelForSeq2SeqLM = None
+    ORTModelForSpeechSeq2Seq = None
+
+# Moteurs d'inférence disponibles :
+# - 'pytorch' : modèle d'origine (fp32 sur CPU) ;
+# - 'int8'    : PyTorch avec quantification dynamique int8 des couches linéaires (CPU) ;
+# - 'onnx'    : ONNX Runtime, modèle exporté une fois puis réutilisé depuis ONNX_CACHE_DIR.
+INFERENCE_BACKENDS = ("pytorch", "int8", "onnx")
+DEFAULT_INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "pytorch")
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", os.path.join(os.getenv("CACHE_DIR", ".cache"), "onnx"))
+
+def backend_for(service_name: str) -> str:
+    """Moteur choisi pour un service : variable <SERVICE>_BACKEND (ex. SUMMARIZATION_BACKEND), sinon INFERENCE_BACKEND."""
+    backend = os.getenv(f"{service_name.upper()}_BACKEND", DEFAULT_INFERENCE_BACKEND).lower()
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Moteur d'inférence inconnu '{backend}' pour '{service_name}'. Choix possibles : {', '.join(INFERENCE_BACKENDS)}.")
+    return backend
+
+def _tensor_bytes(value) -> int:
+    if isinstance(value, torch.Tensor):
+        return value.numel() * value.element_size()
+    if isinstance(value, (tuple, list)):
+        return sum(_tensor_bytes(v) for v in value)
+    return 0
+
+def _directory_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+def _build_int8(task, model_id, device, **pipeline_kwargs):
+    if device != "cpu":
+        print(f"La quantification int8 dynamique ne s'applique qu'au CPU : '{model_id}' sera chargé sur CPU.")
+    pipe = pipeline(task, model=model_id, device="cpu", **pipeline_kwargs)
+    pipe.model = torch.quantization.quantize_dynamic(pipe.model, {torch.nn.Linear}, dtype=torch.qint8)
+    # Les poids quantifiés ne sont plus des paramètres : on mesure l'empreinte sur le state_dict.
+    pipe.approx_bytes = sum(_tensor_bytes(v) for v in pipe.model.state_dict().values())
+    return pipe
+
+def _build_onnx(task, model_id, device, **pipeline_kwargs):
+    if ORTModelForSeq2SeqLM is None:
+        raise ImportError("Le moteur 'onnx' nécessite 'optimum[onnxruntime]'.")
+    model_class = ORTModelForSpeechSeq2Seq if task == "automatic-speech-recognition" else ORTModelForSeq2SeqLM
+    export_dir = os.path.join(ONNX_CACHE_DIR, model_id.replace("/", "--"))
+    if os.path.isdir(export_dir):
+        model = model_class.from_pretrained(export_dir)
+    else:
+        print(f"Export ONNX de '{model_id}' (première utilisation uniquement)...")
+        model = model_class.from_pretrained(model_id, export=True)
+        model.save_pretrained(export_dir)
+    if task == "automatic-speech-recognition":
+        processor = AutoProcessor.from_pretrained(model_id)
+        pipe = pipeline(task, model=model, tokenizer=processor.tokenizer, feature_extractor=processor.feature_extractor, **pipeline_kwargs)
+    else:
+        pipe = pipeline(task, model=model, tokenizer=AutoTokenizer.from_pretrained(model_id), **pipeline_kwargs)
+    pipe.approx_bytes = _directory_bytes(export_dir)
+    return pipe
+
+def build_pipeline(task: str, model_id: str, device: str, backend: str = "pytorch", **pipeline_kwargs):
+    """
+    Construit un pipeline Hugging Face avec le moteur d'inférence demandé.
+    Le pipeline retourné s'utilise exactement comme celui d'origine.
+    """
+    print(f"Moteur d'inférence '{backend}' pour '{model_id}'.")
+    if backend == "int8":
+        return _build_int8(task, model_id, device, **pipeline_kwargs)
+    if backend == "onnx":
+        return _build_onnx(task, model_id, device, **pipeline_kwargs)
+    return pipeline(task, model=model_id, device=device, **pipeline_kwargs)
+
+def parity_check(task: str, model_id: str, backend: str, inputs: list, pipeline_kwargs: dict = None, call_kwargs: dict = None) -> dict:
+    """
+    Compare un moteur d'inférence à la référence PyTorch fp32 sur les mêmes entrées :
+    similarité des sorties (1.0 = identiques), taux de sorties identiques et latences.
+    """
+    pipeline_kwargs = pipeline_kwargs or {}
+    call_kwargs = call_kwargs or {}
+    output_key = {"summarization": "summary_text", "translation": "translation_text", "automatic-speech-recognition": "text"}[task]
+
+    def run(pipe):
+        outputs, start_time = [], time.perf_counter()
+        for item in inputs:
+            result = pipe(item, **call_kwargs)
+            outputs.append((result[0] if isinstance(result, list) else result)[output_key].strip())
+        return outputs, time.perf_counter() - start_time
+
+    reference, reference_s = run(build_pipeline(task, model_id, "cpu", "pytorch", **pipeline_kwargs))
+    candidate, candidate_s = run(build_pipeline(task, model_id, "cpu", backend, **pipeline_kwargs))
+    similarities = [difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(reference, candidate)]
+    return {
+        "task": task, "model_id": model_id, "backend": backend,
+        "mean_similarity": sum(similarities) / len(similarities),
+        "min_similarity": min(similarities),
+        "exact_match_rate": sum(a == b for a, b in zip(reference, candidate)) / len(inputs),
+        "reference_seconds": round(reference_s, 2),
+        "backend_seconds": round(candidate_s, 2),
+        "speedup": round(reference_s / candidate_s, 2) if candidate_s else None,
+        "pairs": list(zip(reference, candidate)),
+    }
+
+# Textes d'exemple utilisés par défaut pour la vérification de parité.
+PARITY_SAMPLE_TEXTS = [
+    "Les participants ont souligné que l'accès à l'eau potable reste le principal défi du village. "
+    "Les femmes parcourent chaque jour plusieurs kilomètres pour atteindre le forage le plus proche, "
+    "ce qui réduit le temps consacré aux activités génératrices de revenus et à la scolarisation des filles.",
+    "Le rapport d'évaluation recommande de renforcer la formation des agents de santé communautaires, "
+    "d'améliorer le suivi des indicateurs nutritionnels et d'impliquer davantage les comités de gestion locaux "
+    "dans la planification des activités du projet pour la prochaine phase.",
+]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vérification de parité d'un moteur d'inférence avec la référence fp32.")
+    parser.add_argument("--service", choices=["summarization", "translation", "transcription"], required=True)
+    parser.add_argument("--backend", choices=[b for b in INFERENCE_BACKENDS if b != "pytorch"], required=True)
+    parser.add_argument("--audio", nargs="*", default=[], help="Fichiers audio pour la transcription.")
+    args = parser.parse_args()
+
+    if args.service == "summarization":
+        report = parity_check("summarization", "airKlizz/mt5-base-wikinewssum-french", args.backend,
+                              ["résume ce texte: " + t for t in PARITY_SAMPLE_TEXTS],
+                              call_kwargs={"min_length": 30, "max_length": 120, "num_beams": 4, "no_repeat_ngram_size": 3})
+    elif args.service == "translation":
+        report = parity_check("translation", "facebook/nllb-200-distilled-600M", args.backend, PARITY_SAMPLE_TEXTS,
+                              call_kwargs={"src_lang": "fra_Latn", "tgt_lang": "eng_Latn"})
+    else:
+        if not args.audio:
+            parser.error("--audio est requis pour la transcription.")
+        report = parity_check("automatic-speech-recognition", "openai/whisper-base", args.backend, args.audio,
+                              pipeline_kwargs={"chunk_length_s": 30, "stride_length_s": 5})
+
+    for reference, candidate in report.pop("pairs"):
+        print(f"\n[fp32]   {reference}\n[{args.backend}] {candidate}")
+    print()
+    for key, value in report.items():
+        print(f"{key}: {value}")
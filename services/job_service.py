@@ -0,0 +1,183 @@
+# services/job_service.py
+
+import os
+import time
+import uuid
+import heapq
+import asyncio
+import itertools
+from collections import defaultdict
+
+# Nombre de tâches exécutées simultanément, toutes ressources confondues.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Nombre maximal de tâches simultanées par modèle.
+JOB_RESOURCE_LIMITS = {
+    "whisper": int(os.getenv("JOB_LIMIT_WHISPER", "1")),
+    "mt5": int(os.getenv("JOB_LIMIT_MT5", "1")),
+}
+# Durée de conservation des tâches terminées (résultats compris).
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(6 * 3600)))
+
+class Job:
+    """Une tâche de fond : son état, sa progression et son résultat."""
+    def __init__(self, kind: str, func, resource: str, priority: int, cleanup=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.func = func
+        self.cleanup = cleanup
+        self.resource = resource
+        self.priority = priority
+        self.status = "queued"  # queued, running, done, error, cancelled
+        self.progress = 0.0
+        self.message = "En attente..."
+        self.partial = ""
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.task = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "error", "cancelled")
+
+    def update(self, progress: float = None, message: str = None, partial: str = None):
+        """Appelé par la fonction de la tâche pour publier sa progression et son résultat partiel."""
+        if progress is not None: self.progress = max(0.0, min(1.0, progress))
+        if message is not None: self.message = message
+        if partial is not None: self.partial = partial
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id, "kind": self.kind, "status": self.status, "priority": self.priority,
+            "progress": self.progress, "message": self.message, "partial": self.partial, "error": self.error,
+            "created_at": self.created_at, "started_at": self.started_at, "finished_at": self.finished_at,
+        }
+
+class JobService:
+    """
+    File de tâches de fond à priorité (plus petit nombre = plus prioritaire), exécutée par
+    un pool de workers asyncio. Chaque ressource (modèle) a sa propre limite de concurrence :
+    une tâche n'est démarrée que si son modèle a une place libre. Les tâches sont indépendantes
+    des requêtes HTTP et survivent donc à la déconnexion du client.
+    """
+    def __init__(self, workers: int = JOB_WORKERS, resource_limits: dict = None):
+        print("Initialisation du Service de Tâches de fond...")
+        self.workers = workers
+        self.resource_limits = resource_limits or JOB_RESOURCE_LIMITS
+        self._jobs = {}
+        self._queue = []
+        self._counter = itertools.count()
+        self._running = defaultdict(int)
+        self._condition = None
+        self._worker_tasks = []
+
+    def submit(self, kind: str, func, resource: str = None, priority: int = 5, cleanup=None) -> Job:
+        """
+        Ajoute une tâche à la file. `func` est une coroutine `func(job)` dont la valeur de retour
+        devient le résultat de la tâche. `cleanup()` est appelé quand la tâche se termine, y compris
+        si elle est annulée avant d'avoir démarré. Doit être appelé depuis la boucle d'événements.
+        """
+        self._ensure_started()
+        self._purge_finished()
+        job = Job(kind, func, resource, priority, cleanup)
+        self._jobs[job.id] = job
+        heapq.heappush(self._queue, (priority, next(self._counter), job))
+        self._notify()
+        return job
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> list:
+        return [job.to_dict() for job in sorted(self._jobs.values(), key=lambda j: j.created_at)]
+
+    def cancel(self, job_id: str) -> bool:
+        """Annule une tâche en attente ou en cours. Retourne False si elle est inconnue ou déjà terminée."""
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        if job.status == "queued":
+            self._finish(job, "cancelled", message="Tâche annulée.")
+            self._notify()
+        elif job.task is not None:
+            job.task.cancel()
+        return True
+
+    def stats(self) -> dict:
+        statuses = defaultdict(int)
+        for job in self._jobs.values(): statuses[job.status] += 1
+        return {"workers": self.workers, "queued": statuses["queued"], "running": dict(self._running), "statuses": dict(statuses)}
+
+    def _ensure_started(self):
+        if self._worker_tasks:
+            return
+        self._condition = asyncio.Condition()
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _notify(self):
+        async def notify():
+            async with self._condition:
+                self._condition.notify_all()
+        asyncio.ensure_future(notify())
+
+    def _next_runnable(self):
+        """Retire de la file la tâche la plus prioritaire dont le modèle a une place libre."""
+        for entry in sorted(self._queue):
+            job = entry[2]
+            if job.status != "queued":
+                self._queue.remove(entry); heapq.heapify(self._queue)
+                continue
+            limit = self.resource_limits.get(job.resource)
+            if limit is None or self._running[job.resource] < limit:
+                self._queue.remove(entry); heapq.heapify(self._queue)
+                return job
+        return None
+
+    async def _worker(self):
+        while True:
+            async with self._condition:
+                job = self._next_runnable()
+                while job is None:
+                    await self._condition.wait()
+                    job = self._next_runnable()
+                self._running[job.resource] += 1
+            job.status = "running"; job.started_at = time.time(); job.message = "En cours..."
+            task = job.task = asyncio.create_task(job.func(job))
+            try:
+                job.result = await task
+                self._finish(job, "done", message="Terminé.")
+            except asyncio.CancelledError:
+                self._finish(job, "cancelled", message="Tâche annulée.")
+                if not task.cancelled():
+                    # C'est le worker lui-même qui est arrêté (fermeture du serveur).
+                    task.cancel()
+                    raise
+            except Exception as e:
+                print(f"ERREUR dans la tâche {job.id} ({job.kind}) : {e}")
+                job.error = str(e)
+                self._finish(job, "error", message=f"Erreur : {e}")
+            finally:
+                async with self._condition:
+                    self._running[job.resource] -= 1
+                    self._condition.notify_all()
+
+    def _finish(self, job: Job, status: str, message: str):
+        job.status = status
+        job.message = message
+        job.finished_at = time.time()
+        if status == "done": job.progress = 1.0
+        if job.cleanup is not None:
+            try:
+                job.cleanup()
+            except Exception as e:
+                print(f"ERREUR lors du nettoyage de la tâche {job.id} : {e}")
+        job.func = None; job.task = None; job.cleanup = None
+
+    def _purge_finished(self):
+        limit = time.time() - JOB_RETENTION_SECONDS
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished_at < limit]:
+            del self._jobs[job_id]
+
+job_service_instance = JobService()
@@ -0,0 +1,173 @@
+# services/model_registry.py
+
+import os
+import gc
+import time
+import threading
+from contextlib import contextmanager
+
+# Modèles à précharger en arrière-plan au démarrage du backend (ex. "summarization,transcription").
+WARMUP_MODELS = [name.strip() for name in os.getenv("WARMUP_MODELS", "").split(",") if name.strip()]
+# Mémoire totale que les modèles résidents peuvent occuper avant que les moins récemment utilisés soient déchargés.
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "8192"))
+
+def estimate_model_bytes(model) -> int:
+    """Taille approximative d'un pipeline Hugging Face en mémoire : paramètres et buffers de son modèle."""
+    # Les moteurs quantifiés ou ONNX (voir inference_backends) indiquent eux-mêmes leur empreinte.
+    if getattr(model, "approx_bytes", None):
+        return model.approx_bytes
+    module = getattr(model, "model", model)
+    try:
+        tensors = list(module.parameters()) + list(module.buffers())
+    except (AttributeError, TypeError):
+        return 0
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+class ModelRegistry:
+    """
+    Registre et gestionnaire de résidence des modèles de l'application.
+
+    Chaque service enregistre une fonction de chargement ; le modèle n'est chargé qu'à sa première
+    utilisation (ou par un préchargement en arrière-plan). Les modèles chargés restent en mémoire
+    tant que le budget `memory_budget_mb` le permet ; au-delà, les moins récemment utilisés sont
+    déchargés, puis rechargés à la demande. Un modèle en cours d'utilisation (`use`) n'est jamais déchargé.
+    """
+    def __init__(self, memory_budget_mb: int = MODEL_MEMORY_BUDGET_MB):
+        self.memory_budget_bytes = memory_budget_mb * 1024 * 1024
+        self._loaders = {}
+        self._size_hints = {}
+        self._models = {}
+        self._sizes = {}
+        self._last_used = {}
+        self._in_use = {}
+        self._status = {}
+        self._locks = {}
+        self._lock = threading.RLock()
+        self.evictions = 0
+
+    def register(self, name: str, loader, size_mb: int = 0):
+        """
+        Enregistre `loader()`, qui construit et retourne le modèle (ou lève une exception).
+        `size_mb` estime son empreinte avant le premier chargement, pour libérer la place à l'avance.
+        """
+        with self._lock:
+            self._loaders[name] = loader
+            self._size_hints[name] = size_mb * 1024 * 1024
+            self._locks[name] = threading.Lock()
+            self._in_use.setdefault(name, 0)
+            self._status.setdefault(name, "not_loaded")
+
+    def get(self, name: str):
+        """
+        Retourne le modèle, en le chargeant si besoin. Retourne None si son chargement a échoué :
+        l'échec n'est pas mémorisé, le chargement est retenté à l'appel suivant (réseau, mémoire...).
+        """
+        with self._lock:
+            if name in self._models:
+                self._last_used[name] = time.time()
+                return self._models[name]
+        with self._locks[name]:
+            with self._lock:
+                if name in self._models:
+                    self._last_used[name] = time.time()
+                    return self._models[name]
+                self._status[name] = "loading"
+                # On libère la place estimée avant de charger, pour ne pas dépasser le budget en pic.
+                self._evict_for(self._sizes.get(name) or self._size_hints[name], keep=name)
+            start_time = time.time()
+            try:
+                model = self._loaders[name]()
+                size = estimate_model_bytes(model)
+                print(f"Modèle '{name}' chargé en {time.time() - start_time:.1f} s (~{size / 1024 / 1024:.0f} Mo).")
+            except Exception as e:
+                print(f"ERREUR critique lors du chargement du modèle '{name}' : {e}")
+                with self._lock:
+                    self._status[name] = f"error: {e}"
+                return None
+            with self._lock:
+                self._models[name] = model
+                self._sizes[name] = size
+                self._last_used[name] = time.time()
+                self._status[name] = "loaded"
+                self._evict_for(0, keep=name)
+            return model
+
+    @contextmanager
+    def use(self, name: str):
+        """Fournit le modèle le temps d'un bloc `with` ; il ne peut pas être déchargé pendant ce temps."""
+        with self._lock:
+            self._in_use[name] += 1
+        try:
+            yield self.get(name)
+        finally:
+            with self._lock:
+                self._in_use[name] -= 1
+                self._last_used[name] = time.time()
+
+    def unload(self, name: str) -> bool:
+        """Décharge un modèle s'il n'est pas en cours d'utilisation."""
+        with self._lock:
+            if name not in self._models or self._in_use[name] > 0:
+                return False
+            del self._models[name]
+            self._status[name] = "unloaded"
+        print(f"Déchargement du modèle '{name}'...")
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+        return True
+
+    def _resident_bytes(self) -> int:
+        return sum(self._sizes.get(name, 0) for name in self._models)
+
+    def _evict_for(self, needed_bytes: int, keep: str):
+        """Décharge les modèles les moins récemment utilisés jusqu'à ce que `needed_bytes` tienne dans le budget."""
+        candidates = sorted(
+            (name for name in self._models if name != keep and self._in_use[name] == 0 and self._sizes.get(name)),
+            key=lambda name: self._last_used.get(name, 0)
+        )
+        for name in candidates:
+            if self._resident_bytes() + needed_bytes <= self.memory_budget_bytes:
+                break
+            if self.unload(name):
+                self.evictions += 1
+
+    def is_loaded(self, name: str) -> bool:
+        return self._status.get(name) == "loaded" and name in self._models
+
+    def warm_up(self, names: list = None) -> threading.Thread:
+        """Précharge les modèles demandés dans un thread d'arrière-plan."""
+        names = [name for name in (names or WARMUP_MODELS) if name in self._loaders]
+        def load_all():
+            for name in names:
+                self.get(name)
+        thread = threading.Thread(target=load_all, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self) -> dict:
+        return dict(self._status)
+
+    def stats(self) -> dict:
+        """Occupation mémoire estimée, par modèle et au total, au regard du budget."""
+        with self._lock:
+            return {
+                "budget_mb": round(self.memory_budget_bytes / 1024 / 1024),
+                "resident_mb": round(self._resident_bytes() / 1024 / 1024),
+                "evictions": self.evictions,
+                "models": {
+                    name: {
+                        "status": self._status[name],
+                        "size_mb": round(self._sizes.get(name, 0) / 1024 / 1024),
+                        "in_use": self._in_use[name],
+                        "last_used": self._last_used.get(name),
+                    }
+                    for name in self._loaders
+                },
+            }
+
+model_registry_instance = ModelRegistry()
@@ -0,0 +1,127 @@
+# services/ollama_client.py
+
+import os
+import json
+import time
+import asyncio
+import httpx
+
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+# Taille du pool de connexions HTTP (keep-alive) vers Ollama.
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "8"))
+# Générations simultanées par modèle ; les suivantes attendent leur tour (cf. OLLAMA_NUM_PARALLEL côté serveur).
+OLLAMA_MODEL_CONCURRENCY = int(os.getenv("OLLAMA_MODEL_CONCURRENCY", "2"))
+# Au-delà de ce nombre de requêtes en attente pour un modèle, les nouvelles sont refusées.
+OLLAMA_MAX_QUEUE = int(os.getenv("OLLAMA_MAX_QUEUE", "32"))
+OLLAMA_TIMEOUT_S = 900
+
+class OllamaBusyError(Exception):
+    """La file d'attente d'un modèle est pleine : la requête est refusée plutôt que mise en attente."""
+
+class OllamaClient:
+    """
+    Client partagé vers le serveur Ollama.
+
+    - Un seul client HTTP asynchrone, dont les connexions keep-alive sont réutilisées.
+    - Un sémaphore par modèle borne les générations simultanées ; les requêtes en surplus attendent
+      (profondeur de file mesurée), et sont refusées au-delà de OLLAMA_MAX_QUEUE.
+    - Si le consommateur abandonne le flux (client HTTP déconnecté, tâche annulée), la réponse
+      d'Ollama est fermée aussitôt : le serveur interrompt alors la génération.
+    """
+    def __init__(self, host: str = OLLAMA_HOST, model_concurrency: int = OLLAMA_MODEL_CONCURRENCY, max_queue: int = OLLAMA_MAX_QUEUE):
+        self.host = host
+        self.model_concurrency = model_concurrency
+        self.max_queue = max_queue
+        self._client = None
+        self._semaphores = {}
+        self._metrics = {}
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.host,
+                timeout=httpx.Timeout(OLLAMA_TIMEOUT_S, connect=10),
+                limits=httpx.Limits(max_connections=OLLAMA_MAX_CONNECTIONS, max_keepalive_connections=OLLAMA_MAX_CONNECTIONS)
+            )
+        return self._client
+
+    def _model_metrics(self, model: str) -> dict:
+        if model not in self._metrics:
+            self._semaphores[model] = asyncio.Semaphore(self.model_concurrency)
+            self._metrics[model] = {"waiting": 0, "active": 0, "completed": 0, "cancelled": 0, "errors": 0, "rejected": 0, "total_wait_s": 0.0}
+        return self._metrics[model]
+
+    def is_saturated(self, model: str) -> bool:
+        """Vrai si une nouvelle requête pour ce modèle serait refusée."""
+        return self._model_metrics(model)["waiting"] >= self.max_queue
+
+    async def generate_stream(self, model: str, prompt: str, **options):
+        """
+        Diffuse les réponses de /api/generate (un dict JSON par ligne) jusqu'à celle marquée 'done'.
+        Les paramètres supplémentaires (`context`, `keep_alive`, `options`...) sont transmis tels quels.
+
+        Raises:
+            OllamaBusyError: si la file d'attente du modèle est pleine.
+            httpx.HTTPError: en cas d'erreur de connexion ou de réponse.
+        """
+        metrics = self._model_metrics(model)
+        if metrics["waiting"] >= self.max_queue:
+            metrics["rejected"] += 1
+            raise OllamaBusyError(f"Trop de requêtes en attente pour '{model}' ({metrics['waiting']}). Réessayez plus tard.")
+
+        metrics["waiting"] += 1
+        queued_at = time.time()
+        try:
+            await self._semaphores[model].acquire()
+        finally:
+            metrics["waiting"] -= 1
+        metrics["total_wait_s"] += time.time() - queued_at
+        metrics["active"] += 1
+        outcome = "cancelled"
+        try:
+            async with self._get_client().stream("POST", "/api/generate", json={"model": model, "prompt": prompt, "stream": True, **options}) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("done"):
+                        outcome = "completed"
+                    yield chunk
+                    if outcome == "completed":
+                        break
+        except Exception:
+            outcome = "errors"
+            raise
+        finally:
+            # Sortie anticipée (GeneratorExit, annulation) : la réponse est fermée par le `async with` ci-dessus.
+            metrics[outcome] += 1
+            metrics["active"] -= 1
+            self._semaphores[model].release()
+            if outcome == "cancelled":
+                print(f"Génération Ollama ({model}) interrompue : le client a abandonné la requête.")
+
+    def stats(self) -> dict:
+        """Profondeur de file, générations en cours et compteurs par modèle."""
+        models = {}
+        for model, metrics in self._metrics.items():
+            started = metrics["completed"] + metrics["cancelled"] + metrics["errors"] + metrics["active"]
+            models[model] = {
+                **{key: value for key, value in metrics.items() if key != "total_wait_s"},
+                "avg_wait_s": round(metrics["total_wait_s"] / started, 3) if started else 0.0,
+            }
+        return {
+            "host": self.host,
+            "max_connections": OLLAMA_MAX_CONNECTIONS,
+            "model_concurrency": self.model_concurrency,
+            "max_queue": self.max_queue,
+            "queue_depth": sum(metrics["waiting"] for metrics in self._metrics.values()),
+            "models": models,
+        }
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+ollama_client_instance = OllamaClient()
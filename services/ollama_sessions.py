@@ -0,0 +1,100 @@
+# services/ollama_sessions.py
+
+import os
+import time
+import asyncio
+from collections import OrderedDict
+
+# Durée pendant laquelle Ollama garde le modèle (et son cache KV) chargé après une requête de session.
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Fenêtre de contexte demandée à Ollama pour toutes les requêtes locales, en session ou non :
+# une valeur différente d'une requête à l'autre ferait recharger le modèle et perdre son cache KV.
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "8192"))
+OLLAMA_SESSION_TTL_SECONDS = int(os.getenv("OLLAMA_SESSION_TTL_SECONDS", str(30 * 60)))
+OLLAMA_MAX_SESSIONS = int(os.getenv("OLLAMA_MAX_SESSIONS", "64"))
+# Part de la fenêtre au-delà de laquelle la conversation est réinitialisée (le document est alors relu).
+SESSION_CONTEXT_FILL_RATIO = 0.75
+# Tokens réservés, au premier tour, aux consignes, à la question et à la réponse.
+SESSION_ANSWER_TOKENS = 1024
+# Estimation prudente : environ 3 caractères par token en français.
+CHARS_PER_TOKEN = 3
+# Au-delà de cette taille, un document est trop long pour une session : on revient à la recherche de passages.
+# Le premier tour (document, question et réponse) doit tenir sous le seuil de réinitialisation de la fenêtre.
+OLLAMA_SESSION_MAX_CHARS = max(0, int(OLLAMA_NUM_CTX * SESSION_CONTEXT_FILL_RATIO) - SESSION_ANSWER_TOKENS) * CHARS_PER_TOKEN
+
+class OllamaSession:
+    """Conversation d'un modèle Ollama sur un document : jetons `context` renvoyés par Ollama au dernier tour."""
+    def __init__(self, document_id: str, model: str):
+        self.document_id = document_id
+        self.model = model
+        self.context = None
+        self.turns = 0
+        self.last_used = time.time()
+        # Les tours d'une même session sont joués l'un après l'autre : chacun prolonge le contexte du précédent.
+        self.lock = asyncio.Lock()
+
+class OllamaSessionStore:
+    """
+    Sessions Ollama par (document, modèle).
+
+    Le premier tour envoie le document suivi de la question ; Ollama renvoie les jetons `context`
+    de l'échange. Les tours suivants n'envoient que la nouvelle question avec ce `context` :
+    le préfixe déjà évalué (resté en cache KV grâce à `keep_alive`) n'est pas recalculé.
+    """
+    def __init__(self, max_sessions: int = OLLAMA_MAX_SESSIONS, ttl_seconds: int = OLLAMA_SESSION_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict()
+        self._stats = {"prefix_hits": 0, "prefix_misses": 0, "resets": 0, "reused_tokens": 0, "evaluated_tokens": 0}
+
+    def _evict_expired(self):
+        now = time.time()
+        for key in [key for key, session in self._sessions.items() if now - session.last_used > self.ttl_seconds]:
+            del self._sessions[key]
+
+    def get(self, document_id: str, model: str) -> OllamaSession:
+        """Retourne la session du document pour ce modèle, créée si besoin."""
+        self._evict_expired()
+        key = (document_id, model)
+        session = self._sessions.get(key)
+        if session is None:
+            session = self._sessions[key] = OllamaSession(document_id, model)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(key)
+        session.last_used = time.time()
+        return session
+
+    def record(self, session: OllamaSession, reused_tokens: int, evaluated_tokens: int, context: list):
+        """Enregistre un tour terminé : jetons réutilisés, jetons évalués et nouveau `context` renvoyé par Ollama."""
+        self._stats["prefix_hits" if reused_tokens else "prefix_misses"] += 1
+        self._stats["reused_tokens"] += reused_tokens
+        self._stats["evaluated_tokens"] += evaluated_tokens
+        session.turns += 1
+        session.last_used = time.time()
+        if context and len(context) < OLLAMA_NUM_CTX * SESSION_CONTEXT_FILL_RATIO:
+            session.context = context
+        else:
+            # Fenêtre presque pleine : le prochain tour repartira du document seul.
+            session.context = None
+            self._stats["resets"] += 1
+
+    def reset(self, document_id: str) -> int:
+        """Oublie les sessions d'un document ; retourne le nombre de sessions supprimées."""
+        keys = [key for key in self._sessions if key[0] == document_id]
+        for key in keys:
+            del self._sessions[key]
+        return len(keys)
+
+    def stats(self) -> dict:
+        self._evict_expired()
+        turns = self._stats["prefix_hits"] + self._stats["prefix_misses"]
+        prompt_tokens = self._stats["reused_tokens"] + self._stats["evaluated_tokens"]
+        return {
+            "sessions": len(self._sessions),
+            **self._stats,
+            "prefix_hit_rate": round(self._stats["prefix_hits"] / turns, 3) if turns else 0.0,
+            "reused_token_ratio": round(self._stats["reused_tokens"] / prompt_tokens, 3) if prompt_tokens else 0.0,
+        }
+
+ollama_session_store_instance = OllamaSessionStore()
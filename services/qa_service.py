@@ -1,8 +1,10 @@
 import os
-import requests
-import json
+import asyncio
 from dotenv import load_dotenv
 
+from services.ollama_client import ollama_client_instance
+from services.ollama_sessions import ollama_session_store_instance, OLLAMA_KEEP_ALIVE, OLLAMA_NUM_CTX
+
 # Les imports globaux pour la vérification
 try:
     import google.generativeai as genai
@@ -19,38 +21,97 @@ except ImportError:
 
 load_dotenv()
 OLLAMA_DEFAULT_MODEL = "codellama:latest"
-OLLAMA_HOST = "http://localhost:11434"
+# Prompts des sessions : le document n'est envoyé qu'au premier tour, les suivants ne portent que la question.
+SESSION_FIRST_PROMPT = "Contexte:\n---\n{context}\n---\nBasé UNIQUEMENT sur le contexte, réponds aux questions qui suivent.\n\nQuestion : {question}"
+SESSION_FOLLOWUP_PROMPT = "Question : {question}"
+
+# --- FOURNISSEURS D'API ---
+API_PROVIDERS = ("gemini", "openai", "anthropic")
+PROVIDER_LABELS = {"gemini": "Gemini", "openai": "OpenAI", "anthropic": "Anthropic"}
+# Préfixes de `model_choice` qui désignent chaque fournisseur (ex. 'gemini-flash', 'gpt-4o-mini', 'claude').
+PROVIDER_PREFIXES = {"gemini": ("gemini",), "openai": ("gpt", "openai", "o1", "o3", "o4"), "anthropic": ("claude", "anthropic")}
+GEMINI_MODEL = os.getenv("GEMINI_MODEL_NAME", "gemini-1.5-flash")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+ANTHROPIC_MODEL = os.getenv("ANTHROPIC_MODEL", "claude-3-5-haiku-latest")
+ANTHROPIC_MAX_TOKENS = int(os.getenv("ANTHROPIC_MAX_TOKENS", "4096"))
+# Stratégies d'interrogation de plusieurs fournisseurs :
+# - 'single'   : un seul fournisseur, déduit de `model_choice` ;
+# - 'race'     : tous les fournisseurs demandés en parallèle, le premier à répondre est diffusé, les autres annulés ;
+# - 'ensemble' : tous en parallèle, chaque réponse diffusée dans sa propre section.
+API_STRATEGIES = ("single", "race", "ensemble")
 
 class QAService:
     def __init__(self):
         print("Initialisation du QAService...")
         self.genai = genai
+        self.gemini_model = None
         self.openai_client = None
         self.anthropic_client = None
+        # Les clients (et le modèle Gemini) sont créés une fois et réutilisés : leurs connexions restent ouvertes.
         if self.genai and os.getenv("GOOGLE_API_KEY"):
             self.genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+            self.gemini_model = self.genai.GenerativeModel(GEMINI_MODEL)
             print("Client API Google Gemini configuré.")
         if openai and os.getenv("OPENAI_API_KEY"):
-            self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+            self.openai_client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
             print("Client API OpenAI configuré.")
         if anthropic and os.getenv("ANTHROPIC_API_KEY"):
-            self.anthropic_client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+            self.anthropic_client = anthropic.AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
             print("Client API Anthropic configuré.")
 
-    def ask(self, context, question, mode, model_choice):
-        print(f"\nRequête 'ask' reçue : mode='{mode}', model_choice='{model_choice}'")
+    def ollama_model(self, model_choice) -> str:
+        """Modèle Ollama utilisé en mode local."""
+        return OLLAMA_DEFAULT_MODEL if model_choice == "auto" else model_choice
+
+    def available_providers(self) -> list:
+        """Fournisseurs d'API configurés (bibliothèque installée et clé présente)."""
+        clients = {"gemini": self.gemini_model, "openai": self.openai_client, "anthropic": self.anthropic_client}
+        return [provider for provider in API_PROVIDERS if clients[provider] is not None]
+
+    def provider_for(self, model_choice) -> str:
+        """Fournisseur désigné par `model_choice`, sinon le premier fournisseur configuré."""
+        choice = (model_choice or "").lower()
+        for provider in API_PROVIDERS:
+            if choice.startswith(PROVIDER_PREFIXES[provider]):
+                return provider
+        available = self.available_providers()
+        return available[0] if available else "gemini"
+
+    async def ask(self, context, question, mode, model_choice, strategy="single", providers=None):
+        """
+        Diffuse la réponse du modèle, jeton par jeton.
+        En mode 'api', `strategy` et `providers` (liste de fournisseurs, par défaut tous ceux
+        configurés) permettent d'interroger plusieurs fournisseurs à la fois (voir API_STRATEGIES).
+        """
+        print(f"\nRequête 'ask' reçue : mode='{mode}', model_choice='{model_choice}', strategy='{strategy}'")
         if mode == "local":
-            target_model = OLLAMA_DEFAULT_MODEL if model_choice == "auto" else model_choice
-            yield from self._ask_ollama_stream(context, question, target_model)
+            async for token in self._ask_ollama_stream(context, question, self.ollama_model(model_choice)):
+                yield token
         elif mode == "api":
-            if "gemini" in model_choice:
-                yield from self._ask_gemini_stream(context, question)
+            prompt = context if not question else f"Contexte:\n---\n{context}\n---\nBasé UNIQUEMENT sur le contexte, réponds à la question: {question}"
+            providers = [p for p in (providers or self.available_providers()) if p in API_PROVIDERS]
+            if strategy == "single" or len(providers) < 2:
+                provider = self.provider_for(model_choice) if strategy == "single" or not providers else providers[0]
+                stream = self._ask_api_stream(provider, prompt)
+            elif strategy == "race":
+                stream = self._race(providers, prompt)
+            elif strategy == "ensemble":
+                stream = self._ensemble(providers, prompt)
             else:
-                yield from self._ask_gemini_stream(context, question)
+                raise ValueError(f"Stratégie non supportée : {strategy}")
+            async for token in stream:
+                yield token
         else:
             raise ValueError(f"Mode non supporté : {mode}")
 
-    def _ask_ollama_stream(self, context, question, model_name):
+    async def aclose(self):
+        await ollama_client_instance.aclose()
+        if self.openai_client is not None:
+            await self.openai_client.close()
+        if self.anthropic_client is not None:
+            await self.anthropic_client.close()
+
+    async def _ask_ollama_stream(self, context, question, model_name):
         print(f"--- Requête STREAM à Ollama ({model_name}) ---")
         model_name_lower = model_name.lower()
         prompt = ""
@@ -61,37 +122,155 @@ class QAService:
         else:
             prompt = f"Contexte:\n---\n{context}\n---\nBasé UNIQUEMENT sur le contexte, réponds à la question: {question}"
 
+        # Client partagé : file d'attente par modèle et arrêt de la génération si le client abandonne.
         try:
-            response = requests.post(
-                url=f"{OLLAMA_HOST}/api/generate",
-                json={"model": model_name, "prompt": prompt, "stream": True},
-                stream=True,
-                timeout=900
-            )
-            response.raise_for_status()
-            for line in response.iter_lines():
-                if line:
-                    chunk = json.loads(line)
-                    token = chunk.get("response", "")
-                    yield token
-                    if chunk.get("done"):
-                        break
+            async for chunk in ollama_client_instance.generate_stream(model_name, prompt, options={"num_ctx": OLLAMA_NUM_CTX}):
+                yield chunk.get("response", "")
         except Exception as e:
             yield f"\n\n--- ERREUR ---\nErreur de connexion à Ollama : {e}"
 
-    def _ask_gemini_stream(self, context, question):
-        if not self.genai:
-            yield "Erreur: La bibliothèque 'google-generativeai' n'est pas installée."
-            return
-        print("--- Requête STREAM à l'API Gemini ---")
-        prompt = context if not question else f"Contexte:\n---\n{context}\n---\nBasé UNIQUEMENT sur le contexte, réponds à la question: {question}"
-        try:
-            model = self.genai.GenerativeModel('gemini-1.5-flash')
-            responses = model.generate_content(prompt, stream=True)
-            for response in responses:
+    async def ask_in_session(self, document_id, context, question, model_choice):
+        """
+        Q&A local en session (voir OllamaSessionStore) : les questions successives sur un même document
+        réutilisent les jetons `context` d'Ollama, seule la nouvelle question est évaluée.
+        """
+        model_name = self.ollama_model(model_choice)
+        session = ollama_session_store_instance.get(document_id, model_name)
+        async with session.lock:
+            reused_context = session.context
+            print(f"--- Requête STREAM à Ollama en session ({model_name}, tour {session.turns + 1}, préfixe {'réutilisé' if reused_context else 'à évaluer'}) ---")
+            request = {"keep_alive": OLLAMA_KEEP_ALIVE, "options": {"num_ctx": OLLAMA_NUM_CTX}}
+            if reused_context:
+                prompt = SESSION_FOLLOWUP_PROMPT.format(question=question)
+                request["context"] = reused_context
+            else:
+                prompt = SESSION_FIRST_PROMPT.format(context=context, question=question)
+            try:
+                async for chunk in ollama_client_instance.generate_stream(model_name, prompt, **request):
+                    yield chunk.get("response", "")
+                    if chunk.get("done"):
+                        ollama_session_store_instance.record(
+                            session, len(reused_context or []), chunk.get("prompt_eval_count", 0), chunk.get("context")
+                        )
+            except Exception as e:
+                yield f"\n\n--- ERREUR ---\nErreur de connexion à Ollama : {e}"
+
+    async def _provider_stream(self, provider, prompt):
+        """Flux brut d'un fournisseur d'API ; les erreurs sont levées."""
+        if provider not in self.available_providers():
+            raise RuntimeError(f"Le fournisseur {PROVIDER_LABELS[provider]} n'est pas configuré (bibliothèque ou clé API manquante).")
+        print(f"--- Requête STREAM à l'API {PROVIDER_LABELS[provider]} ---")
+        if provider == "gemini":
+            responses = await self.gemini_model.generate_content_async(prompt, stream=True)
+            async for response in responses:
                 if response.parts:
                     yield response.text
+        elif provider == "openai":
+            stream = await self.openai_client.chat.completions.create(
+                model=OPENAI_MODEL, messages=[{"role": "user", "content": prompt}], stream=True
+            )
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                await stream.close()
+        elif provider == "anthropic":
+            async with self.anthropic_client.messages.stream(
+                model=ANTHROPIC_MODEL, max_tokens=ANTHROPIC_MAX_TOKENS, messages=[{"role": "user", "content": prompt}]
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield text
+
+    async def _ask_api_stream(self, provider, prompt):
+        try:
+            async for token in self._provider_stream(provider, prompt):
+                yield token
+        except Exception as e:
+            yield f"\n\n--- ERREUR ---\nErreur avec l'API {PROVIDER_LABELS[provider]} : {e}"
+
+    async def _race(self, providers, prompt):
+        """Interroge les fournisseurs en parallèle et diffuse le premier qui produit un jeton ; les autres sont annulés."""
+        streams = {provider: self._provider_stream(provider, prompt) for provider in providers}
+        pending = {asyncio.ensure_future(streams[provider].__anext__()): provider for provider in providers}
+        winner, first_token, errors = None, None, []
+        try:
+            while pending and winner is None:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    provider = pending.pop(task)
+                    try:
+                        token = task.result()
+                    except StopAsyncIteration:
+                        errors.append(f"{PROVIDER_LABELS[provider]} : réponse vide")
+                        continue
+                    except Exception as e:
+                        errors.append(f"{PROVIDER_LABELS[provider]} : {e}")
+                        continue
+                    if winner is None:
+                        winner, first_token = provider, token
+        finally:
+            # Annule les fournisseurs distancés (leurs requêtes HTTP sont interrompues).
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for provider, stream in streams.items():
+                if provider != winner:
+                    await stream.aclose()
+
+        if winner is None:
+            yield "\n\n--- ERREUR ---\nAucun fournisseur n'a répondu :\n" + "\n".join(errors)
+            return
+        print(f"Course remportée par {PROVIDER_LABELS[winner]}.")
+        yield first_token
+        try:
+            async for token in streams[winner]:
+                yield token
         except Exception as e:
-            yield f"Erreur avec l'API Gemini : {e}"
+            yield f"\n\n--- ERREUR ---\nErreur avec l'API {PROVIDER_LABELS[winner]} : {e}"
+        finally:
+            await streams[winner].aclose()
+
+    async def _ensemble(self, providers, prompt):
+        """
+        Interroge les fournisseurs en parallèle. Chaque réponse est diffusée dans sa propre section :
+        la première à démarrer en direct, les suivantes (mises en mémoire pendant ce temps) ensuite.
+        """
+        queue = asyncio.Queue()
+
+        async def pump(provider):
+            async for token in self._ask_api_stream(provider, prompt):
+                await queue.put((provider, token))
+            await queue.put((provider, None))
+
+        tasks = [asyncio.ensure_future(pump(provider)) for provider in providers]
+        buffers = {provider: [] for provider in providers}
+        finished, flushed, current = set(), set(), None
+        try:
+            while len(flushed) < len(providers):
+                if current is None:
+                    ready = [p for p in providers if p not in flushed and p in finished] or [p for p in providers if p not in flushed and buffers[p]]
+                    if ready:
+                        current = ready[0]
+                        separator = "\n\n" if flushed else ""
+                        yield f"{separator}### {PROVIDER_LABELS[current]}\n\n" + "".join(buffers[current])
+                        buffers[current].clear()
+                        if current in finished:
+                            flushed.add(current)
+                            current = None
+                        continue
+                provider, token = await queue.get()
+                if token is None:
+                    finished.add(provider)
+                    if provider == current:
+                        flushed.add(provider)
+                        current = None
+                elif provider == current:
+                    yield token
+                else:
+                    buffers[provider].append(token)
+        finally:
+            for task in tasks:
+                task.cancel()
 
 qa_service_instance = QAService()
@@ -0,0 +1,116 @@
+# services/retrieval_service.py
+
+import os
+import re
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict, Counter
+import numpy as np
+
+from services.text_chunker import chunk_text_by_tokens
+
+# Taille des passages indexés (en tokens estimés) et recouvrement entre passages.
+RETRIEVAL_PASSAGE_TOKENS = int(os.getenv("RETRIEVAL_PASSAGE_TOKENS", "250"))
+RETRIEVAL_PASSAGE_OVERLAP = int(os.getenv("RETRIEVAL_PASSAGE_OVERLAP", "40"))
+# Nombre maximal d'index gardés en mémoire (un par document).
+RETRIEVAL_MAX_INDEXES = int(os.getenv("RETRIEVAL_MAX_INDEXES", "32"))
+
+WORD_PATTERN = re.compile(r"\w+")
+STOP_WORDS = {
+    "le", "la", "les", "un", "une", "des", "du", "de", "d", "l", "et", "ou", "en", "au", "aux",
+    "a", "ce", "ces", "cet", "cette", "est", "sont", "que", "qui", "quoi", "quel", "quels", "quelle",
+    "quelles", "pour", "par", "sur", "dans", "avec", "ne", "pas", "plus", "se", "sa", "son", "ses",
+    "il", "elle", "ils", "elles", "on", "nous", "vous", "je", "tu", "y", "the", "of", "and", "to", "is",
+}
+
+def normalize_terms(text: str) -> list:
+    """Minuscules, suppression des accents et des mots vides."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [w for w in WORD_PATTERN.findall(text) if w not in STOP_WORDS and len(w) > 1]
+
+class BM25Index:
+    """
+    Index BM25 d'un document découpé en passages.
+    L'index inversé associe chaque terme à ses passages et fréquences (tableaux NumPy),
+    de sorte qu'une requête ne parcourt que les listes de ses propres termes.
+    """
+    def __init__(self, passages: list, k1: float = 1.5, b: float = 0.75):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        postings = {}
+        lengths = np.zeros(len(passages), dtype=np.float32)
+        for passage_id, passage in enumerate(passages):
+            terms = Counter(normalize_terms(passage))
+            lengths[passage_id] = sum(terms.values())
+            for term, tf in terms.items():
+                postings.setdefault(term, ([], []))
+                postings[term][0].append(passage_id); postings[term][1].append(tf)
+        n_passages = max(len(passages), 1)
+        avg_length = float(lengths.mean()) if len(passages) else 1.0
+        self._norm = self.k1 * (1 - self.b + self.b * lengths / max(avg_length, 1.0))
+        self._postings = {}
+        for term, (ids, tfs) in postings.items():
+            ids = np.asarray(ids, dtype=np.int32); tfs = np.asarray(tfs, dtype=np.float32)
+            idf = np.log(1 + (n_passages - len(ids) + 0.5) / (len(ids) + 0.5))
+            self._postings[term] = (ids, idf * tfs * (self.k1 + 1) / (tfs + self._norm[ids]))
+
+    def search(self, query: str, top_k: int = 5) -> list:
+        """Retourne les indices des `top_k` passages les plus pertinents, triés par score décroissant."""
+        scores = np.zeros(len(self.passages), dtype=np.float32)
+        for term in set(normalize_terms(query)):
+            if term in self._postings:
+                ids, weights = self._postings[term]
+                scores[ids] += weights
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k)[:top_k]]
+        return candidates[np.argsort(-scores[candidates])].tolist()
+
+class RetrievalService:
+    """
+    Gère un index de recherche par document, construit une seule fois au chargement
+    puis réutilisé pour toutes les questions posées sur ce document.
+    """
+    def __init__(self, max_indexes: int = RETRIEVAL_MAX_INDEXES):
+        print("Initialisation du Service de Recherche (BM25)...")
+        self.max_indexes = max_indexes
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def document_key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def build_index(self, text: str, key: str = None) -> str:
+        """Construit (ou retrouve) l'index d'un document et retourne sa clé."""
+        key = key or self.document_key(text)
+        self._get_index(text, key)
+        return key
+
+    def _get_index(self, text: str, key: str) -> BM25Index:
+        with self._lock:
+            if key in self._indexes:
+                self._indexes.move_to_end(key)
+                return self._indexes[key]
+        passages = chunk_text_by_tokens(text, RETRIEVAL_PASSAGE_TOKENS, overlap_tokens=RETRIEVAL_PASSAGE_OVERLAP)
+        index = BM25Index(passages)
+        print(f"Index de recherche construit : {len(passages)} passages.")
+        with self._lock:
+            self._indexes[key] = index
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+        return index
+
+    def retrieve(self, text: str, question: str, top_k: int = 5, key: str = None) -> list:
+        """
+        Retourne les `top_k` passages du document les plus pertinents pour la question,
+        remis dans l'ordre du document. L'index est construit au premier appel si besoin.
+        """
+        index = self._get_index(text, key or self.document_key(text))
+        best = sorted(index.search(question, top_k))
+        return [index.passages[i] for i in best]
+
+retrieval_service_instance = RetrievalService()
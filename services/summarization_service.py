@@ -1,13 +1,21 @@
 # services/summarization_service.py
 
 import torch
-from transformers import pipeline
+from transformers import AutoTokenizer
 import os
 
+from services.model_registry import model_registry_instance
+from services.inference_backends import build_pipeline, backend_for
+
+# Longueur d'entrée maximale du modèle mT5 (en tokens).
+MAX_INPUT_TOKENS = 512
+SUMMARY_PREFIX = "résume ce texte: "
+
 class SummarizationService:
     """
     Gère la génération de résumés de texte en utilisant un modèle pré-entraîné.
     Inclut des optimisations pour améliorer la qualité de la génération.
+    Le modèle est chargé à sa première utilisation via le registre de modèles.
     """
     def __init__(self):
         print("Initialisation du Service de Résumé...")
@@ -16,19 +24,31 @@ class SummarizationService:
         print(f"Le service de résumé utilisera le périphérique : {self.device}")
 
         # Le nom d'identification du modèle sur le Hub de Hugging Face.
-        model_id = "airKlizz/mt5-base-wikinewssum-french"
-        
-        try:
-            print(f"Chargement du modèle de résumé '{model_id}' depuis le cache...")
-            self.summarizer = pipeline(
-                "summarization",
-                model=model_id,
-                device=self.device
-            )
-            print("Modèle de résumé chargé avec succès.")
-        except Exception as e:
-            print(f"ERREUR critique lors du chargement du modèle de résumé : {e}")
-            self.summarizer = None
+        self.model_id = "airKlizz/mt5-base-wikinewssum-french"
+        # Moteur d'inférence : 'pytorch', 'int8' ou 'onnx' (variable SUMMARIZATION_BACKEND).
+        self.backend = backend_for("summarization")
+        model_registry_instance.register("summarization", self._load_pipeline, size_mb=2400)
+        # Le tokenizer seul suffit au découpage des documents : il est bien plus léger que le modèle.
+        model_registry_instance.register("summarization_tokenizer", lambda: AutoTokenizer.from_pretrained(self.model_id))
+
+    def _load_pipeline(self):
+        print(f"Chargement du modèle de résumé '{self.model_id}' depuis le cache...")
+        return build_pipeline("summarization", self.model_id, self.device, self.backend)
+
+    @property
+    def tokenizer(self):
+        return model_registry_instance.get("summarization_tokenizer")
+
+    def input_token_budget(self) -> int:
+        """
+        Nombre de tokens de texte qu'un morceau peut contenir sans être tronqué
+        par le pipeline (préfixe et token de fin déduits).
+        """
+        if self.tokenizer is None:
+            return MAX_INPUT_TOKENS - 8
+        max_length = min(self.tokenizer.model_max_length, MAX_INPUT_TOKENS)
+        prefix_tokens = len(self.tokenizer(SUMMARY_PREFIX, add_special_tokens=False)["input_ids"])
+        return max_length - prefix_tokens - self.tokenizer.num_special_tokens_to_add()
             
     def summarize(self, text: str, min_length: int = 30, max_length: int = 150) -> str:
         """
@@ -43,34 +63,76 @@ class SummarizationService:
 
         Returns:
             str: Le texte résumé.
+
+        Raises:
+            Exception: si le modèle est indisponible ou si le résumé échoue.
         """
-        if self.summarizer is None:
-            return "Erreur : Le service de résumé n'est pas initialisé. Vérifiez les logs pour les erreurs de chargement."
         if not text:
             return "Le texte fourni est vide."
+        with model_registry_instance.use("summarization") as summarizer:
+            if summarizer is None:
+                raise RuntimeError("Le service de résumé n'est pas initialisé. Vérifiez les logs pour les erreurs de chargement.")
         
-        print(f"Début du résumé (longueur min:{min_length}, max:{max_length})...")
+            print(f"Début du résumé (longueur min:{min_length}, max:{max_length})...")
         
-        # Ajout d'un préfixe pour guider le modèle T5.
-        text_with_prefix = "résume ce texte: " + text
+            # Ajout d'un préfixe pour guider le modèle T5.
+            text_with_prefix = SUMMARY_PREFIX + text
         
-        try:
-            result = self.summarizer(
-                text_with_prefix,
-                min_length=min_length,       # Utilise la valeur reçue de l'interface
-                max_length=max_length,       # Utilise la valeur reçue de l'interface
+            try:
+                result = summarizer(
+                    text_with_prefix,
+                    min_length=min_length,       # Utilise la valeur reçue de l'interface
+                    max_length=max_length,       # Utilise la valeur reçue de l'interface
+                    no_repeat_ngram_size=3,
+                    num_beams=4,
+                    early_stopping=True
+                )
+            
+                summary = result[0]['summary_text']
+                print("Résumé terminé.")
+                return summary
+            
+            except Exception as e:
+                print(f"ERREUR lors du résumé : {e}")
+                raise
+
+    def summarize_batch(self, texts: list, min_length: int = 30, max_length: int = 150, batch_size: int = 4) -> list:
+        """
+        Génère les résumés d'une liste de textes en un seul appel au pipeline.
+        Le pipeline regroupe les entrées par lots de `batch_size`, ce qui évite
+        une recherche en faisceau séquentielle par texte.
+
+        Comme pour `summarize`, les erreurs sont levées afin que l'appelant
+        puisse distinguer un résumé valide d'un échec.
+
+        Args:
+            texts (list): Les textes à résumer.
+            min_length (int): La longueur minimale de chaque résumé.
+            max_length (int): La longueur maximale de chaque résumé.
+            batch_size (int): Le nombre de textes traités ensemble par le modèle.
+
+        Returns:
+            list: Les résumés, dans le même ordre que `texts`.
+        """
+        if not texts:
+            return []
+        with model_registry_instance.use("summarization") as summarizer:
+            if summarizer is None:
+                raise RuntimeError("Le service de résumé n'est pas initialisé.")
+
+            print(f"Début du résumé par lot de {len(texts)} textes (batch_size:{batch_size})...")
+            inputs = [SUMMARY_PREFIX + text for text in texts]
+            results = summarizer(
+                inputs,
+                batch_size=batch_size,
+                min_length=min_length,
+                max_length=max_length,
                 no_repeat_ngram_size=3,
                 num_beams=4,
                 early_stopping=True
             )
-            
-            summary = result[0]['summary_text']
-            print("Résumé terminé.")
-            return summary
-            
-        except Exception as e:
-            print(f"ERREUR lors du résumé : {e}")
-            return f"Une erreur est survenue pendant le résumé : {e}"
+        print("Résumé par lot terminé.")
+        return [result['summary_text'] for result in results]
 
 # Création de l'instance unique du service.
 summarization_service_instance = SummarizationService()
\ No newline at end of file
@@ -0,0 +1,98 @@
+# services/text_chunker.py
+
+import re
+import numpy as np
+
+# Fin de phrase (ponctuation éventuellement suivie de guillemets/parenthèses) ou saut de paragraphe.
+BOUNDARY_PATTERN = re.compile(r'[.!?…]+["»)\]]*\s+|\n\s*\n')
+# Découpage approximatif utilisé quand aucun tokenizer n'est disponible.
+FALLBACK_TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+# Nombre moyen de tokens sentencepiece par unité du découpage approximatif (mots et ponctuation en français).
+FALLBACK_TOKENS_PER_UNIT = 1.4
+
+def split_sentences(text: str) -> list:
+    """
+    Découpe un texte en phrases (voir BOUNDARY_PATTERN).
+
+    Returns:
+        list: Des paires (phrase, séparateur) ; le séparateur est l'espacement d'origine
+            qui suit la phrase, ce qui permet de réassembler le texte à l'identique.
+    """
+    sentences = []
+    start = 0
+    for match in BOUNDARY_PATTERN.finditer(text):
+        segment = text[start:match.end()]
+        sentence = segment.rstrip()
+        if sentence.strip():
+            sentences.append((sentence.strip(), segment[len(sentence):]))
+        start = match.end()
+    if text[start:].strip():
+        sentences.append((text[start:].strip(), ""))
+    return sentences
+
+def token_offsets(text: str, tokenizer=None) -> np.ndarray:
+    """
+    Retourne la position (en caractères) du début de chaque token du texte.
+    Le texte est tokenisé en une seule passe grâce au mapping d'offsets du tokenizer rapide.
+    """
+    if tokenizer is not None:
+        encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+        offsets = np.asarray(encoding["offset_mapping"], dtype=np.int64).reshape(-1, 2)
+        return offsets[:, 0]
+    return np.fromiter((m.start() for m in FALLBACK_TOKEN_PATTERN.finditer(text)), dtype=np.int64)
+
+def chunk_text_by_tokens(text: str, max_tokens: int, tokenizer=None, overlap_tokens: int = 0) -> list:
+    """
+    Découpe un texte en morceaux d'au plus `max_tokens` tokens, en coupant de préférence
+    aux fins de phrases ou de paragraphes. Une phrase plus longue que le budget est
+    coupée à une frontière de token.
+
+    Args:
+        text (str): Le texte à découper.
+        max_tokens (int): Le budget de tokens par morceau.
+        tokenizer: Le tokenizer (rapide) du modèle cible. Sans tokenizer, le nombre
+            de tokens est estimé à partir des mots et de la ponctuation.
+        overlap_tokens (int): Recouvrement approximatif entre morceaux consécutifs,
+            aligné sur une frontière de phrase.
+
+    Returns:
+        list: Les morceaux de texte, dans l'ordre.
+    """
+    if not isinstance(text, str) or not text.strip():
+        return []
+    if tokenizer is None:
+        max_tokens = max(1, int(max_tokens / FALLBACK_TOKENS_PER_UNIT))
+        overlap_tokens = int(overlap_tokens / FALLBACK_TOKENS_PER_UNIT)
+
+    starts = token_offsets(text, tokenizer)
+    n_tokens = len(starts)
+    if n_tokens <= max_tokens:
+        return [text.strip()]
+
+    # Index du premier token de chaque phrase : une seule recherche vectorisée pour tout le texte.
+    boundaries = np.fromiter((m.end() for m in BOUNDARY_PATTERN.finditer(text)), dtype=np.int64)
+    cuts = np.unique(np.searchsorted(starts, boundaries, side="left"))
+    cuts = cuts[(cuts > 0) & (cuts < n_tokens)]
+    char_starts = np.append(starts, len(text))
+
+    chunks = []
+    start = 0
+    while start < n_tokens:
+        limit = start + max_tokens
+        if limit >= n_tokens:
+            end = n_tokens
+        else:
+            position = np.searchsorted(cuts, limit, side="right") - 1
+            end = int(cuts[position]) if position >= 0 and cuts[position] > start else limit
+        chunk = text[char_starts[start]:char_starts[end]].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= n_tokens:
+            break
+        next_start = end
+        if overlap_tokens > 0:
+            position = np.searchsorted(cuts, end - overlap_tokens, side="left")
+            if position < len(cuts) and start < cuts[position] < end:
+                next_start = int(cuts[position])
+        start = next_start
+    return chunks
@@ -1,13 +1,25 @@
 # services/transcription_service.py
 
 import torch
-from transformers import pipeline
+import numpy as np
+import subprocess
 import time
+import os
+
+from services.model_registry import model_registry_instance
+from services.inference_backends import build_pipeline, backend_for
+
+SAMPLING_RATE = 16000
+# Fenêtrage utilisé par le pipeline et par la transcription en flux.
+CHUNK_LENGTH_S = 30
+STRIDE_LENGTH_S = 5
+# Nombre de fenêtres de 30 s traitées ensemble par Whisper lors de l'ingestion groupée.
+ASR_BATCH_SIZE = int(os.getenv("ASR_BATCH_SIZE", "8"))
 
 class TranscriptionService:
     """
     Gère la transcription de fichiers audio en texte pour le français et l'anglais
-    en utilisant le modèle 'whisper-base'.
+    en utilisant le modèle 'whisper-base', chargé à sa première utilisation.
     """
     def __init__(self):
         print("Initialisation du Service de Transcription (mode simple Fr/En)...")
@@ -16,25 +28,27 @@ class TranscriptionService:
         print(f"Le service de transcription utilisera le périphérique : {self.device}")
 
         # Modèle de base, léger et efficace pour les langues à haute ressource.
-        model_id = "openai/whisper-base"
-        
-        try:
-            print(f"Chargement du modèle de transcription '{model_id}' depuis le cache...")
-            self.pipe = pipeline(
-                "automatic-speech-recognition",
-                model=model_id,
-                device=self.device,
-                chunk_length_s=30,
-                stride_length_s=5
-            )
-            print("Modèle de transcription chargé avec succès.")
-        except Exception as e:
-            print(f"ERREUR critique lors du chargement du modèle de transcription : {e}")
-            self.pipe = None
+        self.model_id = "openai/whisper-base"
+        # Moteur d'inférence : 'pytorch', 'int8' ou 'onnx' (variable TRANSCRIPTION_BACKEND).
+        self.backend = backend_for("transcription")
+        model_registry_instance.register("transcription", self._load_pipeline, size_mb=300)
+
+    def _load_pipeline(self):
+        print(f"Chargement du modèle de transcription '{self.model_id}' depuis le cache...")
+        return build_pipeline(
+            "automatic-speech-recognition",
+            self.model_id,
+            self.device,
+            self.backend,
+            chunk_length_s=CHUNK_LENGTH_S,
+            stride_length_s=STRIDE_LENGTH_S
+        )
 
     def transcribe(self, audio_file_path: str, language: str = "auto") -> str:
         """
         Prend le chemin d'un fichier audio et retourne le texte transcrit.
+        L'audio est décodé et transcrit par fenêtres (voir `transcribe_stream`),
+        la mémoire utilisée ne dépend donc pas de la durée de l'enregistrement.
         
         Args:
             audio_file_path (str): Le chemin vers le fichier audio.
@@ -42,33 +56,112 @@ class TranscriptionService:
 
         Returns:
             str: Le texte transcrit.
-        """
-        if self.pipe is None:
-            return "Erreur : Le service de transcription n'a pas pu être initialisé."
 
-        print(f"Début de la transcription pour '{audio_file_path}' (Langue spécifiée : {language})")
+        Raises:
+            Exception: si la transcription échoue (le message d'erreur n'est jamais renvoyé comme texte).
+        """
         start_time = time.time()
-        
-        # Préparation des paramètres pour le pipeline de transcription
-        generate_kwargs = {
-            "task": "transcribe"
-        }
-        # Si une langue est spécifiée (et que ce n'est pas 'auto'), on l'ajoute pour guider le modèle.
-        if language and language.lower() != "auto":
-            generate_kwargs["language"] = language
-            print(f"Forçage de la langue à : {language}")
-        else:
-            print("Détection automatique de la langue activée.")
-            
         try:
-            outputs = self.pipe(audio_file_path, generate_kwargs=generate_kwargs)
-            transcribed_text = outputs["text"]
+            transcribed_text = " ".join(segment["text"] for segment in self.transcribe_stream(audio_file_path, language))
             end_time = time.time()
             print(f"Transcription terminée en {end_time - start_time:.2f} secondes.")
             return transcribed_text.strip()
         except Exception as e:
             print(f"ERREUR lors de la transcription : {e}")
-            return f"Une erreur est survenue pendant la transcription : {e}"
+            raise
+
+    def transcribe_stream(self, audio_file_path: str, language: str = "auto", window_s: int = CHUNK_LENGTH_S):
+        """
+        Transcrit un fichier audio fenêtre par fenêtre et produit les segments au fur et à mesure.
+
+        L'audio est décodé en flux par ffmpeg (mono, 16 kHz). Pour ne pas couper un mot entre
+        deux fenêtres, les segments qui se terminent dans les `STRIDE_LENGTH_S` dernières secondes
+        d'une fenêtre sont retenus : leur audio est reporté au début de la fenêtre suivante.
+        Chaque fenêtre (audio reporté compris) dure au plus `window_s` secondes : avec la valeur
+        par défaut, elle tient dans un seul passage du pipeline (`CHUNK_LENGTH_S`), sans double décodage.
+        Les erreurs sont levées.
+
+        Args:
+            audio_file_path (str): Le chemin vers le fichier audio.
+            language (str): 'auto' pour la détection, ou un code de langue ('fr', 'en').
+            window_s (int): Durée maximale d'une fenêtre transmise au modèle.
+
+        Yields:
+            dict: {'start': float, 'end': float, 'text': str}, horodatés en secondes depuis le début du fichier.
+        """
+        # Le modèle reste réservé (non déchargeable) pendant toute la durée du flux.
+        with model_registry_instance.use("transcription") as pipe:
+            if pipe is None:
+                raise RuntimeError("Le service de transcription n'a pas pu être initialisé.")
+
+            print(f"Début de la transcription en flux pour '{audio_file_path}' (Langue spécifiée : {language})")
+            generate_kwargs = {"task": "transcribe"}
+            if language and language.lower() != "auto":
+                generate_kwargs["language"] = language
+
+            command = [
+                "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-i", audio_file_path,
+                "-ac", "1", "-ar", str(SAMPLING_RATE), "-f", "f32le", "pipe:1"
+            ]
+            window_samples = int(window_s * SAMPLING_RATE)
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            try:
+                carry = np.zeros(0, dtype=np.float32)
+                carry_start_s = 0.0
+                is_last = False
+                while not is_last:
+                    # Seul le complément de l'audio reporté est décodé : la fenêtre ne dépasse pas `window_s`.
+                    needed_bytes = max(window_samples - len(carry), SAMPLING_RATE) * 4
+                    raw = process.stdout.read(needed_bytes)
+                    is_last = len(raw) < needed_bytes
+                    audio = np.concatenate([carry, np.frombuffer(raw, dtype=np.float32)])
+                    if not len(audio):
+                        break
+                    duration_s = len(audio) / SAMPLING_RATE
+                    outputs = pipe(
+                        {"raw": audio, "sampling_rate": SAMPLING_RATE},
+                        generate_kwargs=generate_kwargs,
+                        return_timestamps=True
+                    )
+                    emitted_until_s = 0.0
+                    for chunk in outputs.get("chunks", []):
+                        start_s, end_s = chunk["timestamp"]
+                        start_s = start_s or 0.0
+                        end_s = end_s if end_s is not None else duration_s
+                        if not is_last and end_s > duration_s - STRIDE_LENGTH_S and emitted_until_s > 0:
+                            break
+                        emitted_until_s = end_s
+                        if chunk["text"].strip():
+                            yield {"start": round(carry_start_s + start_s, 2), "end": round(carry_start_s + end_s, 2), "text": chunk["text"].strip()}
+                    if emitted_until_s == 0.0:
+                        # Fenêtre sans parole : on ne garde que sa fin pour borner la mémoire.
+                        emitted_until_s = max(0.0, duration_s - STRIDE_LENGTH_S)
+                    # L'audio non encore transcrit est reporté sur la fenêtre suivante.
+                    carry = audio[int(emitted_until_s * SAMPLING_RATE):]
+                    carry_start_s += emitted_until_s
+            finally:
+                process.kill()
+                process.wait()
+
+    def transcribe_batch(self, audio_file_paths: list, language: str = "auto", batch_size: int = ASR_BATCH_SIZE):
+        """
+        Transcrit plusieurs fichiers audio en regroupant leurs fenêtres de 30 s par lots
+        (`batch_size` du pipeline), ce qui occupe mieux le modèle qu'un fichier à la fois.
+
+        Yields:
+            tuple: (index du fichier, texte transcrit), dans l'ordre des fichiers.
+        """
+        generate_kwargs = {"task": "transcribe"}
+        if language and language.lower() != "auto":
+            generate_kwargs["language"] = language
+        with model_registry_instance.use("transcription") as pipe:
+            if pipe is None:
+                raise RuntimeError("Le service de transcription n'a pas pu être initialisé.")
+            print(f"Début de la transcription groupée de {len(audio_file_paths)} fichiers (batch_size:{batch_size})...")
+            # Un générateur en entrée fait renvoyer au pipeline un itérateur : chaque résultat est produit dès qu'il est prêt.
+            outputs = pipe((path for path in audio_file_paths), batch_size=batch_size, generate_kwargs=generate_kwargs)
+            for index, output in enumerate(outputs):
+                yield index, output["text"].strip()
 
 # Création de l'instance unique du service qui sera utilisée par le reste de l'application.
 transcription_service_instance = TranscriptionService()
\ No newline at end of file
@@ -1,57 +1,106 @@
 # services/translation_service.py
 
+import os
 import torch
-from transformers import pipeline
+
+from services.model_registry import model_registry_instance
+from services.inference_backends import build_pipeline, backend_for
+from services.cache_service import cache_service_instance
+from services.text_chunker import split_sentences, chunk_text_by_tokens
+
+# Nombre de phrases traduites ensemble par le modèle.
+TRANSLATION_BATCH_SIZE = int(os.getenv("TRANSLATION_BATCH_SIZE", "16"))
+# Au-delà de cette longueur (en tokens), une phrase est découpée avant traduction : NLLB tronque les entrées longues.
+TRANSLATION_MAX_TOKENS = int(os.getenv("TRANSLATION_MAX_TOKENS", "200"))
 
 class TranslationService:
     """
-    Gère la traduction de texte entre différentes langues en utilisant NLLB.
+    Gère la traduction de texte entre différentes langues en utilisant NLLB,
+    chargé à sa première utilisation.
     """
     def __init__(self):
         print("Initialisation du Service de Traduction...")
         self.device = "cuda:0" if torch.cuda.is_available() else "cpu"
         print(f"Le service de traduction utilisera le périphérique : {self.device}")
 
-        model_id = "facebook/nllb-200-distilled-600M"
-        
-        try:
-            print(f"Chargement du modèle de traduction '{model_id}'...")
-            self.translator = pipeline(
-                'translation', 
-                model=model_id,
-                device=self.device
-            )
-            print("Modèle de traduction chargé avec succès.")
-        except Exception as e:
-            print(f"ERREUR critique lors du chargement du modèle de traduction : {e}")
-            self.translator = None
-    
+        self.model_id = "facebook/nllb-200-distilled-600M"
+        # Moteur d'inférence : 'pytorch', 'int8' ou 'onnx' (variable TRANSLATION_BACKEND).
+        self.backend = backend_for("translation")
+        model_registry_instance.register("translation", self._load_pipeline, size_mb=2500)
+
+    def _load_pipeline(self):
+        print(f"Chargement du modèle de traduction '{self.model_id}'...")
+        return build_pipeline('translation', self.model_id, self.device, self.backend)
+
     def translate(self, text: str, src_lang: str, target_lang: str) -> str:
         """
         Traduit un texte d'une langue source vers une langue cible.
-        
+        Le texte est traduit phrase par phrase (voir `translate_batch`), il n'est donc pas tronqué.
+
         Les codes de langue pour NLLB sont spécifiques. Exemples :
         - Bambara: 'bam_Latn'
-        - Peulh (Fula): 'ful_Latn'
+        - Peulh (Fula): 'fuv_Latn'
         - Français: 'fra_Latn'
         - Anglais: 'eng_Latn'
+
+        Les erreurs sont levées : un message d'erreur n'est jamais renvoyé comme traduction.
         """
-        if self.translator is None:
-            return "Erreur : Le service de traduction n'a pas pu être initialisé."
-        
         if not text:
             return ""
-            
-        print(f"Début de la traduction de '{src_lang}' vers '{target_lang}'...")
         try:
-            # NLLB requiert les codes de langue source pour une meilleure performance.
-            outputs = self.translator(text, src_lang=src_lang, tgt_lang=target_lang)
-            translated_text = outputs[0]['translation_text']
-            print("Traduction terminée.")
-            return translated_text
+            return self.translate_batch(text, src_lang, target_lang)
         except Exception as e:
             print(f"ERREUR lors de la traduction : {e}")
-            return f"Une erreur est survenue pendant la traduction : {e}"
+            raise
+
+    def _cache_key(self, sentence: str, src_lang: str, target_lang: str) -> str:
+        return cache_service_instance.make_key(sentence, self.model_id, self.backend, src_lang, target_lang)
+
+    def translate_batch(self, text: str, src_lang: str, target_lang: str, batch_size: int = TRANSLATION_BATCH_SIZE) -> str:
+        """
+        Traduit un long texte par lots de phrases.
+
+        Le texte est découpé en phrases ; celles déjà traduites sont lues dans le cache, les autres
+        (dédoublonnées) sont triées par longueur pour limiter le remplissage dans chaque lot, traduites,
+        puis remises dans l'ordre d'origine avec leurs sauts de ligne.
+        Comme pour `translate`, les erreurs sont levées.
+
+        Returns:
+            str: Le texte traduit.
+        """
+        sentences = split_sentences(text)
+        if not sentences:
+            return ""
+        distinct = list(dict.fromkeys(sentence for sentence, _ in sentences))
+        cached = cache_service_instance.get_many("translation", [self._cache_key(sentence, src_lang, target_lang) for sentence in distinct])
+        translations = dict(zip(distinct, cached))
+        missing = [sentence for sentence, translated in translations.items() if translated is None]
+        print(f"Traduction de '{src_lang}' vers '{target_lang}' : {len(sentences)} phrases ({len(translations)} distinctes, {len(translations) - len(missing)} depuis le cache).")
+
+        if missing:
+            with model_registry_instance.use("translation") as translator:
+                if translator is None:
+                    raise RuntimeError("Le service de traduction n'a pas pu être initialisé.")
+                # Une phrase trop longue est traduite en plusieurs morceaux, recollés ensuite.
+                owners, pieces = [], []
+                for sentence in missing:
+                    for piece in chunk_text_by_tokens(sentence, TRANSLATION_MAX_TOKENS, tokenizer=translator.tokenizer):
+                        owners.append(sentence)
+                        pieces.append(piece)
+                order = sorted(range(len(pieces)), key=lambda i: len(pieces[i]), reverse=True)
+                outputs = translator([pieces[i] for i in order], src_lang=src_lang, tgt_lang=target_lang, batch_size=batch_size)
+            translated_pieces = [None] * len(pieces)
+            for i, output in zip(order, outputs):
+                translated_pieces[i] = output['translation_text'].strip()
+            grouped = {sentence: [] for sentence in missing}
+            for owner, piece in zip(owners, translated_pieces):
+                grouped[owner].append(piece)
+            for sentence in missing:
+                translations[sentence] = " ".join(grouped[sentence])
+            cache_service_instance.set_many("translation", [(self._cache_key(sentence, src_lang, target_lang), translations[sentence]) for sentence in missing])
+            print("Traduction terminée.")
+
+        return "".join(translations[sentence] + separator for sentence, separator in sentences).strip()
 
 # Instance unique
-translation_service_instance = TranslationService()
\ No newline at end of file
+translation_service_instance = TranslationService()
@@ -1,43 +1,95 @@
 # services/tts_service.py
 
+import os
+import struct
+import numpy as np
 import torch
 from transformers import pipeline
 import soundfile as sf
 
+from services.model_registry import model_registry_instance
+from services.text_chunker import chunk_text_by_tokens
+
+# Bark génère environ 13 s d'audio par appel : les segments sont limités à quelques phrases courtes.
+TTS_SEGMENT_TOKENS = int(os.getenv("TTS_SEGMENT_TOKENS", "50"))
+# Nombre de segments synthétisés ensemble (le premier est toujours synthétisé seul pour être diffusé au plus vite).
+TTS_BATCH_SIZE = int(os.getenv("TTS_BATCH_SIZE", "4"))
+# Silence inséré entre deux segments, en secondes.
+TTS_PAUSE_S = 0.25
+
+def wav_header(sampling_rate: int, channels: int = 1, bits_per_sample: int = 16) -> bytes:
+    """
+    En-tête WAV (PCM) pour un flux dont la longueur n'est pas connue à l'avance :
+    les tailles sont fixées au maximum, ce que les lecteurs courants acceptent.
+    """
+    byte_rate = sampling_rate * channels * bits_per_sample // 8
+    block_align = channels * bits_per_sample // 8
+    return (b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sampling_rate, byte_rate, block_align, bits_per_sample)
+            + b"data" + struct.pack("<I", 0xFFFFFFFF))
+
+def to_pcm16(audio) -> bytes:
+    """Convertit un signal flottant (-1..1) en échantillons PCM 16 bits."""
+    audio = np.clip(np.asarray(audio, dtype=np.float32).reshape(-1), -1.0, 1.0)
+    return (audio * 32767).astype("<i2").tobytes()
+
 class TTSService:
     """
-    Gère la conversion de texte en parole. Charge le modèle à la demande pour économiser la VRAM.
+    Gère la conversion de texte en parole. Le modèle est chargé à la demande puis reste en mémoire
+    tant que le budget du registre de modèles le permet (il est déchargé s'il est le moins récemment utilisé).
     """
     def __init__(self):
         print("Service TTS initialisé (modèle non chargé).")
         self.device = "cuda:0" if torch.cuda.is_available() else "cpu"
         self.model_id = "suno/bark-small"
-        self.pipe = None
-    
+        model_registry_instance.register("tts", self._load_pipeline, size_mb=1700)
+
+    def _load_pipeline(self):
+        print(f"Chargement à la demande du modèle TTS '{self.model_id}' sur {self.device}...")
+        return pipeline("text-to-speech", self.model_id, device=self.device)
+
+    def synthesize_stream(self, text: str, batch_size: int = TTS_BATCH_SIZE):
+        """
+        Synthétise un texte de longueur quelconque segment par segment.
+
+        Le texte est découpé aux fins de phrases en segments courts ; le premier est synthétisé seul
+        pour que l'audio commence au plus vite, les suivants par lots de `batch_size`.
+        Le modèle reste réservé pendant toute la durée du flux. Les erreurs sont levées.
+
+        Yields:
+            tuple: (fréquence d'échantillonnage, signal numpy du segment suivi d'une courte pause), dans l'ordre du texte.
+        """
+        segments = chunk_text_by_tokens(text, TTS_SEGMENT_TOKENS)
+        if not segments:
+            return
+        with model_registry_instance.use("tts") as pipe:
+            if pipe is None:
+                raise RuntimeError("Le modèle TTS n'a pas pu être chargé.")
+
+            print(f"Synthèse vocale en flux de {len(segments)} segments (batch_size:{batch_size})...")
+            batches = [segments[:1]] + [segments[i:i + batch_size] for i in range(1, len(segments), batch_size)]
+            for batch in batches:
+                outputs = pipe(batch, batch_size=len(batch))
+                for speech in outputs:
+                    sampling_rate = speech["sampling_rate"]
+                    pause = np.zeros(int(TTS_PAUSE_S * sampling_rate), dtype=np.float32)
+                    yield sampling_rate, np.concatenate([np.asarray(speech["audio"], dtype=np.float32).reshape(-1), pause])
+
     def synthesize(self, text: str, output_path: str):
         """
-        Génère un fichier audio. Le modèle est chargé pour cette tâche puis déchargé.
+        Génère un fichier audio pour l'ensemble du texte (voir `synthesize_stream`).
         """
         try:
-            if self.pipe is None:
-                print(f"Chargement à la demande du modèle TTS '{self.model_id}' sur {self.device}...")
-                self.pipe = pipeline("text-to-speech", self.model_id, device=self.device)
-
-            print("Synthèse vocale en cours...")
-            # Limite le texte pour éviter les erreurs avec le modèle Bark
-            speech = self.pipe(text[:1000]) 
-            sf.write(output_path, speech["audio"], samplerate=speech["sampling_rate"])
+            sampling_rate, parts = None, []
+            for sampling_rate, audio in self.synthesize_stream(text):
+                parts.append(audio)
+            if not parts:
+                raise ValueError("Le texte à synthétiser est vide.")
+            sf.write(output_path, np.concatenate(parts), samplerate=sampling_rate)
             print("Fichier audio généré avec succès.")
-        
+
         except Exception as e:
             print(f"ERREUR dans le service TTS : {e}")
             raise e
-            
-        finally:
-            if self.pipe is not None:
-                print("Déchargement du modèle TTS...")
-                self.pipe = None
-                if torch.cuda.is_available():
-                    torch.cuda.empty_cache()
-
-tts_service_instance = TTSService()
\ No newline at end of file
+
+tts_service_instance = TTSService()
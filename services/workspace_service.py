@@ -0,0 +1,177 @@
+# services/workspace_service.py
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+
+WORKSPACE_DIR = os.getenv("WORKSPACE_DIR", ".workspace")
+# Niveau de compression zlib des textes et résultats stockés (1 = rapide, 9 = compact).
+WORKSPACE_COMPRESSION_LEVEL = int(os.getenv("WORKSPACE_COMPRESSION_LEVEL", "6"))
+
+def compress(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), WORKSPACE_COMPRESSION_LEVEL)
+
+def decompress(blob: bytes) -> str:
+    return zlib.decompress(blob).decode("utf-8")
+
+class WorkspaceService:
+    """
+    Espace de travail persistant (SQLite) : documents extraits ou transcrits, résultats d'analyse
+    et empreintes des fichiers sources déjà traités. Les textes sont compressés (zlib).
+
+    - Un document est adressé par l'empreinte de son texte (comme dans le DocumentStore).
+    - Un fichier source est adressé par l'empreinte de son contenu et des paramètres de traitement :
+      recharger un fichier déjà traité retrouve directement son document, sans nouvelle extraction.
+    - Les résultats (synthèses, résumés) sont rangés par document, type d'analyse et paramètres.
+    """
+    def __init__(self, db_path: str):
+        print(f"Initialisation de l'espace de travail '{db_path}'...")
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "document_id TEXT PRIMARY KEY, filename TEXT, is_audio INTEGER NOT NULL, metadata TEXT NOT NULL, "
+            "text BLOB NOT NULL, chars INTEGER NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sources ("
+            "source_key TEXT PRIMARY KEY, "
+            "document_id TEXT NOT NULL REFERENCES documents(document_id) ON DELETE CASCADE, created REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "document_id TEXT NOT NULL REFERENCES documents(document_id) ON DELETE CASCADE, "
+            "kind TEXT NOT NULL, key TEXT NOT NULL, params TEXT NOT NULL, value BLOB NOT NULL, created REAL NOT NULL, "
+            "PRIMARY KEY (document_id, kind, key))"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def source_key(source, *params) -> str:
+        """
+        Empreinte d'un fichier source et des paramètres qui influent sur son traitement (langue, modèle...).
+        `source` est un chemin (fichier lu par blocs) ou le contenu du fichier en bytes.
+        """
+        digest = hashlib.sha256()
+        if isinstance(source, bytes):
+            digest.update(source)
+        else:
+            with open(source, "rb") as handle:
+                while block := handle.read(1024 * 1024):
+                    digest.update(block)
+        for part in params:
+            digest.update(b"\x1f")
+            digest.update(str(part).encode("utf-8"))
+        return digest.hexdigest()
+
+    # --- DOCUMENTS ---
+
+    def put_document(self, document_id: str, text: str, filename: str = None, is_audio: bool = False, **metadata):
+        blob = compress(text)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO documents (document_id, filename, is_audio, metadata, text, chars, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(document_id) DO UPDATE SET filename = excluded.filename, metadata = excluded.metadata, last_access = excluded.last_access",
+                (document_id, filename, int(is_audio), json.dumps(metadata), blob, len(text), now, now)
+            )
+            self._conn.commit()
+
+    def get_document(self, document_id: str):
+        """Retourne {'text', 'metadata'} (même forme que le DocumentStore), ou None si le document est inconnu."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT filename, is_audio, metadata, text FROM documents WHERE document_id = ?", (document_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE documents SET last_access = ? WHERE document_id = ?", (time.time(), document_id))
+            self._conn.commit()
+        filename, is_audio, metadata, blob = row
+        return {"text": decompress(blob), "metadata": {"filename": filename, "is_audio": bool(is_audio), **json.loads(metadata)}}
+
+    def list_documents(self) -> list:
+        """Documents de l'espace de travail, du plus récemment utilisé au plus ancien (sans leur texte)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT d.document_id, d.filename, d.is_audio, d.chars, d.created, d.last_access, "
+                "(SELECT COUNT(*) FROM results r WHERE r.document_id = d.document_id) "
+                "FROM documents d ORDER BY d.last_access DESC"
+            ).fetchall()
+        return [
+            {"document_id": document_id, "filename": filename, "is_audio": bool(is_audio), "chars": chars,
+             "created": created, "last_access": last_access, "results": results}
+            for document_id, filename, is_audio, chars, created, last_access, results in rows
+        ]
+
+    def delete_document(self, document_id: str) -> bool:
+        """Supprime le document ainsi que ses résultats et empreintes de fichiers sources."""
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM documents WHERE document_id = ?", (document_id,)).rowcount
+            self._conn.commit()
+        return bool(deleted)
+
+    # --- FICHIERS SOURCES ---
+
+    def link_source(self, source_key: str, document_id: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sources (source_key, document_id, created) VALUES (?, ?, ?)",
+                (source_key, document_id, time.time())
+            )
+            self._conn.commit()
+
+    def find_source(self, source_key: str):
+        """Identifiant du document déjà produit à partir de ce fichier source, ou None."""
+        with self._lock:
+            row = self._conn.execute("SELECT document_id FROM sources WHERE source_key = ?", (source_key,)).fetchone()
+        return row[0] if row else None
+
+    # --- RÉSULTATS D'ANALYSE ---
+
+    def put_result(self, document_id: str, kind: str, key: str, value: str, **params):
+        """Enregistre un résultat d'analyse du document ; `params` décrit comment il a été obtenu (modèle, mode...)."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (document_id, kind, key, params, value, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (document_id, kind, key, json.dumps(params), compress(value), time.time())
+            )
+            self._conn.commit()
+
+    def get_result(self, document_id: str, kind: str, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM results WHERE document_id = ? AND kind = ? AND key = ?", (document_id, kind, key)
+            ).fetchone()
+        return decompress(row[0]) if row else None
+
+    def list_results(self, document_id: str) -> list:
+        """Résultats enregistrés pour le document, du plus récent au plus ancien."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, key, params, value, created FROM results WHERE document_id = ? ORDER BY created DESC", (document_id,)
+            ).fetchall()
+        return [
+            {"kind": kind, "key": key, "params": json.loads(params), "value": decompress(value), "created": created}
+            for kind, key, params, value, created in rows
+        ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            documents, chars, stored = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(chars), 0), COALESCE(SUM(LENGTH(text)), 0) FROM documents"
+            ).fetchone()
+            results = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            sources = self._conn.execute("SELECT COUNT(*) FROM sources").fetchone()[0]
+        return {"documents": documents, "results": results, "sources": sources, "text_chars": chars, "stored_bytes": stored}
+
+# Instance unique partagée par le backend.
+workspace_service_instance = WorkspaceService(os.path.join(WORKSPACE_DIR, "workspace.sqlite3"))
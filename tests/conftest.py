@@ -0,0 +1,24 @@
+# tests/conftest.py
+import importlib
+
+import pytest
+
+@pytest.fixture(scope="session")
+def state_dir(tmp_path_factory):
+    """Dossier temporaire de l'espace de travail et du cache, partagé par les singletons du backend."""
+    return tmp_path_factory.mktemp("state")
+
+@pytest.fixture
+def backend(state_dir, monkeypatch):
+    """Module du backend, importé avec son espace de travail et son cache dans un dossier temporaire."""
+    pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    monkeypatch.setenv("WORKSPACE_DIR", str(state_dir / "workspace"))
+    monkeypatch.setenv("CACHE_DIR", str(state_dir / "cache"))
+    return importlib.import_module("backend_streamlit")
+
+@pytest.fixture
+def client(backend):
+    from fastapi.testclient import TestClient
+    with TestClient(backend.app) as test_client:
+        yield test_client
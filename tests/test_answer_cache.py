@@ -0,0 +1,38 @@
+# tests/test_answer_cache.py
+import pytest
+
+from services.answer_cache import AnswerCache
+
+DOCUMENT, MODEL = "doc", "model"
+
+@pytest.fixture
+def cache():
+    answer_cache = AnswerCache()
+    answer_cache.store(DOCUMENT, MODEL, "Quels sont les principaux défis des agriculteurs ?", "La sécheresse.")
+    answer_cache.store(DOCUMENT, MODEL, "Qui a voté la loi ?", "Les députés.")
+    return answer_cache
+
+def test_reworded_question_hits(cache):
+    hit = cache.lookup(DOCUMENT, MODEL, "Quels sont les défis principaux des agriculteurs")
+    assert hit is not None and hit["answer"] == "La sécheresse."
+
+@pytest.mark.parametrize("question", [
+    "Qui n'a pas voté la loi ?",
+    "Qui ne vote plus la loi ?",
+    "Quels ne sont pas les principaux défis des agriculteurs ?",
+])
+def test_negated_question_misses(cache, question):
+    assert cache.lookup(DOCUMENT, MODEL, question) is None
+
+@pytest.mark.parametrize("question", [
+    "Quels sont les principaux défis des éleveurs ?",
+    "Quels sont les principaux atouts des agriculteurs ?",
+    "Qui a rejeté la loi ?",
+])
+def test_one_word_swapped_question_misses(cache, question):
+    assert cache.lookup(DOCUMENT, MODEL, question) is None
+
+def test_other_document_or_model_misses(cache):
+    question = "Quels sont les principaux défis des agriculteurs ?"
+    assert cache.lookup("autre", MODEL, question) is None
+    assert cache.lookup(DOCUMENT, "autre", question) is None
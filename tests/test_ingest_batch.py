@@ -0,0 +1,19 @@
+# tests/test_ingest_batch.py
+import json
+
+CSV_BYTES = "id,réponse,région\n1,Les routes sont impraticables,Kayes\n2,,Mopti\n3,Manque d'eau potable,Ségou\n".encode("utf-8")
+
+def test_extract_text_csv_bytes():
+    from services.data_loader import extract_text
+    text = extract_text("enquete.csv", CSV_BYTES)
+    assert "[1] Les routes sont impraticables" in text
+    assert "[3] Manque d'eau potable" in text
+
+def test_ingest_batch_csv(client):
+    response = client.post("/ingest-batch/", files=[("files", ("enquete.csv", CSV_BYTES, "text/csv"))])
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines() if line.strip()]
+    manifest = events[-1]
+    assert manifest["type"] == "manifest"
+    assert manifest["files"][0]["status"] == "ok", manifest["files"][0]["error"]
+    assert manifest["files"][0]["document_id"]
@@ -0,0 +1,37 @@
+# tests/test_jobs.py
+import time
+
+def wait_for_job(client, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = client.get(f"/jobs/{job_id}").json()["status"]
+        if status not in ("queued", "running"):
+            return status
+        time.sleep(0.05)
+    raise TimeoutError(job_id)
+
+def test_long_document_job_output_is_not_duplicated(backend, client, monkeypatch):
+    async def summarize_chunk_batch(text_chunks, indices):
+        return indices, [f"résumé {i}" for i in indices], None
+
+    async def stream_final_synthesis(final_prompt, mode, model_choice, strategy="single", providers=None):
+        for token in ("Synthèse ", "finale ", "du document."):
+            yield token
+
+    monkeypatch.setattr(backend, "chunk_text", lambda text, overlap_tokens=0: [f"morceau {i}" for i in range(5)])
+    monkeypatch.setattr(backend, "summarize_chunk_batch", summarize_chunk_batch)
+    monkeypatch.setattr(backend, "stream_final_synthesis", stream_final_synthesis)
+    document_id = backend.document_store_instance.put("Texte du document pour la tâche de fond.", filename="doc.txt")
+
+    response = client.post("/jobs/long-document-analysis/", data={"analysis_type": "resume_general", "document_id": document_id})
+    job_id = response.json()["job_id"]
+    assert wait_for_job(client, job_id) == "done"
+    output = client.get(f"/jobs/{job_id}/result").json()["output"]
+    for step in ("Étape 1/3", "Étape 2/3", "Étape 3/3", "Synthèse finale du document."):
+        assert output.count(step) == 1, step
+
+def test_long_document_job_rejects_unknown_strategy(backend, client):
+    document_id = backend.document_store_instance.put("Texte du document pour la tâche de fond.", filename="doc.txt")
+    response = client.post("/jobs/long-document-analysis/", data={"analysis_type": "resume_general", "document_id": document_id, "strategy": "inconnue"})
+    assert response.status_code == 400
+    assert "job_id" not in response.json()
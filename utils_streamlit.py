@@ -5,6 +5,9 @@ from docx import Document
 from wordcloud import WordCloud
 import spacy
 import io
+import os
+import re
+from collections import Counter
 
 # --- CONFIGURATION ---
 # Chargement du modèle Spacy en utilisant le cache de Streamlit pour la performance
@@ -21,14 +24,17 @@ def load_spacy_model():
 
 nlp = load_spacy_model()
 
-# --- FONCTIONS DE TRAITEMENT DE TEXTE ---
+# Taille des blocs de texte passés à spaCy (sous sa limite nlp.max_length) et nombre de blocs par lot.
+WORDCLOUD_BLOCK_CHARS = 100_000
+WORDCLOUD_BATCH_SIZE = int(os.getenv("WORDCLOUD_BATCH_SIZE", "8"))
+# Processus utilisés par spaCy pour les textes longs (1 = dans le processus de Streamlit).
+WORDCLOUD_N_PROCESS = int(os.getenv("WORDCLOUD_N_PROCESS", "1"))
+ROW_LABEL_PATTERN = re.compile(r"\[(\d+)\]")
 
-def process_text_for_wordcloud(text, synonym_str):
-    """Traite le texte pour le nuage de mots : lemmatisation et gestion des synonymes."""
-    if nlp is None:
-        st.error("Le modèle Spacy n'est pas chargé, impossible de générer le nuage de mots.")
-        raise RuntimeError("Modèle Spacy non chargé.")
+# --- FONCTIONS DE TRAITEMENT DE TEXTE ---
 
+def parse_synonyms(synonym_str):
+    """Lit les regroupements « mot_cible: synonyme1, synonyme2 » (un par ligne) en dictionnaire synonyme -> cible."""
     synonym_map = {}
     if synonym_str:
         for line in synonym_str.strip().split('\n'):
@@ -37,19 +43,87 @@ def process_text_for_wordcloud(text, synonym_str):
                 target, syns = parts[0].strip(), [s.strip() for s in parts[1].split(',')]
                 for s in syns:
                     synonym_map[s.lower()] = target.lower()
+    return synonym_map
+
+def iter_text_blocks(text, max_chars=WORDCLOUD_BLOCK_CHARS):
+    """Découpe le texte en blocs d'au plus `max_chars` caractères, aux sauts de ligne, pour `nlp.pipe`."""
+    block, size = [], 0
+    for line in text.splitlines(keepends=True):
+        if size + len(line) > max_chars and block:
+            yield "".join(block)
+            block, size = [], 0
+        while len(line) > max_chars:
+            yield line[:max_chars]
+            line = line[max_chars:]
+        block.append(line)
+        size += len(line)
+    if block:
+        yield "".join(block)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def compute_lemma_stream(text):
+    """
+    Lemmes pertinents du texte (mots alphabétiques, hors mots vides et ponctuation), regroupés par segment,
+    et comptes des autres lemmes, écartés par ces filtres.
+
+    Un segment est un paragraphe (séparé par une ligne vide) : une réponse pour un fichier d'enquête.
+    Calculé une seule fois par texte : spaCy traite le texte par blocs avec `nlp.pipe`, sans l'analyse
+    syntaxique ni la reconnaissance d'entités (inutiles pour la lemmatisation). Le nuage de mots et les
+    indicateurs lexicaux sont ensuite dérivés de ce flux sans repasser par spaCy.
 
-    doc = nlp(text.lower())
-    lemmatized_words = []
-    for token in doc:
-        # On utilise la forme lemmatisée comme clé pour la recherche de synonymes
-        lemma = token.lemma_.lower()
+    Returns:
+        tuple: (liste des segments, chacun une liste de lemmes ; libellés des segments ;
+                Counter des lemmes écartés, qu'un regroupement de synonymes peut encore retenir).
+    """
+    if nlp is None:
+        st.error("Le modèle Spacy n'est pas chargé, impossible d'analyser le texte.")
+        raise RuntimeError("Modèle Spacy non chargé.")
+
+    units, labels, dropped = [], [], Counter()
+    blocks = (block.lower() for block in iter_text_blocks(text))
+    for doc in nlp.pipe(blocks, batch_size=WORDCLOUD_BATCH_SIZE, n_process=WORDCLOUD_N_PROCESS, disable=["parser", "ner"]):
+        current = None
+        for token in doc:
+            if token.is_space:
+                if token.text.count("\n") >= 2:
+                    current = None
+                continue
+            if current is None:
+                # Les réponses d'un fichier tabulaire commencent par leur numéro de ligne : « [12] ... ».
+                match = ROW_LABEL_PATTERN.match(doc.text, token.idx)
+                labels.append(f"Réponse {match.group(1)}" if match else f"Segment {len(labels) + 1}")
+                current = []
+                units.append(current)
+            if token.is_alpha and not token.is_stop and not token.is_punct:
+                current.append(token.lemma_.lower())
+            else:
+                dropped[token.lemma_.lower()] += 1
+    kept = [index for index, unit in enumerate(units) if unit]
+    return [units[index] for index in kept], [labels[index] for index in kept], dropped
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def compute_lemma_frequencies(text):
+    """Tables de fréquences des lemmes pertinents et des lemmes écartés, tirées du flux de lemmes en cache."""
+    units, _, dropped = compute_lemma_stream(text)
+    frequencies = Counter()
+    for unit in units:
+        frequencies.update(unit)
+    return dict(frequencies), dict(dropped)
+
+def word_frequencies(text, synonym_str):
+    """
+    Fréquences des lemmes du texte, les synonymes étant regroupés sous leur mot cible.
+    Un lemme déclaré comme synonyme est retenu même s'il est écarté par les filtres (mot vide, sigle...).
+    """
+    synonym_map = parse_synonyms(synonym_str)
+    relevant, dropped = compute_lemma_frequencies(text)
+    frequencies = Counter()
+    for lemma, count in relevant.items():
+        frequencies[synonym_map.get(lemma, lemma)] += count
+    for lemma, count in dropped.items():
         if lemma in synonym_map:
-            lemmatized_words.append(synonym_map[lemma])
-        # On garde les mots qui sont alphabétiques, pas des mots vides (stop words) et pas de la ponctuation
-        elif token.is_alpha and not token.is_stop and not token.is_punct:
-            lemmatized_words.append(lemma)
-            
-    return " ".join(lemmatized_words)
+            frequencies[synonym_map[lemma]] += count
+    return frequencies
 
 def generate_advanced_wordcloud(text, synonym_str, colormap):
     """Génère et retourne une image de nuage de mots."""
@@ -57,8 +131,8 @@ def generate_advanced_wordcloud(text, synonym_str, colormap):
         st.info("Le texte est vide. Impossible de générer un nuage de mots.")
         return None, "Le texte est vide."
     try:
-        processed_text = process_text_for_wordcloud(text, synonym_str)
-        if not processed_text.strip():
+        frequencies = word_frequencies(text, synonym_str)
+        if not frequencies:
             st.info("Le texte ne contient aucun mot pertinent après le filtrage.")
             return None, "Aucun mot pertinent trouvé."
         
@@ -68,7 +142,7 @@ def generate_advanced_wordcloud(text, synonym_str, colormap):
             background_color='white',
             colormap=colormap,
             collocations=False
-        ).generate(processed_text)
+        ).generate_from_frequencies(frequencies)
         
         return wc.to_image(), "Nuage de mots sémantique généré avec succès."
     except Exception as e: